@@ -0,0 +1,118 @@
+"""
+Precompiled API snapshot: `api_aliases.json` reduced to the fields the compiler reads, plus a
+per-module alias index, stored with `marshal` (no JSON parsing at startup).
+
+`packaging/prepare_installer_payload.py` bundles one next to `mldsl.exe`; `load_api` also keeps a
+cache next to the JSON (`out/api_aliases.snapshot`). A snapshot is used only when it is not older
+than `api_aliases.json`, so a user-regenerated `out/` still wins. The format is tied to the Python
+version (`marshal`); a mismatching or broken snapshot is ignored and JSON is read instead.
+"""
+
+from __future__ import annotations
+
+import marshal
+import os
+import sys
+from pathlib import Path
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_VERSION = 1
+# Spec fields not used by the compiler (docs only); left out of the snapshot.
+_DOC_ONLY_FIELDS = frozenset({"id", "description", "descriptionRaw"})
+
+
+def _magic() -> bytes:
+    return f"MLDSL-API-SNAPSHOT {SNAPSHOT_VERSION} {sys.implementation.cache_tag} {marshal.version}\n".encode("ascii")
+
+
+class ApiSnapshot(dict):
+    """`module -> {canon: spec}` as loaded from JSON, with `alias_index`: `module -> {alias: canon}`."""
+
+    __slots__ = ("alias_index",)
+
+    def __init__(self, modules: dict, alias_index: dict | None = None):
+        super().__init__(modules)
+        self.alias_index = alias_index if alias_index is not None else build_alias_index(modules)
+
+
+def build_alias_index(api: dict) -> dict[str, dict[str, str]]:
+    """First canon (in file order) listing each alias, per module; same result as a linear alias scan."""
+    index: dict[str, dict[str, str]] = {}
+    for module, mod in api.items():
+        if not isinstance(mod, dict):
+            continue
+        mod_index = index.setdefault(module, {})
+        for canon, spec in mod.items():
+            for alias in (spec.get("aliases") or []) if isinstance(spec, dict) else []:
+                if isinstance(alias, str):
+                    mod_index.setdefault(alias, canon)
+    return index
+
+
+def compact_api(api: dict) -> dict:
+    return {
+        module: {
+            canon: {k: v for k, v in spec.items() if k not in _DOC_ONLY_FIELDS} if isinstance(spec, dict) else spec
+            for canon, spec in mod.items()
+        }
+        if isinstance(mod, dict)
+        else mod
+        for module, mod in api.items()
+    }
+
+
+def snapshot_path_for(json_path: Path) -> Path:
+    json_path = Path(json_path)
+    return json_path.with_suffix(SNAPSHOT_SUFFIX)
+
+
+def write_api_snapshot(api: dict, out_path: Path, *, mtime_ns: int | None = None) -> Path:
+    """
+    Writes a snapshot of `api` (parsed `api_aliases.json`) atomically. `mtime_ns` stamps it with the
+    mtime of the JSON it was read from, so a JSON changed meanwhile (or dated in the future) stays newer.
+    """
+    modules = compact_api(api)
+    payload = marshal.dumps({"api": modules, "alias_index": build_alias_index(modules)})
+    out_path = Path(out_path)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    tmp.write_bytes(_magic() + payload)
+    if mtime_ns is not None:
+        os.utime(tmp, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def read_api_snapshot(path: Path) -> ApiSnapshot | None:
+    """Snapshot contents, or None when missing, written by another Python, or unreadable."""
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return None
+    magic = _magic()
+    if not data.startswith(magic):
+        return None
+    try:
+        obj = marshal.loads(data[len(magic) :])
+        return ApiSnapshot(obj["api"], obj["alias_index"])
+    except (ValueError, EOFError, TypeError, KeyError):
+        return None
+
+
+def _mtime_ns(path: Path) -> int | None:
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_fresh_snapshot(json_path: Path, candidates: list[Path]) -> ApiSnapshot | None:
+    """First readable snapshot among `candidates` that is not older than `json_path` (or JSON is missing)."""
+    json_mtime = _mtime_ns(json_path)
+    for path in candidates:
+        snap_mtime = _mtime_ns(path)
+        if snap_mtime is None or (json_mtime is not None and snap_mtime < json_mtime):
+            continue
+        api = read_api_snapshot(path)
+        if api is not None:
+            return api
+    return None
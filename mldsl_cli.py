@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-import argparse
-import json
-import os
-import re
-import runpy
-import sys
-from pathlib import Path
+# Startup budget: only what argument parsing needs is imported here; subcommands import their
+# modules (compiler, json, hashlib, ...) inside the handler. `MLDSL_IMPORT_PROFILE=1` prints
+# an import-time breakdown on exit.
+import mldsl_importprof
+
+if mldsl_importprof.enabled():
+    mldsl_importprof.install()
+
+import argparse  # noqa: E402
+import re  # noqa: E402
+import sys  # noqa: E402
+from pathlib import Path  # noqa: E402
 
 from mldsl_paths import actions_catalog_path, api_aliases_path, ensure_dirs, out_dir, repo_root
 
@@ -69,41 +74,7 @@ def _parse_rank_rules_text(text: str) -> dict[int, int]:
     return id_to_tier_level
 
 
-def _extract_action_calls_from_code(code: str) -> set[str]:
-    stripped_lines: list[str] = []
-    for line in str(code or "").splitlines():
-        in_quote = False
-        quote_ch = ""
-        cut_idx = -1
-        i = 0
-        while i < len(line):
-            ch = line[i]
-            if ch in ('"', "'") and (i == 0 or line[i - 1] != "\\"):
-                if not in_quote:
-                    in_quote = True
-                    quote_ch = ch
-                elif quote_ch == ch:
-                    in_quote = False
-                    quote_ch = ""
-            elif ch == "#" and not in_quote:
-                cut_idx = i
-                break
-            i += 1
-        stripped_lines.append(line[:cut_idx] if cut_idx >= 0 else line)
-    s = "\n".join(stripped_lines)
-    out: set[str] = set()
-    rx = re.compile(r"([a-zа-яё_][a-zа-яё0-9_]*)\s*\.\s*([a-zа-яё_][a-zа-яё0-9_]*)\s*\(", flags=re.I)
-    for m in rx.finditer(s):
-        mod = _norm_alias(m.group(1))
-        act = _norm_alias(m.group(2))
-        if not mod or not act:
-            continue
-        out.add(f"{mod}.{act}")
-        out.add(act)
-    return out
-
-
-def _build_alias_id_map(aliases_obj: dict, catalog_arr: list[dict]) -> dict[str, int]:
+def _catalog_ids_by_key(catalog_arr: list[dict]) -> dict[str, int]:
     catalog_by_key: dict[str, int] = {}
     for idx, row in enumerate(catalog_arr):
         if not isinstance(row, dict):
@@ -115,76 +86,145 @@ def _build_alias_id_map(aliases_obj: dict, catalog_arr: list[dict]) -> dict[str,
             str(row.get("gui") or ""),
         )
         catalog_by_key.setdefault(key, idx)
+    return catalog_by_key
+
+
+def _spec_catalog_key(spec: dict) -> str:
+    return _build_catalog_key(str(spec.get("sign1") or ""), str(spec.get("sign2") or ""), str(spec.get("gui") or ""))
+
+
+TIER_INDEX_FORMAT = "mldsl-tier-index"
+TIER_INDEX_VERSION = 2
+_tier_index_cache: dict[tuple[str, ...], dict] = {}
+
+
+def _file_stamp(path: Path) -> list[int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _build_tier_index(rank_path: Path, alias_path: Path, catalog_path: Path, sources: dict) -> dict:
+    import json
 
-    out: dict[str, int] = {}
+    id_to_tier_level = _parse_rank_rules_text(rank_path.read_text(encoding="utf-8"))
+    aliases_obj = json.loads(alias_path.read_text(encoding="utf-8"))
+    catalog_arr = json.loads(catalog_path.read_text(encoding="utf-8"))
+    catalog_arr = catalog_arr if isinstance(catalog_arr, list) else []
+    catalog_by_key = _catalog_ids_by_key(catalog_arr)
+    key_to_id: dict[str, int] = {}
+    id_to_name: dict[str, str] = {}
     for mod_name, mod_items in (aliases_obj or {}).items():
-        mod_norm = _norm_alias(str(mod_name or ""))
         if not isinstance(mod_items, dict):
             continue
         for act_name, act_obj in mod_items.items():
             if not isinstance(act_obj, dict):
                 continue
-            key = _build_catalog_key(
-                str(act_obj.get("sign1") or ""),
-                str(act_obj.get("sign2") or ""),
-                str(act_obj.get("gui") or ""),
-            )
+            key = _spec_catalog_key(act_obj)
             action_id = catalog_by_key.get(key)
             if action_id is None:
                 continue
-            aliases = act_obj.get("aliases") if isinstance(act_obj.get("aliases"), list) else []
-            for raw_name in [act_name, *aliases]:
-                n = _norm_alias(str(raw_name or ""))
-                if not n:
-                    continue
-                out[n] = action_id
-                if mod_norm:
-                    out[f"{mod_norm}.{n}"] = action_id
-    return out
-
-
-def _compute_required_tier_for_source(code: str) -> tuple[str, int, list[int], list[str]]:
-    rank_path = repo_root() / "donaterequire.txt"
-    id_to_tier_level = _parse_rank_rules_text(rank_path.read_text(encoding="utf-8")) if rank_path.exists() else {}
-    if not id_to_tier_level:
-        return "player", 0, [], []
+            key_to_id[key] = action_id
+            id_to_name.setdefault(str(action_id), f"{_norm_alias(str(mod_name or ''))}.{_norm_alias(str(act_name or ''))}")
+    return {
+        "format": TIER_INDEX_FORMAT,
+        "version": TIER_INDEX_VERSION,
+        "sources": sources,
+        "key_to_id": key_to_id,
+        "id_to_level": {str(k): v for k, v in id_to_tier_level.items()},
+        "id_to_name": id_to_name,
+    }
+
+
+def _load_tier_index() -> dict | None:
+    """
+    Donate tier lookup maps for the current API snapshot: catalog key -> action id,
+    id -> tier level, id -> `module.action`. Built from donaterequire.txt + api_aliases.json +
+    actions_catalog.json once, then cached in memory and next to the API as `api_aliases.tiers.json`
+    (rebuilt when any of the three files changes). None when a source file is missing.
+    """
+    import json
 
+    import mldsl_events
+
+    rank_path = repo_root() / "donaterequire.txt"
     alias_path = api_aliases_path()
     catalog_path = actions_catalog_path()
-    if not alias_path.exists() or not catalog_path.exists():
-        return "player", 0, [], []
-
-    aliases_obj = json.loads(alias_path.read_text(encoding="utf-8"))
-    catalog_arr = json.loads(catalog_path.read_text(encoding="utf-8"))
-    alias_id_map = _build_alias_id_map(aliases_obj, catalog_arr if isinstance(catalog_arr, list) else [])
-    if not alias_id_map:
-        return "player", 0, [], []
+    sources = {"rank": _file_stamp(rank_path), "api": _file_stamp(alias_path), "catalog": _file_stamp(catalog_path)}
+    if any(stamp is None for stamp in sources.values()):
+        return None
+    cache_key = (str(rank_path), str(alias_path), str(catalog_path))
+    index = _tier_index_cache.get(cache_key)
+    if index is not None and index["sources"] == sources:
+        mldsl_events.emit("cache", cache="tier_index", hit=True, level="memory")
+        return index
+    index_path = alias_path.with_name(f"{alias_path.stem}.tiers.json")
+    try:
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        index = None
+    if not (
+        isinstance(index, dict)
+        and index.get("format") == TIER_INDEX_FORMAT
+        and index.get("version") == TIER_INDEX_VERSION
+        and index.get("sources") == sources
+    ):
+        mldsl_events.emit("cache", cache="tier_index", hit=False)
+        index = _build_tier_index(rank_path, alias_path, catalog_path, sources)
+        try:
+            index_path.write_text(json.dumps(index, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        except OSError:
+            pass
+    else:
+        mldsl_events.emit("cache", cache="tier_index", hit=True, level="file")
+    _tier_index_cache[cache_key] = index
+    return index
 
-    ids: set[int] = set()
-    alias_to_id: dict[str, int] = {}
-    for alias in _extract_action_calls_from_code(code):
-        action_id = alias_id_map.get(alias)
-        if action_id is not None:
-            ids.add(action_id)
-            if "." in alias:
-                alias_to_id[alias] = action_id
 
+def _required_tier_for_ids(index: dict, ids: set[int]) -> tuple[str, int, list[int]]:
+    id_to_level = index["id_to_level"]
     required_level = 0
     matched_ids: list[int] = []
     for action_id in ids:
-        lvl = id_to_tier_level.get(action_id)
+        lvl = id_to_level.get(str(action_id))
         if lvl is None:
             continue
         matched_ids.append(action_id)
         if lvl > required_level:
             required_level = lvl
     matched_ids.sort()
-    matched_id_set = set(matched_ids)
-    matched_names_sorted = sorted([name for name, aid in alias_to_id.items() if aid in matched_id_set])
-    return TIER_ORDER[required_level], required_level, matched_ids, matched_names_sorted
+    return TIER_ORDER[required_level], required_level, matched_ids
+
+
+def _compute_required_tier(action_specs) -> tuple[str, int, list[int], list[str]]:
+    """Tier from the API specs resolved by the compiler (`compile_entries(action_specs=...)`)."""
+    index = _load_tier_index()
+    if not index or not index["id_to_level"]:
+        return "player", 0, [], []
+    key_to_id = index["key_to_id"]
+    ids = {key_to_id[k] for k in {_spec_catalog_key(spec) for spec in action_specs} if k in key_to_id}
+    tier, required_level, matched_ids = _required_tier_for_ids(index, ids)
+    matched_names = sorted(index["id_to_name"].get(str(aid), str(aid)) for aid in matched_ids)
+    return tier, required_level, matched_ids, matched_names
+
+
+def _print_required_tier(action_specs: dict[int, dict]) -> None:
+    import mldsl_events
+
+    tier, _level, matched, matched_names = _compute_required_tier(action_specs.values())
+    mldsl_events.emit("donate_tier", tier=tier, matched=len(matched), actions=list(matched_names[:20]))
+    preview = ", ".join(matched_names[:5]) if matched_names else "-"
+    print(
+        f"[warn] required donate tier: {tier} (matched actions: {len(matched)}; detected: {preview})",
+        file=sys.stderr,
+    )
 
 
 def _cmd_build_all(_args: argparse.Namespace) -> int:
+    import runpy
+
     ensure_dirs()
     target = str(repo_root() / "tools" / "build_all.py")
     # Isolate argv so inner argparse does not receive outer `mldsl_cli` args.
@@ -200,49 +240,259 @@ def _cmd_build_all(_args: argparse.Namespace) -> int:
 def _cmd_compile(args: argparse.Namespace) -> int:
     ensure_dirs()
 
+    source: str | None = None
+    if args.input == "-":
+        # In-memory source: imports resolve against the current directory.
+        from mldsl_compile import STDIN_SOURCE_NAME
+
+        source = sys.stdin.buffer.read().decode("utf-8-sig")
+        src = Path.cwd().resolve() / STDIN_SOURCE_NAME
+    else:
+        src = Path(args.input).expanduser().resolve()
+        if not src.exists():
+            raise FileNotFoundError(f"Файл не найден: {src}")
+    action_specs: dict[int, dict] = {}
+    # Compile arguments that do not shape the plan (kept out of the fingerprint).
+    # strict_unknown=None keeps the MLDSL_STRICT_UNKNOWN env default.
+    run_kwargs = dict(source=source, strict_unknown=True if getattr(args, "strict_unknown", False) else None)
+    profile = None
+    if getattr(args, "profile", None):
+        from mldsl_profile import CompileProfile
+
+        profile = run_kwargs["profile"] = CompileProfile()
+    mem_report = None
+    if getattr(args, "mem_report", None):
+        from mldsl_memreport import MemReport
+
+        mem_report = run_kwargs["mem_report"] = MemReport()
+
+    from mldsl_compile import compile_commands, compile_entries
+
+    if bool(getattr(args, "base", None)) != bool(getattr(args, "delta", None)):
+        raise ValueError("--base и --delta указываются вместе")
+    if getattr(args, "base", None) and not args.plan:
+        raise ValueError("--base/--delta требуют --plan")
+    if getattr(args, "fingerprint_only", False) and not args.plan:
+        raise ValueError("--fingerprint-only требует --plan")
+    if getattr(args, "shards", None) and not args.plan:
+        raise ValueError("--shards требует --plan")
+    if not args.plan:
+        # Commands mode compiles at -O0 with no extra passes; plan-only options would be silently ignored.
+        plan_only = [
+            flag
+            for flag, on in (
+                ("--cost-report", getattr(args, "cost_report", None)),
+                ("-O", (getattr(args, "opt_level", "0") or "0") != "0"),
+                ("--format", (getattr(args, "format", "pretty") or "pretty") != "pretty"),
+                ("--tree-shake", getattr(args, "tree_shake", False)),
+                ("--outline", getattr(args, "outline", False)),
+                ("--row-packer", (getattr(args, "row_packer", "greedy") or "greedy") != "greedy"),
+                ("--row-hashes", getattr(args, "row_hashes", False)),
+                ("--stream", getattr(args, "stream", False)),
+                ("--pass-stats", getattr(args, "pass_stats", False)),
+                ("--enable-pass", getattr(args, "enable_pass", None)),
+                ("--disable-pass", getattr(args, "disable_pass", None)),
+            )
+            if on
+        ]
+        if plan_only:
+            raise ValueError(f"{', '.join(plan_only)} требует --plan")
+    if args.plan:
+        plan_path = Path(args.plan).expanduser()
+        if not plan_path.is_absolute():
+            plan_path = Path.cwd() / plan_path
+        pass_stats: list[dict] = []
+        plan_format = str(getattr(args, "format", "pretty") or "pretty")
+        row_hashes = bool(getattr(args, "row_hashes", False))
+        compile_kwargs = dict(
+            tree_shake=bool(getattr(args, "tree_shake", False)),
+            outline=bool(getattr(args, "outline", False)),
+            row_packer=str(getattr(args, "row_packer", "greedy") or "greedy"),
+            opt_level=f"O{getattr(args, 'opt_level', '0') or '0'}",
+            enable_passes=list(getattr(args, "enable_pass", None) or []),
+            disable_passes=list(getattr(args, "disable_pass", None) or []),
+            pass_stats=pass_stats,
+            action_specs=action_specs,
+            **run_kwargs,
+        )
+        import hashlib
+
+        from mldsl_fingerprint import build_fingerprint, plan_is_current, write_fingerprint
+        from mldsl_plan import read_plan, write_plan
+
+        fp_options = {k: v for k, v in compile_kwargs.items() if k not in {"pass_stats", "action_specs", *run_kwargs}}
+        fp_options.update(format=plan_format, row_hashes=row_hashes)
+        if getattr(args, "shards", None):
+            fp_options["shards"] = int(args.shards)
+        if getattr(args, "base", None):
+            # Helper names are aligned to the base plan, so it is an input too.
+            base_file = Path(args.base).expanduser()
+            fp_options["base"] = hashlib.sha256(base_file.read_bytes()).hexdigest() if base_file.exists() else None
+        fingerprint = build_fingerprint(src, fp_options, source=source)
+        if getattr(args, "fingerprint_only", False):
+            current = plan_is_current(plan_path, fingerprint)
+            print(f"{'unchanged' if current else 'changed'}: {plan_path} (fingerprint {fingerprint['fingerprint'][:16]})")
+            return 0 if current else 1
+        plan_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if getattr(args, "stream", False):
+            from mldsl_compile import compile_plan_file
+
+            status: dict = {}
+            compile_plan_file(
+                src, plan_path, fmt=plan_format, row_hashes=row_hashes, status=status, **compile_kwargs
+            )
+            plan_written = not status["unchanged"]
+            entries = None
+        else:
+            entries = compile_entries(src, **compile_kwargs)
+            plan_written = write_plan(plan_path, entries, plan_format, row_hashes=row_hashes)
+        if getattr(args, "pass_stats", False):
+            from mldsl_passes import format_pass_stats
+
+            print(format_pass_stats(pass_stats), file=sys.stderr)
+        if getattr(args, "base", None):
+            from mldsl_delta import align_generated_names, format_delta_summary, plan_delta, write_delta
+
+            base_path = Path(args.base).expanduser()
+            if not base_path.is_absolute():
+                base_path = Path.cwd() / base_path
+            delta_path = Path(args.delta).expanduser()
+            if not delta_path.is_absolute():
+                delta_path = Path.cwd() / delta_path
+            base_entries = read_plan(base_path)
+            if entries is None:
+                entries = read_plan(plan_path)
+            entries, renamed = align_generated_names(base_entries, entries)
+            if renamed:
+                # Reuse helper names already printed in the world.
+                plan_written = write_plan(plan_path, entries, plan_format, row_hashes=row_hashes) or plan_written
+            delta = plan_delta(base_entries, entries)
+            write_delta(delta_path, delta)
+            print(f"[warn] {format_delta_summary(delta)} -> {delta_path}", file=sys.stderr)
+        if getattr(args, "cost_report", None):
+            from mldsl_cost import format_cost_table, write_cost_report
+
+            report_path = Path(args.cost_report).expanduser()
+            if not report_path.is_absolute():
+                report_path = Path.cwd() / report_path
+            if entries is None:
+                entries = read_plan(plan_path)
+            report = write_cost_report(entries, report_path)
+            print(format_cost_table(report), file=sys.stderr)
+        if getattr(args, "shards", None):
+            from mldsl_shard import format_shards_summary, manifest_path, write_shards
+
+            if entries is None:
+                entries = read_plan(plan_path)
+            manifest = write_shards(plan_path, entries, int(args.shards), plan_format, row_hashes=row_hashes)
+            print(f"[warn] {format_shards_summary(manifest)} -> {manifest_path(plan_path)}", file=sys.stderr)
+        if profile is not None:
+            profile.mark("write_plan")
+        if mem_report is not None:
+            mem_report.mark("write_plan")
+        _print_required_tier(action_specs)
+        write_fingerprint(plan_path, fingerprint)
+        _write_profile(profile, args)
+        _write_mem_report(mem_report, args)
+        if args.print_plan:
+            print(plan_path.read_text(encoding="utf-8"))
+        elif plan_written:
+            print(f"OK: wrote {plan_path}")
+        else:
+            print(f"OK: unchanged {plan_path}")
+        return 0
+
+    for cmd in compile_commands(src, action_specs=action_specs, **run_kwargs):
+        print(cmd)
+    _print_required_tier(action_specs)
+    _write_profile(profile, args)
+    _write_mem_report(mem_report, args)
+    return 0
+
+
+def _write_profile(profile, args: argparse.Namespace) -> None:
+    if profile is None:
+        return
+    from mldsl_profile import format_profile_summary
+
+    out = Path(args.profile).expanduser()
+    if not out.is_absolute():
+        out = Path.cwd() / out
+    profile.write(out)
+    print(f"[warn] {format_profile_summary(profile)} -> {out}", file=sys.stderr)
+
+
+def _write_mem_report(mem_report, args: argparse.Namespace) -> None:
+    if mem_report is None:
+        return
+    from mldsl_memreport import format_mem_summary
+
+    mem_report.stop()
+    out = Path(args.mem_report).expanduser()
+    if not out.is_absolute():
+        out = Path.cwd() / out
+    mem_report.write(out)
+    print(f"[warn] {format_mem_summary(mem_report)} -> {out}", file=sys.stderr)
+
+
+def _cmd_watch(args: argparse.Namespace) -> int:
+    from mldsl_watch import watch
+
+    if not args.plan:
+        raise ValueError("watch требует --plan")
+    if args.input == "-":
+        raise ValueError("watch: нужен путь к файлу, stdin (`-`) не поддерживается")
+    if getattr(args, "fingerprint_only", False):
+        raise ValueError("watch: --fingerprint-only не поддерживается")
     src = Path(args.input).expanduser().resolve()
     if not src.exists():
         raise FileNotFoundError(f"Файл не найден: {src}")
-    src_text = src.read_text(encoding="utf-8")
-
-    prev_strict_env = os.environ.get("MLDSL_STRICT_UNKNOWN")
+    print(f"[watch] {src} -> {args.plan} (Ctrl+C to stop)", file=sys.stderr)
     try:
-        if getattr(args, "strict_unknown", False):
-            os.environ["MLDSL_STRICT_UNKNOWN"] = "1"
-        from mldsl_compile import compile_commands, compile_entries
-        if args.plan:
-            plan_path = Path(args.plan).expanduser()
-            if not plan_path.is_absolute():
-                plan_path = Path.cwd() / plan_path
-            plan_path.parent.mkdir(parents=True, exist_ok=True)
-            entries = compile_entries(src)
-            plan_path.write_text(json.dumps({"entries": entries}, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            tier, _level, matched, matched_names = _compute_required_tier_for_source(src_text)
-            preview = ", ".join(matched_names[:5]) if matched_names else "-"
-            print(
-                f"[warn] required donate tier: {tier} (matched actions: {len(matched)}; detected: {preview})",
-                file=sys.stderr,
-            )
-            if args.print_plan:
-                print(plan_path.read_text(encoding="utf-8"))
-            else:
-                print(f"OK: wrote {plan_path}")
-            return 0
-
-        for cmd in compile_commands(src):
-            print(cmd)
-        tier, _level, matched, matched_names = _compute_required_tier_for_source(src_text)
-        preview = ", ".join(matched_names[:5]) if matched_names else "-"
+        return watch(src, lambda: _cmd_compile(args), interval=args.interval, debounce=args.debounce)
+    except KeyboardInterrupt:
+        return 0
+
+
+def _cmd_validate_plan(args: argparse.Namespace) -> int:
+    from mldsl_plan import read_plan
+    from mldsl_validate import PlanValidator, format_issues
+
+    plan_path = Path(args.plan).expanduser().resolve()
+    if not plan_path.exists():
+        raise FileNotFoundError(f"Файл плана не найден: {plan_path}")
+    validator = PlanValidator(max_issues=max(1, int(args.max_issues)))
+    validator.feed_all(read_plan(plan_path))
+    issues = validator.finish()
+    if issues:
+        print(format_issues(issues, limit=len(issues)), file=sys.stderr)
+        print(f"FAIL: {plan_path}: {len(issues)} issue(s)")
+        return 1
+    print(f"OK: {plan_path} ({validator.count} entries, {validator.rows} rows)")
+    return 0
+
+
+def _cmd_link(args: argparse.Namespace) -> int:
+    from mldsl_link import format_link_summary, link_plans
+    from mldsl_plan import read_plan, write_plan
+
+    plan_paths = [Path(p).expanduser().resolve() for p in args.plans]
+    for plan_path in plan_paths:
+        if not plan_path.exists():
+            raise FileNotFoundError(f"Файл плана не найден: {plan_path}")
+    out_path = Path(args.out).expanduser().resolve()
+    entries, report = link_plans([read_plan(p) for p in plan_paths], labels=[p.name for p in plan_paths])
+    for item in report["renamed"]:
         print(
-            f"[warn] required donate tier: {tier} (matched actions: {len(matched)}; detected: {preview})",
+            f"[warn] link: func `{item['from']}` in {item['plan']} differs from an earlier plan -> `{item['to']}`",
             file=sys.stderr,
         )
-        return 0
-    finally:
-        if prev_strict_env is None:
-            os.environ.pop("MLDSL_STRICT_UNKNOWN", None)
-        else:
-            os.environ["MLDSL_STRICT_UNKNOWN"] = prev_strict_env
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    written = write_plan(out_path, entries, str(args.format), row_hashes=bool(args.row_hashes))
+    print(f"[warn] {format_link_summary(report)}", file=sys.stderr)
+    print(f"OK: {'wrote' if written else 'unchanged'} {out_path}")
+    return 0
 
 
 def _cmd_paths(_args: argparse.Namespace) -> int:
@@ -271,9 +521,12 @@ def _cmd_paths(_args: argparse.Namespace) -> int:
 
 
 def _cmd_exportcode(args: argparse.Namespace) -> int:
-    ensure_dirs()
+    import json
+
     from mldsl_exportcode import exportcode_to_mldsl
 
+    ensure_dirs()
+
     export_path = Path(args.export_json).expanduser().resolve()
     if not export_path.exists():
         raise FileNotFoundError(f"Файл exportcode не найден: {export_path}")
@@ -311,8 +564,7 @@ def _normalize_legacy_cli_argv(argv: list[str] | None) -> list[str]:
     args = list(argv or [])
     if not args:
         return args
-    known_cmds = {"build-all", "compile", "paths", "exportcode"}
-    if args[0] in known_cmds:
+    if args[0] in SUBCOMMANDS:
         return args
 
     # Legacy compile mode: first token is file path or option list for compile.
@@ -341,39 +593,182 @@ def _normalize_legacy_cli_argv(argv: list[str] | None) -> list[str]:
     return ["compile", input_path, *rest]
 
 
-def main(argv: list[str] | None = None) -> int:
-    p = argparse.ArgumentParser(prog="mldsl", description="MLDSL compiler/build tools")
-    sub = p.add_subparsers(dest="cmd", required=True)
-
-    sp_build = sub.add_parser("build-all", help="Generate out/ (catalog, api_aliases, gamevalues, docs)")
-    sp_build.set_defaults(func=_cmd_build_all)
-
-    sp_compile = sub.add_parser("compile", help="Compile .mldsl to /placeadvanced commands or plan.json")
-    sp_compile.add_argument("input", help="Path to .mldsl file")
-    sp_compile.add_argument("--plan", help="Write JSON plan to this path (instead of printing commands)")
-    sp_compile.add_argument("--print-plan", action="store_true", help="Print plan.json after writing")
-    sp_compile.add_argument(
+def _add_compile_args(sp: argparse.ArgumentParser) -> None:
+    sp.add_argument("input", help="Path to .mldsl file")
+    sp.add_argument("--plan", help="Write JSON plan to this path (instead of printing commands)")
+    sp.add_argument("--print-plan", action="store_true", help="Print plan.json after writing")
+    sp.add_argument(
         "--strict-unknown",
         action="store_true",
         help="Fail on unresolved/unknown lines instead of warning",
     )
-    sp_compile.set_defaults(func=_cmd_compile)
+    sp.add_argument(
+        "--tree-shake",
+        action="store_true",
+        help="Drop funcs unreachable from events/loops/`export` (with --plan)",
+    )
+    sp.add_argument(
+        "--outline",
+        action="store_true",
+        help="Move repeated action sequences into shared helper funcs (with --plan)",
+    )
+    sp.add_argument(
+        "--row-packer",
+        choices=["greedy", "dp"],
+        default="greedy",
+        help=(
+            "Call-chain row packing for long blocks: greedy (default) or dp (optimal cuts over top-level "
+            "boundaries only; blocks that need if-scope extraction fall back to greedy; reported vs greedy)"
+        ),
+    )
+    sp.add_argument(
+        "--cost-report",
+        help="Write static runtime cost report JSON to this path and print hotspot table (with --plan)",
+    )
+    sp.add_argument(
+        "--format",
+        choices=["pretty", "compact"],
+        default="pretty",
+        help="plan.json format: pretty (default) or compact (minified + string table)",
+    )
+    sp.add_argument("--base", help="Previously printed plan.json to diff against (with --plan and --delta)")
+    sp.add_argument("--delta", help="Write row delta (added/changed/removed rows) vs --base to this path")
+    sp.add_argument(
+        "--row-hashes",
+        action="store_true",
+        help="Embed per-row content hashes and a plan fingerprint as `meta` (with --plan)",
+    )
+    sp.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write plan incrementally while compiling (same output, lower peak memory; with --plan)",
+    )
+    sp.add_argument(
+        "-O",
+        dest="opt_level",
+        choices=["0", "1", "2", "s"],
+        default="0",
+        help="Optimization preset: -O0 (default, historical output), -O1, -O2, -Os (with --plan)",
+    )
+    sp.add_argument("--enable-pass", action="append", default=[], metavar="NAME", help="Enable a single pass")
+    sp.add_argument("--disable-pass", action="append", default=[], metavar="NAME", help="Disable a single pass")
+    sp.add_argument(
+        "--fingerprint-only",
+        action="store_true",
+        help="Only check whether compiling would change --plan (exit 0: unchanged, 1: changed); writes nothing",
+    )
+    sp.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Also write N balanced plan.shard-K.json parts + plan.shards.json manifest for parallel printing (with --plan)",
+    )
+    sp.add_argument(
+        "--pass-stats",
+        action="store_true",
+        help="Print per-pass wall time and size delta (with --plan)",
+    )
+    sp.add_argument(
+        "--events",
+        default=None,
+        metavar="OUT.jsonl",
+        help="Append structured compiler events (stages, auto-split, unresolved lines, cache) as JSON lines",
+    )
+    sp.add_argument(
+        "--profile",
+        default=None,
+        metavar="OUT.json",
+        help="Write per-stage/per-block/per-line timings as a Chrome trace (chrome://tracing, Perfetto)",
+    )
+    sp.add_argument(
+        "--mem-report",
+        default=None,
+        metavar="OUT.json",
+        help="Write per-stage peak/retained memory and top allocation sites (tracemalloc; slows compile down)",
+    )
 
-    sp_paths = sub.add_parser("paths", help="Print resolved paths (data_root/out/docs/etc)")
-    sp_paths.set_defaults(func=_cmd_paths)
 
-    sp_export = sub.add_parser("exportcode", help="Convert exportcode_*.json (from BetterCode) to .mldsl")
-    sp_export.add_argument("export_json", help="Path to exportcode_*.json")
-    sp_export.add_argument(
+def _add_watch_args(sp: argparse.ArgumentParser) -> None:
+    from mldsl_watch import WATCH_DEBOUNCE_S, WATCH_INTERVAL_S
+
+    _add_compile_args(sp)
+    sp.add_argument("--interval", type=float, default=WATCH_INTERVAL_S, help="Polling interval, seconds")
+    sp.add_argument(
+        "--debounce",
+        type=float,
+        default=WATCH_DEBOUNCE_S,
+        help="Rebuild once files were unchanged for this long, seconds",
+    )
+
+
+def _add_validate_plan_args(sp: argparse.ArgumentParser) -> None:
+    sp.add_argument("plan", help="Path to plan.json (pretty or compact)")
+    sp.add_argument("--max-issues", type=int, default=50, help="Stop collecting after this many issues")
+
+
+def _add_link_args(sp: argparse.ArgumentParser) -> None:
+    sp.add_argument("plans", nargs="+", help="plan.json files, in placement order")
+    sp.add_argument("-o", "--out", required=True, help="Write the linked plan to this path")
+    sp.add_argument("--format", choices=["pretty", "compact"], default="pretty", help="Output plan format")
+    sp.add_argument("--row-hashes", action="store_true", help="Embed per-row content hashes as `meta`")
+
+
+def _add_exportcode_args(sp: argparse.ArgumentParser) -> None:
+    sp.add_argument("export_json", help="Path to exportcode_*.json")
+    sp.add_argument(
         "--api",
         default=None,
         help="Path to api_aliases.json (default: resolved MLDSL out/api_aliases.json)",
     )
-    sp_export.add_argument("-o", "--out", default=None, help="Output .mldsl path (default: <export>.mldsl)")
-    sp_export.set_defaults(func=_cmd_exportcode)
+    sp.add_argument("-o", "--out", default=None, help="Output .mldsl path (default: <export>.mldsl)")
+
+
+# name -> (help, arguments, handler). Arguments are added only for the subcommand being run.
+SUBCOMMANDS = {
+    "build-all": ("Generate out/ (catalog, api_aliases, gamevalues, docs)", None, _cmd_build_all),
+    "compile": ("Compile .mldsl to /placeadvanced commands or plan.json", _add_compile_args, _cmd_compile),
+    "watch": (
+        "Recompile --plan on every change of the .mldsl file or its imports",
+        _add_watch_args,
+        _cmd_watch,
+    ),
+    "validate-plan": (
+        "Check plan.json schema (rows, headers, args syntax)",
+        _add_validate_plan_args,
+        _cmd_validate_plan,
+    ),
+    "link": (
+        "Merge compiled plans into one plan (dedupe shared funcs, resolve name clashes)",
+        _add_link_args,
+        _cmd_link,
+    ),
+    "paths": ("Print resolved paths (data_root/out/docs/etc)", None, _cmd_paths),
+    "exportcode": ("Convert exportcode_*.json (from BetterCode) to .mldsl", _add_exportcode_args, _cmd_exportcode),
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="mldsl", description="MLDSL compiler/build tools")
+    sub = p.add_subparsers(dest="cmd", required=True)
 
-    eff_argv = list(sys.argv[1:] if argv is None else argv)
-    ns = p.parse_args(_normalize_legacy_cli_argv(eff_argv))
+    eff_argv = _normalize_legacy_cli_argv(list(sys.argv[1:] if argv is None else argv))
+    chosen = eff_argv[0] if eff_argv else None
+    for name, (help_text, add_args, handler) in SUBCOMMANDS.items():
+        sp = sub.add_parser(name, help=help_text)
+        if add_args is not None and name == chosen:
+            add_args(sp)
+        sp.set_defaults(func=handler)
+
+    ns = p.parse_args(eff_argv)
+    # `--events` or MLDSL_EVENTS: append compiler events as JSONL.
+    from mldsl_events import env_jsonl_path, jsonl_sink
+
+    cli_events = getattr(ns, "events", None)
+    events_path = Path(cli_events).expanduser() if cli_events else env_jsonl_path()
+    if events_path:
+        with jsonl_sink(events_path):
+            return int(ns.func(ns))
     return int(ns.func(ns))
 
 
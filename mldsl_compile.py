@@ -2,27 +2,65 @@ import json
 import re
 import argparse
 import ast
+import bisect
 import os
+import time
 from pathlib import Path
+from sys import intern
 
+import mldsl_events
+from mldsl_api_snapshot import ApiSnapshot, load_fresh_snapshot, snapshot_path_for, write_api_snapshot
 from mldsl_paths import (
     actions_catalog_path,
     aliases_json_path,
     api_aliases_path,
     allactions_txt_path,
+    bundled_api_snapshot_path,
     ensure_dirs,
     gamevalues_path,
 )
+from mldsl_passes import PASSES, PassManager, format_pass_stats, resolve_passes
+from mldsl_plan import (
+    AUTO_SPLIT_FUNC_PREFIX,
+    EVENT_HEADER_BLOCKS,
+    FUNC_HEADER_BLOCK,
+    LOOP_HEADER_BLOCK,
+    OUTLINE_FUNC_PREFIX,
+    PLAN_FORMATS,
+    PlanStreamWriter,
+    RowSpool,
+    call_target,
+    dumps_plan,
+    join_rows,
+    read_plan,
+    row_func_name,
+    split_rows,
+    write_plan,
+)
+from mldsl_validate import PlanValidator, format_issues, post_compile_budget_s
 
 API_PATH = api_aliases_path()
 ALIASES_PATH = aliases_json_path()
 ALLACTIONS_PATH = allactions_txt_path()
 GAMEVALUES_PATH = gamevalues_path()
 MAX_CMD_LEN = 240
+# Virtual entry file name of in-memory sources (`compile_source`, `mldsl compile -`).
+STDIN_SOURCE_NAME = "<stdin>.mldsl"
+# Commands mode: rows longer than MAX_CMD_LEN continue in funcs with this prefix.
+COMMAND_CONT_FUNC_PREFIX = "__cmd_cont_"
+# Condition blocks open a scope closed by `skip` (select `purpur_block` does not).
+COMMAND_SCOPE_BLOCKS = frozenset({"planks", "red_nether_brick", "brick_block", "obsidian", "end_stone"})
 MAX_ACTIONS_PER_ROW = 43
-AUTO_SPLIT_FUNC_PREFIX = "__autosplit_row_"
 AUTO_SPLIT_DEBUG = os.environ.get("MLDSL_AUTOSPLIT_DEBUG", "").strip().lower() in {"1", "true", "yes", "on"}
 COMPILE_DEEP_DEBUG = os.environ.get("MLDSL_COMPILE_DEEP_DEBUG", "").strip().lower() in {"1", "true", "yes", "on"}
+# Size optimization (`outline`): helpers use OUTLINE_FUNC_PREFIX so autosplit post-passes leave them alone.
+OUTLINE_MIN_LEN = 4
+# Placement cost of one extra physical row (header + row switch in the printer), in blocks.
+OUTLINE_ROW_COST = 2
+# Runtime cost of one extra call hop, in blocks; kept low since the pass targets block count.
+OUTLINE_CALL_HOP_COST = 1
+# Call-chain row packers: `greedy` (furthest safe cut) or `dp` (global min rows, then min selection restores).
+ROW_PACKERS = ("greedy", "dp")
 AUTO_SPLIT_MAX_ITERS = int(os.environ.get("MLDSL_AUTOSPLIT_MAX_ITERS", "50000") or "50000")
 
 # Internal stacks for function args/returns. Names must be rare to avoid clashing with user variables in the world.
@@ -34,6 +72,8 @@ TMP_VAR_PREFIX = "__mldsl_tmp"
 STACK_TOP_INDEX = 1
 
 
+# Free-text traces gated by MLDSL_AUTOSPLIT_DEBUG / MLDSL_COMPILE_DEEP_DEBUG; they stay raw stderr prints on purpose.
+# Machine-readable decisions go through mldsl_events (`autosplit`, `stage`, ...), not through these helpers.
 def _autosplit_dbg(msg: str):
     if not AUTO_SPLIT_DEBUG:
         return
@@ -243,6 +283,394 @@ def _promote_autosplit_targets_into_named_wrappers(entries: list[dict]) -> tuple
     return compact, promoted
 
 
+def _tree_shake_unreachable_funcs(entries: list[dict], exported: set[str] | None = None) -> tuple[list[dict], int, int, int]:
+    """
+    Drops `func` rows that are not reachable from events/loops (and explicitly exported funcs).
+    Returns: (entries, dropped_funcs, dropped_rows, dropped_bytes) where bytes are UTF-8 bytes of minified JSON.
+    Dynamic call targets (`call(var(x))`) make reachability unknowable, so the pass is a no-op then.
+    """
+    if not entries:
+        return entries, 0, 0, 0
+
+    rows = split_rows(entries)
+    func_rows: dict[str, list[int]] = {}
+    calls_by_row: list[set[str]] = []
+    roots: set[str] = set(exported or ())
+    root_rows: list[int] = []
+    for idx, row in enumerate(rows):
+        targets: set[str] = set()
+        for e in row[1:]:
+            is_call, target = call_target(e)
+            if not is_call:
+                continue
+            if target is None:
+                return entries, 0, 0, 0
+            targets.add(target)
+        calls_by_row.append(targets)
+        fn_name = row_func_name(row)
+        if fn_name is None:
+            if row[0].get("block") in EVENT_HEADER_BLOCKS or row[0].get("block") == LOOP_HEADER_BLOCK:
+                root_rows.append(idx)
+            else:
+                # Unknown row shape: keep plan untouched rather than guessing.
+                return entries, 0, 0, 0
+            continue
+        func_rows.setdefault(fn_name, []).append(idx)
+
+    if not root_rows and not roots:
+        return entries, 0, 0, 0
+
+    reachable: set[str] = set()
+    queue: list[str] = [t for r in root_rows for t in calls_by_row[r]]
+    queue.extend(roots)
+    while queue:
+        fn_name = queue.pop()
+        if fn_name in reachable:
+            continue
+        reachable.add(fn_name)
+        for r in func_rows.get(fn_name, []):
+            queue.extend(calls_by_row[r] - reachable)
+
+    dropped = [n for n in func_rows if n not in reachable]
+    if not dropped:
+        return entries, 0, 0, 0
+    drop_rows: set[int] = {r for n in dropped for r in func_rows[n]}
+    dropped_bytes = sum(
+        len(json.dumps(e, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        for r in drop_rows
+        for e in rows[r]
+    )
+    kept = [row for idx, row in enumerate(rows) if idx not in drop_rows]
+    return join_rows(kept), len(dropped), len(drop_rows), dropped_bytes
+
+
+class Action:
+    """
+    One compiled action block, from parsing until row emission (`to_entry`).
+    `block`/`name` are interned (a few hundred distinct values across millions of actions);
+    `if_open` tags the opener of a conditional scope (closed by a `skip` action).
+    Records are immutable by convention: equality/hash cover all fields, so they serve as keys.
+    """
+
+    __slots__ = ("block", "name", "args", "negated", "if_open")
+
+    def __init__(self, block: str, name: str, args: str, negated: bool = False, if_open: bool = False):
+        self.block = intern(block)
+        self.name = intern(name)
+        self.args = args
+        self.negated = negated
+        self.if_open = if_open
+
+    def _key(self) -> tuple:
+        return (self.block, self.name, self.args, self.negated, self.if_open)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Action):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        flags = "".join(f", {f}=True" for f in ("negated", "if_open") if getattr(self, f))
+        return f"Action({self.block!r}, {self.name!r}, {self.args!r}{flags})"
+
+    def replace(self, *, negated: bool | None = None, if_open: bool | None = None) -> "Action":
+        return Action(
+            self.block,
+            self.name,
+            self.args,
+            self.negated if negated is None else negated,
+            self.if_open if if_open is None else if_open,
+        )
+
+    def same_block(self, other: "Action") -> bool:
+        """Same placed block (block/name/args), flags ignored."""
+        return self.block == other.block and self.name == other.name and self.args == other.args
+
+    def to_entry(self) -> dict:
+        entry = {"block": self.block, "name": self.name, "args": (self.args or "no")}
+        if self.negated:
+            entry["negated"] = True
+        return entry
+
+
+def _calc_if_depths(actions: list[Action]) -> list[int]:
+    out: list[int] = []
+    depth = 0
+    for a in actions:
+        if a.if_open:
+            depth += 1
+        out.append(max(0, depth))
+        if (a.block == "skip") and depth > 0:
+            depth -= 1
+    return out
+
+def _calc_safe_boundaries(actions: list[Action]) -> list[tuple[int, Action | None]]:
+    out: list[tuple[int, Action | None]] = []
+    depth = 0
+    for i, a in enumerate(actions, start=1):
+        if a.if_open:
+            depth += 1
+        if depth == 0:
+            out.append((i, None))
+        if (a.block == "skip") and depth > 0:
+            depth -= 1
+    return out
+
+
+def _pack_row_cuts(
+    n: int,
+    boundaries: list[tuple[int, Action | None]],
+    *,
+    restore_extra,
+    mode: str = "greedy",
+) -> tuple[list[int], int] | None:
+    """
+    Plans call-chain cut positions for a block of `n` actions over safe top-level boundaries.
+    Each cut costs `call(next)` plus `restore_extra(sel)` (selection reset + restore in the next part).
+    `greedy` mirrors autosplit (furthest cut each step); `dp` minimizes (rows, selection restores) globally.
+    Only top-level boundaries are searched: `if` scopes are not part of the DP state, so a block that needs
+    scope extraction gets None here and is split by the greedy autosplit (extraction included).
+    Returns (cuts, restores) or None when no packing exists without scope extraction.
+    """
+    cap = MAX_ACTIONS_PER_ROW - 1
+    bounds = sorted({p: sel for p, sel in boundaries if 0 < p < n}.items())
+    positions = [p for p, _sel in bounds]
+    if mode == "greedy":
+        cuts: list[int] = []
+        restores = 0
+        start, carry = 0, 0
+        while carry + n - start > cap:
+            window = bounds[bisect.bisect_right(positions, start) : bisect.bisect_right(positions, start + cap)]
+            cands = [(p, sel) for p, sel in window if carry + (p - start) + 1 + restore_extra(sel) <= cap]
+            if not cands:
+                return None
+            p, sel = max(cands, key=lambda t: (t[0], 1 if t[1] is None else 0))
+            carry = restore_extra(sel)
+            restores += carry
+            cuts.append(p)
+            start = p
+        return cuts, restores
+
+    # DP state: (start position, restore action carried into this part) -> (rows, restores, prev state).
+    best: dict[tuple[int, int], tuple[int, int, tuple[int, int] | None]] = {(0, 0): (0, 0, None)}
+    final: tuple[int, int, tuple[int, int]] | None = None
+    extras = [restore_extra(sel) for _p, sel in bounds]
+    order = [0, *positions]
+    for start in order:
+        first = bisect.bisect_right(positions, start)
+        for carry in (0, 1):
+            state = (start, carry)
+            if state not in best:
+                continue
+            rows, restores, _prev = best[state]
+            if carry + n - start <= cap:
+                cand = (rows + 1, restores, state)
+                if final is None or cand[:2] < final[:2]:
+                    final = cand
+            # Parts are at most `cap` long, so only boundaries in (start, start + cap) are reachable.
+            for i in range(first, len(positions)):
+                p, extra = positions[i], extras[i]
+                if carry + (p - start) + 1 > cap:
+                    break
+                if carry + (p - start) + 1 + extra > cap:
+                    continue
+                nxt = (p, extra)
+                cand = (rows + 1, restores + extra, state)
+                if nxt not in best or cand[:2] < best[nxt][:2]:
+                    best[nxt] = cand
+    if final is None:
+        return None
+    cuts = []
+    state = final[2]
+    while state is not None and state[0] > 0:
+        cuts.append(state[0])
+        state = best[state][2]
+    return cuts[::-1], final[1]
+
+
+# Streaming placeholder for non-call body entries: keeps row lengths for post-passes without the payload.
+_STREAM_BODY_PLACEHOLDER = {"block": "__streamed__", "name": "", "args": ""}
+
+
+def _stream_proxy_row(row: list[dict], row_id: int) -> list[dict]:
+    """
+    Light copy of a spooled row for entries-stage passes: header (tagged with `__row`) and call entries
+    (tagged with `__idx`) are real dicts, everything else shares one placeholder.
+    Tree-shake byte savings are therefore approximate in streaming mode.
+    """
+    proxy = [dict(row[0], __row=row_id)]
+    for idx, e in enumerate(row[1:], start=1):
+        if call_target(e)[0] or _extract_autosplit_call_target(e):
+            proxy.append(dict(e, __idx=idx))
+        else:
+            proxy.append(_STREAM_BODY_PLACEHOLDER)
+    return proxy
+
+
+def _outline_repeated_action_sequences(
+    blocks: list[dict],
+    *,
+    make_call,
+    alloc_name,
+    is_barrier,
+    is_default_selection,
+    min_len: int = OUTLINE_MIN_LEN,
+    max_len: int = MAX_ACTIONS_PER_ROW - 1,
+) -> tuple[list[dict], int, int]:
+    """
+    Size optimization over flushed block records (`kind/name/ticks/actions/if_depths/boundaries`):
+    repeated action sequences are moved into one helper `func` and replaced with `call(helper)`.
+
+    A sequence is outlined only when it is scope-balanced (every `if` opened inside is closed inside),
+    contains no selection changes / bare conditionals (`is_barrier`), and starts while the default
+    selection is active (helpers, like autosplit helpers, run with the default selection).
+    Score per sequence: placed blocks saved minus helper row cost and per-call hop cost.
+    Returns: (blocks + helper blocks, helpers_created, blocks_saved).
+    """
+    mod = (1 << 61) - 1
+    base = 1_000_003
+    helpers_created = 0
+    blocks_saved = 0
+    key_ids: dict[Action, int] = {}
+    powers = [1] * (max_len + 1)
+    for k in range(1, max_len + 1):
+        powers[k] = (powers[k - 1] * base) % mod
+
+    while True:
+        # 1) Index every valid window by (length, rolling hash).
+        per_block: list[tuple[list[Action], list[int], list[int]]] = []
+        windows: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for b_idx, block in enumerate(blocks):
+            actions = block["actions"]
+            n = len(actions)
+            ids = [key_ids.setdefault(a, len(key_ids) + 1) for a in actions]
+            prefix = [0] * (n + 1)
+            for k, v in enumerate(ids):
+                prefix[k + 1] = (prefix[k] * base + v) % mod
+            depth_before = [0] * (n + 1)
+            sel_ok_before = [True] * (n + 1)
+            depth = 0
+            sel_ok = True
+            barrier = [False] * n
+            for k, a in enumerate(actions):
+                depth_before[k] = depth
+                sel_ok_before[k] = sel_ok
+                barrier[k] = bool(is_barrier(a))
+                if a.if_open:
+                    depth += 1
+                elif a.block == "skip" and depth > 0:
+                    depth -= 1
+                if barrier[k] and not a.if_open:
+                    sel_ok = bool(is_default_selection(a))
+            depth_before[n] = depth
+            sel_ok_before[n] = sel_ok
+            per_block.append((actions, depth_before, prefix))
+            for i in range(n):
+                if not sel_ok_before[i] or barrier[i]:
+                    continue
+                rel = 0
+                for j in range(i + 1, min(n, i + max_len) + 1):
+                    a = actions[j - 1]
+                    if barrier[j - 1] and not a.if_open:
+                        break
+                    if a.if_open:
+                        rel += 1
+                    elif a.block == "skip":
+                        rel -= 1
+                        if rel < 0:
+                            break
+                    length = j - i
+                    if rel == 0 and length >= min_len:
+                        h = (prefix[j] - prefix[i] * powers[length]) % mod
+                        windows.setdefault((length, h), []).append((b_idx, i))
+
+        # 2) Score candidates, best first; claim non-overlapping occurrences.
+        def _score(length: int, count: int) -> int:
+            saved = count * (length - 1) - (length + 1)
+            return saved - OUTLINE_ROW_COST - count * OUTLINE_CALL_HOP_COST
+
+        candidates: list[tuple[int, int, int, tuple[int, int]]] = []
+        for (length, h), occ in windows.items():
+            if len(occ) < 2:
+                continue
+            sc = _score(length, len(occ))
+            if sc > 0:
+                candidates.append((sc, length, -occ[0][0] * (1 << 32) - occ[0][1], (length, h)))
+        if not candidates:
+            break
+        candidates.sort(reverse=True)
+
+        claimed: dict[int, list[tuple[int, int]]] = {}
+        selected: list[tuple[int, list[tuple[int, int]]]] = []
+        for _sc, length, _pos, wkey in candidates:
+            occ = windows[wkey]
+            ref_b, ref_i = occ[0]
+            ref_keys = per_block[ref_b][0][ref_i : ref_i + length]
+            picked: list[tuple[int, int]] = []
+            for b_idx, i in occ:
+                taken = claimed.get(b_idx, []) + [(p, p + length) for bb, p in picked if bb == b_idx]
+                if any(i < e and s < i + length for s, e in taken):
+                    continue
+                if per_block[b_idx][0][i : i + length] != ref_keys:
+                    continue
+                picked.append((b_idx, i))
+            if len(picked) < 2 or _score(length, len(picked)) <= 0:
+                continue
+            for b_idx, i in picked:
+                claimed.setdefault(b_idx, []).append((i, i + length))
+            selected.append((length, picked))
+        if not selected:
+            break
+
+        # 3) Rewrite blocks (right-to-left per block keeps earlier offsets valid) and append helpers.
+        replacements: dict[int, list[tuple[int, int, Action]]] = {}
+        new_helpers: list[dict] = []
+        for length, picked in selected:
+            ref_b, ref_i = picked[0]
+            body = list(per_block[ref_b][0][ref_i : ref_i + length])
+            helper_name = alloc_name()
+            call_action = make_call(helper_name)
+            new_helpers.append(
+                {
+                    "kind": "func",
+                    "name": helper_name,
+                    "ticks": None,
+                    "actions": body,
+                    "if_depths": _calc_if_depths(body),
+                    "boundaries": _calc_safe_boundaries(body),
+                }
+            )
+            for b_idx, i in picked:
+                replacements.setdefault(b_idx, []).append((i, i + length, call_action))
+            helpers_created += 1
+            blocks_saved += len(picked) * (length - 1) - (length + 1)
+
+        for b_idx, reps in replacements.items():
+            block = blocks[b_idx]
+            actions = list(block["actions"])
+            if_depths = list(block["if_depths"])
+            boundaries = list(block["boundaries"])
+            depth_before = per_block[b_idx][1]
+            for i, j, call_action in sorted(reps, reverse=True):
+                actions[i:j] = [call_action]
+                if_depths[i:j] = [depth_before[i]]
+                shift = (j - i) - 1
+                boundaries = [
+                    (p if p <= i else (i + 1 if p == j else p - shift), sel)
+                    for p, sel in boundaries
+                    if not (i < p < j)
+                ]
+            block["actions"] = actions
+            block["if_depths"] = if_depths
+            block["boundaries"] = boundaries
+        blocks = [*blocks, *new_helpers]
+
+    return blocks, helpers_created, blocks_saved
+
+
 def parse_item_display_name(raw: str) -> str:
     if not raw:
         return ""
@@ -266,6 +694,31 @@ def normalized_call_limit() -> int | None:
     return v if v > 0 else None
 
 
+# Parsed data files kept between compiles of one process (`mldsl watch`): key -> (file stamps, value).
+_data_memo: dict[str, tuple[tuple, object]] = {}
+
+
+def _file_stamp(path: Path) -> tuple:
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return (str(path), None, None)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def _memo_by_files(key: str, paths: list[Path], build):
+    """`build()` result, reused while none of `paths` changed (mtime/size)."""
+    stamps = tuple(_file_stamp(p) for p in paths)
+    hit = _data_memo.get(key)
+    if hit is not None and hit[0] == stamps:
+        mldsl_events.emit("cache", cache=key, hit=True, level="memory")
+        return hit[1]
+    mldsl_events.emit("cache", cache=key, hit=False)
+    value = build()
+    _data_memo[key] = (stamps, value)
+    return value
+
+
 def load_known_events() -> dict:
     """
     Returns: norm(menu|sign2) -> (block, menuName, expectedSign2)
@@ -273,6 +726,10 @@ def load_known_events() -> dict:
     - expectedSign2: sign text used for skip-check
     """
     p = actions_catalog_path()
+    return _memo_by_files("known_events", [p], lambda: _load_known_events(p))
+
+
+def _load_known_events(p: Path) -> dict:
     if not p.exists():
         return {}
     try:
@@ -309,7 +766,20 @@ def load_known_events() -> dict:
 
 
 def load_api():
+    """
+    Parsed API (`module -> {canon: spec}`). Prefers a precompiled snapshot (bundled next to the exe,
+    or the cache next to api_aliases.json) that is not older than the JSON; otherwise reads the JSON
+    and refreshes the cache.
+    """
     ensure_dirs()
+    paths = [API_PATH, bundled_api_snapshot_path(), snapshot_path_for(API_PATH)]
+    return _memo_by_files("api", paths, _load_api_uncached)
+
+
+def _load_api_uncached():
+    api = load_fresh_snapshot(API_PATH, [bundled_api_snapshot_path(), snapshot_path_for(API_PATH)])
+    if api is not None:
+        return api
     if not API_PATH.exists():
         raise FileNotFoundError(
             f"Не найден API файл: {API_PATH}\n"
@@ -317,7 +787,13 @@ def load_api():
             "  python tools/build_all.py\n"
             "Или укажи MLDSL_DATA_DIR/MLDSL_PORTABLE если используешь portable установку."
         )
-    return json.loads(API_PATH.read_text(encoding="utf-8"))
+    json_mtime = API_PATH.stat().st_mtime_ns
+    api = ApiSnapshot(json.loads(API_PATH.read_text(encoding="utf-8")))
+    try:
+        write_api_snapshot(api, snapshot_path_for(API_PATH), mtime_ns=json_mtime)
+    except OSError:
+        pass
+    return api
 
 _gamevalues_cache = None
 
@@ -456,6 +932,10 @@ def norm_key(text: str) -> str:
 
 
 def load_sign1_aliases() -> dict:
+    return _memo_by_files("sign1_aliases", [ALIASES_PATH], _load_sign1_aliases)
+
+
+def _load_sign1_aliases() -> dict:
     if not ALIASES_PATH.exists():
         return {}
     data = json.loads(ALIASES_PATH.read_text(encoding="utf-8"))
@@ -468,6 +948,10 @@ def load_allactions_map() -> dict:
     Parses allactions.txt entries like: [(minecraft:cobblestone) Действие игрока]
     Returns normalized label -> registry id (minecraft:...)
     """
+    return _memo_by_files("allactions", [ALLACTIONS_PATH], _load_allactions_map)
+
+
+def _load_allactions_map() -> dict:
     if not ALLACTIONS_PATH.exists():
         return {}
     text = ALLACTIONS_PATH.read_text(encoding="utf-8", errors="replace")
@@ -482,6 +966,44 @@ def load_allactions_map() -> dict:
     return out
 
 
+def resolve_import_path(base: Path, raw: str) -> Path:
+    """Path of `import <raw>` written in file `base` (relative to it, `.mldsl` implied)."""
+    rel = raw.replace("\\", "/")
+    if not rel.lower().endswith(".mldsl"):
+        rel += ".mldsl"
+    return (base.parent / rel).resolve()
+
+
+def source_closure(entry: Path, *, source: str | None = None) -> list[Path]:
+    """
+    Files of the `import` closure of `entry` (entry first, then imports depth-first, as inlined by the compiler).
+    Missing imports are listed too (the compile itself reports them). `source` replaces the contents of `entry`.
+    """
+    seen: list[Path] = []
+    visited: set[Path] = set()
+    entry_rp = Path(entry).resolve()
+    stack = [entry_rp]
+    while stack:
+        rp = stack.pop()
+        if rp in visited:
+            continue
+        visited.add(rp)
+        seen.append(rp)
+        if source is not None and rp == entry_rp:
+            text = source
+        elif not rp.exists():
+            continue
+        else:
+            text = rp.read_text(encoding="utf-8-sig")
+        imports = []
+        for raw in text.splitlines():
+            m = IMPORT_RE.match(raw.strip())
+            if m:
+                imports.append(resolve_import_path(rp, m.group(1).strip().strip("\"'")))
+        stack.extend(reversed(imports))
+    return seen
+
+
 def event_variant_to_name(variant: str) -> str:
     # MVP mapping; extend later
     v = (variant or "").strip().lower()
@@ -536,6 +1058,10 @@ def find_action(api: dict, module: str, func: str):
     if func in mod:
         return func, mod[func]
     # alias match
+    alias_index = getattr(api, "alias_index", None)
+    if alias_index is not None:
+        canon = alias_index.get(module, {}).get(func)
+        return (canon, mod[canon]) if canon is not None else (None, None)
     for canon, spec in mod.items():
         aliases = spec.get("aliases") or []
         if func in aliases:
@@ -1009,6 +1535,8 @@ ASSIGN_RE_DYNAMIC = re.compile(
 )
 SAVE_SHORTHAND_RE = re.compile(rf"^\s*({NAME_RE})\s*~\s*(.+?)\s*;?\s*$", re.I)
 IMPORT_RE = re.compile(r"^\s*(?:import|use|использовать)\s+([^\s;#]+)\s*;?\s*$", re.I)
+# export <func>[, <func>...]: keep funcs as tree-shake roots (e.g. called from other plans in the world).
+EXPORT_RE = re.compile(r"^\s*(?:export|экспорт)\s+([\w\u0400-\u04FF]+(?:\s*,\s*[\w\u0400-\u04FF]+)*)\s*;?\s*$", re.I)
 
 IFPLAYER_RE = re.compile(r"^\s*if_?player\.([\w\u0400-\u04FF]+)(?:\s*\((.*)\))?\s*\{\s*$", re.I)
 SELECTOBJECT_IFPLAYER_RE = re.compile(r"^\s*SelectObject\.player\.IfPlayer\.([\w\u0400-\u04FF]+)\s*\{\s*$", re.I)
@@ -1198,7 +1726,9 @@ def operand_to_text_token(raw: str) -> str:
         return s
     return f"var({s})"
 
-def compile_if_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
+def compile_if_condition(
+    api: dict, expr: str, *, spec_sink: dict[int, dict] | None = None
+) -> list[tuple[list[str], dict]]:
     e = (expr or "").strip()
     if not e:
         raise ValueError("if: empty condition")
@@ -1209,7 +1739,7 @@ def compile_if_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
     )
     if m_exists:
         v = m_exists.group(1)
-        res = compile_line(api, f"if_value.var(var=var({v}))")
+        res = compile_line(api, f"if_value.var(var=var({v}))", spec_sink=spec_sink)
         return [res]
 
     # range: low <= x <= high  OR  high >= x >= low
@@ -1251,6 +1781,7 @@ def compile_if_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
             res = compile_line(
                 api,
                 f'if_value.number_2(num={num}, num2={num2}, num3={num3}, tip_proverki_dlya_bolshe="{greater}", tip_proverki_dlya_menshe="{less}")',
+                spec_sink=spec_sink,
             )
             return [res]
 
@@ -1270,23 +1801,25 @@ def compile_if_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
             args = [f"num={checked}", f"num3={bound}"]
             if op == "<=":
                 args.append('tip_proverki_dlya_menshe="≤ (Меньше или равно)"')
-            res = compile_line(api, "if_value.number_2(" + ", ".join(args) + ")")
+            res = compile_line(api, "if_value.number_2(" + ", ".join(args) + ")", spec_sink=spec_sink)
             return [res]
         if op in (">", ">="):
             args = [f"num={checked}", f"num2={bound}"]
             if op == ">=":
                 args.append('tip_proverki_dlya_bolshe="≥ (Больше или равно)"')
-            res = compile_line(api, "if_value.number_2(" + ", ".join(args) + ")")
+            res = compile_line(api, "if_value.number_2(" + ", ".join(args) + ")", spec_sink=spec_sink)
             return [res]
 
     # fallback (advanced): allow direct if_value.<func>(...) by writing: if if_value.xxx(...)
     if e.startswith("if_value.") or e.startswith("if_player.") or e.startswith("if_game."):
-        res = compile_line(api, e)
+        res = compile_line(api, e, spec_sink=spec_sink)
         return [res]
 
     raise ValueError(f"if: unsupported condition: {e}")
 
-def compile_iftext_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
+def compile_iftext_condition(
+    api: dict, expr: str, *, spec_sink: dict[int, dict] | None = None
+) -> list[tuple[list[str], dict]]:
     e = (expr or "").strip()
     if not e:
         raise ValueError("iftext: empty condition")
@@ -1304,7 +1837,7 @@ def compile_iftext_condition(api: dict, expr: str) -> list[tuple[list[str], dict
     target = operand_to_text_token(target_raw)
     opts = [operand_to_text_token(p) for p in parts[:7]]
     args = [f"text={target}"] + [f"text{i+2}={v}" for i, v in enumerate(opts)]
-    res = compile_line(api, f"if_value.text(" + ", ".join(args) + ")")
+    res = compile_line(api, f"if_value.text(" + ", ".join(args) + ")", spec_sink=spec_sink)
     return [res]
 
 def flatten_binop(node, op_type):
@@ -1334,7 +1867,7 @@ def flatten_left_assoc(node, op_type):
     out.reverse()
     return out
 
-def compile_line(api: dict, line: str):
+def compile_line(api: dict, line: str, *, spec_sink: dict[int, dict] | None = None):
     m = CALL_RE.match(line)
     if not m:
         return None
@@ -1694,9 +2227,18 @@ def compile_line(api: dict, line: str):
                 f"enum: {', '.join(map(str, known_enums)) or '-'}"
             )
 
+    if spec_sink is not None:
+        spec_sink[id(spec)] = spec
     return pieces, spec
 
-def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None = None, debug_stacks: bool = False):
+def compile_builtin(
+    api: dict,
+    line: str,
+    func_sigs: dict[str, list[str]] | None = None,
+    debug_stacks: bool = False,
+    *,
+    spec_sink: dict[int, dict] | None = None,
+):
     # Builtin/sugar parser must not intercept canonical module calls.
     # Those are handled by compile_line()/formula path.
     if CALL_RE.match(line or ""):
@@ -1794,15 +2336,24 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
                 res = compile_line(
                     api,
                     f"array.vstavit_v_massiv(arr=arr({ARGS_STACK_NAME}), num=num({STACK_TOP_INDEX}), value={val})",
+                    spec_sink=spec_sink,
                 )
                 if not res:
                     raise ValueError("args: не найдено действие 'Вставить в массив'")
                 out.append(res)
             if debug_stacks:
-                res = compile_line(api, f"array.get_array_2(arr=arr({ARGS_STACK_NAME}), var=var({TMP_VAR_PREFIX}argslen))")
+                res = compile_line(
+                    api,
+                    f"array.get_array_2(arr=arr({ARGS_STACK_NAME}), var=var({TMP_VAR_PREFIX}argslen))",
+                    spec_sink=spec_sink,
+                )
                 if res:
                     out.append(res)
-                res = compile_line(api, f'player.message("DBG args_len=%var({TMP_VAR_PREFIX}argslen)%")')
+                res = compile_line(
+                    api,
+                    f'player.message("DBG args_len=%var({TMP_VAR_PREFIX}argslen)%")',
+                    spec_sink=spec_sink,
+                )
                 if res:
                     out.append(res)
             return out
@@ -1822,9 +2373,9 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
                 key = "value" if idx == 1 else f"value{idx}"
                 parts.append(f"{key}={val}")
 
-            res = compile_line(api, f"array.ochistit_sozdat_massiv({', '.join(parts)})")
+            res = compile_line(api, f"array.ochistit_sozdat_massiv({', '.join(parts)})", spec_sink=spec_sink)
             if not res:
-                res = compile_line(api, f"array.sozdat_massiv({', '.join(parts)})")
+                res = compile_line(api, f"array.sozdat_massiv({', '.join(parts)})", spec_sink=spec_sink)
             if not res:
                 raise ValueError("array literal: не найдено действие 'Очистить/Создать массив'")
             out.append(res)
@@ -1836,7 +2387,7 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
                 for idx, val in enumerate(chunk, start=1):
                     key = "value" if idx == 1 else f"value{idx}"
                     parts.append(f"{key}={val}")
-                res = compile_line(api, f"array.add_array({', '.join(parts)})")
+                res = compile_line(api, f"array.add_array({', '.join(parts)})", spec_sink=spec_sink)
                 if not res:
                     raise ValueError("array literal: не найдено действие 'Добавить в конец массива'")
                 out.append(res)
@@ -1853,7 +2404,7 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
             else:
                 src_text = f"text(%var({src})%)"
             synthetic = f"var.text(var={wrap_var_target(name, saved)}, text={src_text}, num=num({start}), num2=num({end}))"
-            res = compile_line(api, synthetic)
+            res = compile_line(api, synthetic, spec_sink=spec_sink)
             if not res:
                 raise ValueError("slice: не найдено действие 'Обрезать текст'")
             return [res]
@@ -1864,7 +2415,7 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
             src_arr = m_idx.group(1)
             idx = int(m_idx.group(2))
             synthetic = f"array.get_array(arr=arr({src_arr}), num=num({idx}), var={wrap_var_target(name, saved)})"
-            res = compile_line(api, synthetic)
+            res = compile_line(api, synthetic, spec_sink=spec_sink)
             if not res:
                 raise ValueError("array index: не найдено действие 'Получить элемент массива'")
             return [res]
@@ -1926,30 +2477,52 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
                         raise ValueError("Function call sugar failed: no call_function action in api")
                     out.append(([f"slot(13)=text({fn})"], spec_call))
                     if debug_stacks:
-                        res = compile_line(api, f"array.get_array_2(arr=arr({RET_STACK_NAME}), var=var({TMP_VAR_PREFIX}retlen_before))")
+                        res = compile_line(
+                            api,
+                            f"array.get_array_2(arr=arr({RET_STACK_NAME}), var=var({TMP_VAR_PREFIX}retlen_before))",
+                            spec_sink=spec_sink,
+                        )
                         if res:
                             out.append(res)
-                        res = compile_line(api, f'player.message("DBG ret_len_before=%var({TMP_VAR_PREFIX}retlen_before)%")')
+                        res = compile_line(
+                            api,
+                            f'player.message("DBG ret_len_before=%var({TMP_VAR_PREFIX}retlen_before)%")',
+                            spec_sink=spec_sink,
+                        )
                         if res:
                             out.append(res)
                     # 2) read ret from __ret[top] into target var
                     target_var = wrap_var_target(name, saved)
                     res = compile_line(
-                        api, f"array.get_array(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}), var={target_var})"
+                        api,
+                        f"array.get_array(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}), var={target_var})",
+                        spec_sink=spec_sink,
                     )
                     if not res:
                         raise ValueError("return/pop: не найдено действие 'Получить элемент массива'")
                     out.append(res)
                     # 3) pop __ret[top]
-                    res = compile_line(api, f"array.remove_array(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}))")
+                    res = compile_line(
+                        api,
+                        f"array.remove_array(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}))",
+                        spec_sink=spec_sink,
+                    )
                     if not res:
                         raise ValueError("return/pop: не найдено действие 'Удалить элемент массива'")
                     out.append(res)
                     if debug_stacks:
-                        res = compile_line(api, f"array.get_array_2(arr=arr({RET_STACK_NAME}), var=var({TMP_VAR_PREFIX}retlen_after))")
+                        res = compile_line(
+                            api,
+                            f"array.get_array_2(arr=arr({RET_STACK_NAME}), var=var({TMP_VAR_PREFIX}retlen_after))",
+                            spec_sink=spec_sink,
+                        )
                         if res:
                             out.append(res)
-                        res = compile_line(api, f'player.message("DBG ret_len_after=%var({TMP_VAR_PREFIX}retlen_after)%")')
+                        res = compile_line(
+                            api,
+                            f'player.message("DBG ret_len_after=%var({TMP_VAR_PREFIX}retlen_after)%")',
+                            spec_sink=spec_sink,
+                        )
                         if res:
                             out.append(res)
                     return out
@@ -1997,7 +2570,13 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
 
         if is_supported_numeric_expr_ast(node) and isinstance(node, (ast.BinOp, ast.UnaryOp)):
             # Compile expression into one or more actions; warn about action count.
-            return compile_numeric_expression(api, target_var=var_token, expr_node=node, name_map=name_map)
+            return compile_numeric_expression(
+                api,
+                target_var=var_token,
+                expr_node=node,
+                name_map=name_map,
+                spec_sink=spec_sink,
+            )
 
         # If RHS is just a name (variable), treat it as number placeholder unless explicitly wrapped.
         if isinstance(node, ast.Name):
@@ -2011,13 +2590,29 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
                 lhs_var = wrap_var_target(name, saved)
                 rhs_any = wrap_any_value(rhs)
                 if op == "+":
-                    res = compile_line(api, f"var.set_sum(var={lhs_var}, num={lhs_var}, num2={rhs_any})")
+                    res = compile_line(
+                        api,
+                        f"var.set_sum(var={lhs_var}, num={lhs_var}, num2={rhs_any})",
+                        spec_sink=spec_sink,
+                    )
                 elif op == "-":
-                    res = compile_line(api, f"var.set_difference(var={lhs_var}, num={lhs_var}, num2={rhs_any})")
+                    res = compile_line(
+                        api,
+                        f"var.set_difference(var={lhs_var}, num={lhs_var}, num2={rhs_any})",
+                        spec_sink=spec_sink,
+                    )
                 elif op == "*":
-                    res = compile_line(api, f"var.set_product(var={lhs_var}, num={lhs_var}, num2={rhs_any})")
+                    res = compile_line(
+                        api,
+                        f"var.set_product(var={lhs_var}, num={lhs_var}, num2={rhs_any})",
+                        spec_sink=spec_sink,
+                    )
                 else:
-                    res = compile_line(api, f"var.set_quotient(var={lhs_var}, num={lhs_var}, num2={rhs_any})")
+                    res = compile_line(
+                        api,
+                        f"var.set_quotient(var={lhs_var}, num={lhs_var}, num2={rhs_any})",
+                        spec_sink=spec_sink,
+                    )
                 if not res:
                     raise ValueError(f"assignment '{op}=' failed for dynamic target: {name}")
                 return [res]
@@ -2030,10 +2625,16 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
                 aug_node = None
             if not is_supported_numeric_expr_ast(aug_node):
                 raise ValueError(f"assignment '{op}=' supports numeric expressions only: {rhs}")
-            return compile_numeric_expression(api, target_var=var_token, expr_node=aug_node, name_map=aug_map)
+            return compile_numeric_expression(
+                api,
+                target_var=var_token,
+                expr_node=aug_node,
+                name_map=aug_map,
+                spec_sink=spec_sink,
+            )
 
         # default '=' assignment (value can be text/num/...)
-        res = compile_line(api, f"var.set_value(var={var_token}, value={rhs_wrapped})")
+        res = compile_line(api, f"var.set_value(var={var_token}, value={rhs_wrapped})", spec_sink=spec_sink)
         if not res:
             raise ValueError("assignment '=' failed: no set_value action")
         return [res]
@@ -2084,7 +2685,7 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
             res = None
             for func_name in target_funcs:
                 synthetic = f"game.{func_name}({', '.join(parts)})"
-                res = compile_line(api, synthetic)
+                res = compile_line(api, synthetic, spec_sink=spec_sink)
                 if res:
                     break
             if not res:
@@ -2171,7 +2772,11 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
         # As a statement-call, discard one return value to keep __ret clean.
         # (Every func gets an implicit return if it doesn't have explicit return.)
         if not async_flag:
-            res = compile_line(api, f"array.remove_array(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}))")
+            res = compile_line(
+                api,
+                f"array.remove_array(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}))",
+                spec_sink=spec_sink,
+            )
             if not res:
                 raise ValueError("return/discard: не найдено действие 'Удалить элемент массива'")
             out.append(res)
@@ -2179,7 +2784,9 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
 
     return None
 
-def compile_op_action(api: dict, func_name: str, target_var: str, operands: list[str]):
+def compile_op_action(
+    api: dict, func_name: str, target_var: str, operands: list[str], *, spec_sink: dict[int, dict] | None = None
+):
     """
     Emits one or more actions for a numeric op with up to 10 operands per action.
     func_name is one of: set_sum, set_difference, set_product, set_quotient.
@@ -2199,11 +2806,19 @@ def compile_op_action(api: dict, func_name: str, target_var: str, operands: list
         tmp_name = f"__mlcc_acc{tmp_idx}"
         chunk = remaining[:max_terms]
         remaining = remaining[max_terms:]
-        out.append(compile_line(api, f"var.{func_name}(var=var({tmp_name}), " + ", ".join(_nums_kv(chunk)) + ")"))
+        out.append(compile_line(
+            api,
+            f"var.{func_name}(var=var({tmp_name}), " + ", ".join(_nums_kv(chunk)) + ")",
+            spec_sink=spec_sink,
+        ))
         # next action uses tmp as first operand
         remaining = [f"num(%var({tmp_name})%)"] + remaining
 
-    out.append(compile_line(api, f"var.{func_name}(var={target_var}, " + ", ".join(_nums_kv(remaining)) + ")"))
+    out.append(compile_line(
+        api,
+        f"var.{func_name}(var={target_var}, " + ", ".join(_nums_kv(remaining)) + ")",
+        spec_sink=spec_sink,
+    ))
     return out
 
 def _nums_kv(operands: list[str]) -> list[str]:
@@ -2214,7 +2829,12 @@ def _nums_kv(operands: list[str]) -> list[str]:
     return parts
 
 def compile_numeric_expression(
-    api: dict, target_var: str, expr_node, *, name_map: dict[str, str] | None = None
+    api: dict,
+    target_var: str,
+    expr_node,
+    *,
+    name_map: dict[str, str] | None = None,
+    spec_sink: dict[int, dict] | None = None,
 ) -> list[tuple[list[str], dict]]:
     """
     Compile an AST numeric expression into a list of (pieces,spec) actions.
@@ -2259,12 +2879,16 @@ def compile_numeric_expression(
         v_const = safe_eval_number_expr(raw_const)
         if v_const is not None:
             val = f"num({int(v_const) if abs(v_const-int(v_const))<1e-9 else v_const})"
-            actions.append(compile_line(api, f"var.set_value(var={target_tok}, value={val})"))
+            actions.append(compile_line(api, f"var.set_value(var={target_tok}, value={val})", spec_sink=spec_sink))
             return
 
         if isinstance(node, (ast.Constant, ast.Name)):
             actions.append(
-                compile_line(api, f"var.set_value(var={target_tok}, value={expr_to_operand(node, name_map=name_map)})")
+                compile_line(
+                    api,
+                    f"var.set_value(var={target_tok}, value={expr_to_operand(node, name_map=name_map)})",
+                    spec_sink=spec_sink,
+                )
             )
             return
 
@@ -2273,39 +2897,39 @@ def compile_numeric_expression(
             v_unary = safe_eval_number_expr(raw_unary)
             if v_unary is not None:
                 val = f"num({int(v_unary) if abs(v_unary-int(v_unary))<1e-9 else v_unary})"
-                actions.append(compile_line(api, f"var.set_value(var={target_tok}, value={val})"))
+                actions.append(compile_line(api, f"var.set_value(var={target_tok}, value={val})", spec_sink=spec_sink))
                 return
             if isinstance(node.op, ast.UAdd):
                 compile_into(target_tok, node.operand)
                 return
             # Non-constant unary minus (e.g. -x) => x * -1
             operand = ensure_value(node.operand)
-            actions.extend(compile_op_action(api, "set_product", target_tok, [operand, "num(-1)"]))
+            actions.extend(compile_op_action(api, "set_product", target_tok, [operand, "num(-1)"], spec_sink=spec_sink))
             return
 
         if isinstance(node, ast.BinOp):
             if isinstance(node.op, ast.Add):
                 operands = [ensure_value(n) for n in flatten_binop(node, ast.Add)]
-                actions.extend(compile_op_action(api, "set_sum", target_tok, operands))
+                actions.extend(compile_op_action(api, "set_sum", target_tok, operands, spec_sink=spec_sink))
                 return
             if isinstance(node.op, ast.Mult):
                 operands = [ensure_value(n) for n in flatten_binop(node, ast.Mult)]
-                actions.extend(compile_op_action(api, "set_product", target_tok, operands))
+                actions.extend(compile_op_action(api, "set_product", target_tok, operands, spec_sink=spec_sink))
                 return
             if isinstance(node.op, ast.Sub):
                 operands = [ensure_value(n) for n in flatten_left_assoc(node, ast.Sub)]
-                actions.extend(compile_op_action(api, "set_difference", target_tok, operands))
+                actions.extend(compile_op_action(api, "set_difference", target_tok, operands, spec_sink=spec_sink))
                 return
             if isinstance(node.op, ast.Div):
                 operands = [ensure_value(n) for n in flatten_left_assoc(node, ast.Div)]
-                actions.extend(compile_op_action(api, "set_quotient", target_tok, operands))
+                actions.extend(compile_op_action(api, "set_quotient", target_tok, operands, spec_sink=spec_sink))
                 return
         # leaf / unsupported: set_value with evaluated number if possible
         raw = ast.unparse(node) if hasattr(ast, "unparse") else ""
         v = safe_eval_number_expr(raw)
         if v is not None:
             val = f"num({int(v) if abs(v-int(v))<1e-9 else v})"
-            res = compile_line(api, f"var.set_value(var={target_tok}, value={val})")
+            res = compile_line(api, f"var.set_value(var={target_tok}, value={val})", spec_sink=spec_sink)
             actions.append(res)
             return
         raise ValueError("unsupported numeric expression")
@@ -2329,25 +2953,116 @@ def compile_numeric_expression(
 
     return flat
 
+def action_from_result(res, *, blocks: dict, sign1_aliases: dict, negated: bool = False) -> Action:
+    """Action record for a compiled `(pieces, spec)` result; the block comes from allactions.txt by sign1."""
+    pieces, spec = res
+    args_str = ",".join(pieces) if pieces else "no"
+    sign1 = strip_colors(spec.get("sign1", "")).strip()
+    sign2 = spec_menu_name(spec)
+    menu = strip_colors(spec.get("menu", "")).strip()
+    sign1_norm = norm_key(sign1)
+    if sign1_norm in sign1_aliases:
+        sign1_norm = norm_key(sign1_aliases[sign1_norm])
+    block = blocks.get(sign1_norm)
+    if not block:
+        raise ValueError(
+            f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
+        )
+    block_tok = block.replace("minecraft:", "")
+    expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
+    string_name = sign2
+    if expected_sign2:
+        string_name = f"{(menu or sign2)}||{expected_sign2}"
+    return Action(block_tok, string_name, args_str, negated)
+
+
+def _placeadvanced_tokens(block: str, name: str, args: str) -> str:
+    # Plan-only metadata can be embedded as: menu||sign1||sign2. For /placeadvanced, only menu is clickable.
+    if name and "||" in name:
+        name = name.split("||", 1)[0]
+    return f"{block} \"{name}\" " + (f"\"{args}\"" if args else "no")
+
+
 def build_placeadvanced_command(
     *,
     event_block: str,
     event_name: str,
     actions: list[tuple[str, str, str]],
+    event_args: str = "no",
 ) -> str:
     # tokens are parsed by PlaceParser.splitArgsPreserveQuotes
-    parts = ["/placeadvanced", event_block, f"\"{event_name}\"", "no"]
+    parts = ["/placeadvanced", event_block, f"\"{event_name}\"", event_args or "no"]
     for block, name, args in actions:
-        # Plan-only metadata can be embedded as: menu||sign1||sign2. For /placeadvanced, only menu is clickable.
-        if name and "||" in name:
-            name = name.split("||", 1)[0]
-        parts.append(block)
-        parts.append(f"\"{name}\"")
-        parts.append(f"\"{args}\"" if args else "no")
+        parts.append(_placeadvanced_tokens(block, name, args))
     cmd = " ".join(parts)
     return cmd
 
-def compile_entries(path: Path) -> list[dict]:
+def compile_entries(path: Path, *, action_specs: dict[int, dict] | None = None, **kwargs) -> list[dict]:
+    """
+    Compiles `.mldsl` to plan entries.
+    Optimization passes come from `opt_level` (see `mldsl_passes.OPT_LEVELS`) plus `enable_passes`,
+    minus `disable_passes`; `tree_shake`/`outline`/`row_packer="dp"` enable single passes.
+    When `pass_stats` is a list, per-pass timing/size records are appended to it.
+    When `stream` is given, rows are written to it as blocks are flushed and an empty list is returned;
+    entries-stage passes then run on a spooled two-phase path (see `_stream_proxy_row`).
+    When `action_specs` is a dict, the API spec of every action resolved while compiling (imports and
+    vfunc expansion included) is stored in it by `id(spec)`; used for the donate tier report.
+    `source` replaces the contents of `path` (see `compile_source`). `strict_unknown`/`warn_unknown`
+    override `MLDSL_STRICT_UNKNOWN`/`MLDSL_WARN_UNKNOWN` for unresolved lines.
+    `profile` (`mldsl_profile.CompileProfile`) records stage/block/line timings;
+    `mem_report` (`mldsl_memreport.MemReport`) records per-stage peak/retained memory.
+    """
+    t0 = time.perf_counter()
+    mldsl_events.emit("compile_started", path=str(path), opt_level=kwargs.get("opt_level", "O0"))
+    try:
+        entries = _compile_entries(path, spec_sink=action_specs, **kwargs)
+    except Exception as exc:
+        mldsl_events.emit("compile_failed", path=str(path), ms=round((time.perf_counter() - t0) * 1000, 3), error=str(exc))
+        raise
+    if mldsl_events.sinks:
+        stream = kwargs.get("stream")
+        mldsl_events.emit(
+            "compile_finished",
+            path=str(path),
+            ms=round((time.perf_counter() - t0) * 1000, 3),
+            entries=stream.count if stream is not None else len(entries),
+            rows=stream.rows if stream is not None else len(split_rows(entries)),
+        )
+    return entries
+
+
+def compile_source(text: str, *, base_dir: Path | None = None, options: dict | None = None) -> list[dict]:
+    """
+    Compiles in-memory `.mldsl` source to plan entries, without a temporary file.
+    `import` paths resolve against `base_dir` (default: current directory); `options` are
+    `compile_entries` keyword arguments (`opt_level`, `strict_unknown`, `action_specs`, `stream`, ...).
+    """
+    entry = Path(base_dir if base_dir is not None else Path.cwd()) / STDIN_SOURCE_NAME
+    return compile_entries(entry, source=text, **(options or {}))
+
+
+def _compile_entries(
+    path: Path,
+    *,
+    tree_shake: bool = False,
+    outline: bool = False,
+    row_packer: str = "greedy",
+    opt_level: str = "O0",
+    enable_passes: tuple[str, ...] | list[str] = (),
+    disable_passes: tuple[str, ...] | list[str] = (),
+    pass_stats: list[dict] | None = None,
+    stream: PlanStreamWriter | None = None,
+    source: str | None = None,
+    strict_unknown: bool | None = None,
+    warn_unknown: bool | None = None,
+    profile=None,
+    mem_report=None,
+    spec_sink: dict[int, dict] | None = None,
+) -> list[dict]:
+    if strict_unknown is None:
+        strict_unknown = _strict_unknown_enabled()
+    if warn_unknown is None:
+        warn_unknown = _warn_unknown_enabled()
     # TEMP DEBUG (remove after root-cause): deep pipeline trace
     _compile_dbg(f"compile_entries.start path={path}")
     api = load_api()
@@ -2359,6 +3074,20 @@ def compile_entries(path: Path) -> list[dict]:
     _compile_dbg(
         f"loaded api_modules={len(api)} sign1_aliases={len(sign1_aliases)} blocks={len(blocks)} known_events={len(known_events)}"
     )
+    stage_t0 = time.perf_counter()
+
+    def mark_stage(stage: str, **info):
+        nonlocal stage_t0
+        if profile is not None:
+            profile.mark(stage, **info)
+        if mem_report is not None:
+            mem_report.mark(stage, **info)
+        if mldsl_events.sinks:
+            now = time.perf_counter()
+            mldsl_events.emit("stage", stage=stage, ms=round((now - stage_t0) * 1000, 3), **info)
+            stage_t0 = now
+
+    mark_stage("load_data")
 
     def norm_ident(s: str) -> str:
         s = strip_colors(s or "").lower()
@@ -2387,41 +3116,25 @@ def compile_entries(path: Path) -> list[dict]:
             "Возможные причины: опечатка в module.action, неверный синтаксис аргументов "
             "или вызов несуществующей функции."
         )
-        if _strict_unknown_enabled():
+        mldsl_events.emit("unresolved_line", line=idx, text=raw_line, in_scope=in_scope, strict=strict_unknown)
+        if strict_unknown:
             raise ValueError(msg)
-        if _warn_unknown_enabled():
+        if warn_unknown:
             print(f"[warn] {msg}", file=__import__('sys').stderr)
 
-    def compile_action_tuple(module: str, func: str, arg_str: str = "") -> tuple[str, str, str]:
-        res = compile_line(api, f"{module}.{func}({arg_str})")
+    def compile_action(module: str, func: str, arg_str: str = "") -> tuple[Action, dict]:
+        res = compile_line(api, f"{module}.{func}({arg_str})", spec_sink=spec_sink)
         if not res:
             raise ValueError(f"Unknown action: {module}.{func}")
-        pieces, spec = res
-        sign1 = strip_colors(spec.get("sign1", "")).strip()
-        sign2 = spec_menu_name(spec)
-        menu = strip_colors(spec.get("menu", "")).strip()
-        sign1_norm = norm_key(sign1)
-        if sign1_norm in sign1_aliases:
-            sign1_norm = norm_key(sign1_aliases[sign1_norm])
-        block = blocks.get(sign1_norm)
-        if not block:
-            raise ValueError(
-                f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-            )
-        block_tok = block.replace("minecraft:", "")
-        expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-        StringName = sign2
-        if expected_sign2:
-            StringName = f"{(menu or sign2)}||{expected_sign2}"
-        return (block_tok, StringName, ",".join(pieces) if pieces else "no"), spec
+        return action_from_result(res, blocks=blocks, sign1_aliases=sign1_aliases), res[1]
 
     # Selection (Выбрать объект) scoping:
     # `select.xxx { ... }` restores the previous selection on `}`.
-    DEFAULT_SELECT_PLAYER, _ = compile_action_tuple("select", "vybrat_igroka_po_umolchaniyu")
-    DEFAULT_SELECT_ENTITY, _ = compile_action_tuple("select", "vybrat_suschnost_po_umolchaniyu")
-    current_select: tuple[str, str, str] | None = None
-    select_stack: list[tuple[str, str, str] | None] = []
-    select_default_stack: list[tuple[str, str, str]] = []
+    DEFAULT_SELECT_PLAYER, _ = compile_action("select", "vybrat_igroka_po_umolchaniyu")
+    DEFAULT_SELECT_ENTITY, _ = compile_action("select", "vybrat_suschnost_po_umolchaniyu")
+    current_select: Action | None = None
+    select_stack: list[Action | None] = []
+    select_default_stack: list[Action] = []
 
     def select_domain(spec: dict) -> str:
         blob = " ".join(
@@ -2573,29 +3286,29 @@ def compile_entries(path: Path) -> list[dict]:
         more = "..." if len(hits) > 8 else ""
         raise ValueError(f"select: неоднозначно `{leaf}`. Варианты: {opts}{more}")
 
-    def resolve_import_path(base: Path, raw: str) -> Path:
-        rel = raw.replace("\\", "/")
-        if not rel.lower().endswith(".mldsl"):
-            rel += ".mldsl"
-        return (base.parent / rel).resolve()
-
-    def load_with_imports(entry: Path) -> tuple[list[str], set[str]]:
+    def load_with_imports(entry: Path, entry_text: str | None = None) -> tuple[list[str], set[str]]:
         """
         Loads file and inlines `import/use/использовать <path>` directives.
+        `entry_text` is used as the contents of `entry` (in-memory source); imports are still read from disk.
         Returns: (lines, namespaces) where namespaces are imported module stems (for optional `ns.` stripping).
         """
         visited: set[Path] = set()
         namespaces: set[str] = set()
         out: list[str] = []
+        entry_rp = entry.resolve()
 
         def rec(p: Path):
             rp = p.resolve()
             if rp in visited:
                 return
             visited.add(rp)
-            if not rp.exists():
+            if entry_text is not None and rp == entry_rp:
+                text = entry_text
+            elif not rp.exists():
                 raise ValueError(f"import: файл не найден: {rp}")
-            for raw in rp.read_text(encoding="utf-8-sig").splitlines():
+            else:
+                text = rp.read_text(encoding="utf-8-sig")
+            for raw in text.splitlines():
                 m = IMPORT_RE.match(raw.strip())
                 if m:
                     spec = m.group(1).strip().strip("\"'")
@@ -3178,23 +3891,34 @@ def compile_entries(path: Path) -> list[dict]:
 
         return out
 
-    lines, imported_namespaces = load_with_imports(path)
+    lines, imported_namespaces = load_with_imports(Path(path), source)
     _compile_dbg(f"stage.imports lines={len(lines)} namespaces={len(imported_namespaces)}")
+    mark_stage("imports", lines=len(lines))
     lines = normalize_multiline_calls(lines)
     _compile_dbg(f"stage.normalize_multiline lines={len(lines)}")
+    mark_stage("normalize_multiline", lines=len(lines))
     lines = expand_inline_blocks(lines)
     _compile_dbg(f"stage.expand_inline_blocks lines={len(lines)}")
+    mark_stage("expand_inline_blocks", lines=len(lines))
     lines, vfunc_defs = collect_vfunc_defs(lines)
     _compile_dbg(f"stage.collect_vfunc lines={len(lines)} vfunc_defs={len(vfunc_defs)}")
+    mark_stage("collect_vfunc", lines=len(lines))
     lines = expand_vfunc_calls(lines, vfunc_defs)
     _compile_dbg(f"stage.expand_vfunc lines={len(lines)}")
+    mark_stage("expand_vfunc", lines=len(lines))
     lines = expand_multiselect_blocks(lines)
     _compile_dbg(f"stage.expand_multiselect lines={len(lines)}")
+    mark_stage("expand_multiselect", lines=len(lines))
 
     # Collect function signatures (name -> param list) in advance so calls can be validated
     # even if the function is declared later in the file.
     func_sigs: dict[str, list[str]] = {}
+    exported_funcs: set[str] = set()
     for raw in lines:
+        m_export = EXPORT_RE.match(raw or "")
+        if m_export:
+            exported_funcs.update(n.strip() for n in m_export.group(1).split(","))
+            continue
         m = FUNC_RE.match((raw or "").strip())
         if not m:
             continue
@@ -3212,11 +3936,54 @@ def compile_entries(path: Path) -> list[dict]:
                     raise ValueError(f"func {fname}(): недопустимое имя параметра: {pn}")
                 params.append(pn)
         func_sigs[fname] = params
-    _compile_dbg(f"stage.collect_funcs func_defs={len(func_sigs)}")
+    _compile_dbg(f"stage.collect_funcs func_defs={len(func_sigs)} exported={len(exported_funcs)}")
+    mark_stage("collect_funcs")
+    for ename in sorted(exported_funcs):
+        if ename not in func_sigs:
+            raise ValueError(f"export: функция `{ename}` не объявлена через func")
+    if exported_funcs:
+        lines = [raw for raw in lines if not EXPORT_RE.match(raw or "")]
     for vname in vfunc_defs.keys():
         if vname in func_sigs:
             raise ValueError(f"name conflict: `{vname}` defined as both func and vfunc")
     entries: list[dict] = []
+    if row_packer not in ROW_PACKERS:
+        raise ValueError(f"row packer: неизвестный режим `{row_packer}` (ожидается: {', '.join(ROW_PACKERS)})")
+    flag_passes = [
+        name
+        for name, on in (("tree-shake", tree_shake), ("outline", outline), ("row-pack-dp", row_packer == "dp"))
+        if on
+    ]
+    passes = PassManager(resolve_passes(opt_level, [*flag_passes, *enable_passes], disable_passes))
+    row_packer = "dp" if passes.is_enabled("row-pack-dp") else "greedy"
+    # Streaming: with entries-stage passes enabled, rows go to an on-disk spool and only light
+    # proxies (headers + call entries) stay in memory; passes run on proxies, then the spool is replayed.
+    stream_spool: RowSpool | None = None
+    stream_proxy_rows: list[list[dict]] = []
+    if stream is not None and any(PASSES[name][0] == "entries" for name in passes.enabled):
+        stream_spool = RowSpool()
+    # Always-on schema check of the emitted plan (streamed rows are checked as they are written).
+    plan_check_budget = post_compile_budget_s()
+    plan_check: PlanValidator | None = None
+    if plan_check_budget is not None:
+        action_toks = {str(v).replace("minecraft:", "") for v in blocks.values()}
+        plan_check = PlanValidator(
+            action_blocks=action_toks,
+            negatable_blocks={
+                str(v).replace("minecraft:", "")
+                for k, v in blocks.items()
+                if str(k).startswith("если") or str(k) == "иначе"
+            }
+            | {DEFAULT_SELECT_PLAYER.block},
+            budget_s=plan_check_budget,
+        )
+    row_pack_seconds = 0.0
+    # Per call-chain comparison of the selected packer against greedy (same input, before extraction).
+    row_pack_stats = {"chains": 0, "rows": 0, "restores": 0, "greedy_rows": 0, "greedy_restores": 0}
+    # Whole-program passes (outline) need every block before row placement:
+    # flushed blocks are buffered and emitted at the end.
+    defer_blocks = passes.is_enabled("outline")
+    deferred_blocks: list[dict] = []
     used_func_names: set[str] = set(func_sigs.keys()) | set(vfunc_defs.keys())
     auto_func_counter = 1
 
@@ -3224,12 +3991,11 @@ def compile_entries(path: Path) -> list[dict]:
     current_kind = None  # event|func|loop
     current_name = None
     current_loop_ticks = None
-    # action tuple: (block, name, args[, negated])
-    current_actions: list[tuple] = []
+    current_actions: list[Action] = []
     block_stack: list[str] = []  # nested blocks inside event/func/loop (e.g. if)
     current_func_params: list[str] = []
     current_func_has_return = False
-    current_safe_boundaries: list[tuple[int, tuple[str, str, str] | None]] = []
+    current_safe_boundaries: list[tuple[int, Action | None]] = []
     # Parallel to current_actions: open `if` depth right after each emitted action.
     # Used by fallback row wrapping to reserve row space for runtime implicit closing pistons.
     current_if_depths: list[int] = []
@@ -3243,69 +4009,34 @@ def compile_entries(path: Path) -> list[dict]:
         pos = len(current_actions)
         if pos <= 0:
             return
-        sel = None
-        if current_select is not None:
-            sel = (current_select[0], current_select[1], current_select[2])
+        sel = current_select
         if current_safe_boundaries and current_safe_boundaries[-1][0] == pos:
             current_safe_boundaries[-1] = (pos, sel)
             return
         current_safe_boundaries.append((pos, sel))
 
-    def append_action(action: tuple):
+    def append_action(action: Action):
         current_actions.append(action)
         current_if_depths.append(current_if_depth())
         mark_safe_boundary()
 
-    def append_if_open_action(action: tuple):
+    def append_if_open_action(action: Action):
         # Tag conditional opener so autosplit can reason about scope structure.
-        if len(action) >= 5:
-            tagged = action
-        else:
-            tagged = (action[0], action[1], action[2], False, {"if_open": True})
-        append_action(tagged)
-
-    def _is_if_open_action(action: tuple) -> bool:
-        try:
-            return len(action) > 4 and isinstance(action[4], dict) and bool(action[4].get("if_open"))
-        except Exception:
-            return False
-
-    def _calc_if_depths(actions: list[tuple]) -> list[int]:
-        out: list[int] = []
-        depth = 0
-        for a in actions:
-            if _is_if_open_action(a):
-                depth += 1
-            out.append(max(0, depth))
-            if (a[0] == "skip") and depth > 0:
-                depth -= 1
-        return out
-
-    def _calc_safe_boundaries(actions: list[tuple]) -> list[tuple[int, tuple[str, str, str] | None]]:
-        out: list[tuple[int, tuple[str, str, str] | None]] = []
-        depth = 0
-        for i, a in enumerate(actions, start=1):
-            if _is_if_open_action(a):
-                depth += 1
-            if depth == 0:
-                out.append((i, None))
-            if (a[0] == "skip") and depth > 0:
-                depth -= 1
-        return out
+        append_action(action.replace(if_open=True))
 
     def _try_extract_if_scope_to_helper(
-        actions: list[tuple],
-        call_action: tuple,
-    ) -> tuple[list[tuple], list[tuple]] | None:
+        actions: list[Action],
+        call_action: Action,
+    ) -> tuple[list[Action], list[Action]] | None:
         # Find a conditional scope "if ... { BODY }" and replace BODY with call(helper_name),
         # keeping opener+closer in the same row.
         stack: list[int] = []
         candidates: list[tuple[int, int]] = []
         for idx, a in enumerate(actions):
-            if _is_if_open_action(a):
+            if a.if_open:
                 stack.append(idx)
                 continue
-            if a[0] == "skip" and stack:
+            if a.block == "skip" and stack:
                 op = stack.pop()
                 # scope body must be non-empty
                 # Require at least 2 body actions so replacement with a single call()
@@ -3329,192 +4060,211 @@ def compile_entries(path: Path) -> list[dict]:
         rewritten = actions[: op + 1] + [call_action] + actions[cl:]
         return rewritten, body
 
-    def flush_block():
-        nonlocal current_kind, current_name, current_loop_ticks, current_actions, current_func_params, current_func_has_return
-        nonlocal current_safe_boundaries, current_if_depths
-        nonlocal auto_func_counter
-        if not current_kind:
-            return
-        _compile_dbg(
-            f"flush_block.start kind={current_kind} name={current_name or '-'} actions={len(current_actions)} safe_boundaries={len(current_safe_boundaries)} if_depth_max={(max(current_if_depths) if current_if_depths else 0)}"
-        )
-        pending_extracted_helpers: list[tuple[str, list[tuple]]] = []
+    def to_action(res, *, negated: bool = False) -> Action:
+        return action_from_result(res, blocks=blocks, sign1_aliases=sign1_aliases, negated=negated)
 
-        def to_tuple(res):
-            pieces, spec = res
-            args_str = ",".join(pieces) if pieces else "no"
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            string_name = sign2
-            if expected_sign2:
-                string_name = f"{(menu or sign2)}||{expected_sign2}"
-            return (block_tok, string_name, args_str)
-
-        def alloc_auto_func_name() -> str:
-            nonlocal auto_func_counter
-            while True:
-                name = f"{AUTO_SPLIT_FUNC_PREFIX}{auto_func_counter}"
-                auto_func_counter += 1
-                if name not in used_func_names:
-                    used_func_names.add(name)
-                    if auto_func_counter <= 20 or (auto_func_counter % 100 == 0):
-                        _autosplit_dbg(f"alloc_name={name} next_counter={auto_func_counter}")
-                    return name
-
-        def build_call_action_tuple(func_name: str) -> tuple:
-            call_res = compile_builtin(api, f"call({func_name})")
-            if not call_res:
-                raise ValueError("auto-split: call() compile failed")
-            first = call_res[0]
-            return to_tuple(first)
-
-        def emit_action_rows(
-            action_list: list[tuple],
-            *,
-            warn_context: str,
-            continuation_header: dict | None = None,
-            action_if_depths: list[int] | None = None,
-            reserve_implicit_if_closers: bool = False,
-        ):
-            # Physical row budget includes the leading header block (event/func/loop).
-            # We emit that header before calling this helper, so start with 1 occupied slot.
-            actions_in_row = 1
-            prev_if_depth = 0
-            for idx, action in enumerate(action_list, start=1):
-                row_cap = MAX_ACTIONS_PER_ROW
-                if reserve_implicit_if_closers:
-                    row_cap = MAX_ACTIONS_PER_ROW - max(0, prev_if_depth)
-                    if row_cap <= 1:
-                        raise ValueError(
-                            f"row auto-split: nested if depth ({prev_if_depth}) leaves no room for actions in {warn_context}"
-                        )
-                if actions_in_row >= row_cap:
-                    if entries and entries[-1].get("block") != "newline":
-                        print(
-                            f"[warn] row auto-split: exceeded {MAX_ACTIONS_PER_ROW} actions in {warn_context}; "
-                            f"inserted newline before action #{idx}",
-                            file=__import__("sys").stderr,
-                        )
-                        entries.append({"block": "newline"})
-                        if continuation_header is not None:
-                            # Runtime requires a leading block on each physical row.
-                            entries.append(dict(continuation_header))
-                    # New row starts with header, so one slot is already consumed.
-                    actions_in_row = 1
-                block = action[0]
-                name = action[1]
-                args = action[2]
-                negated = bool(action[3]) if len(action) > 3 else False
-                row = {"block": block, "name": name, "args": (args or "no")}
-                if negated:
-                    row["negated"] = True
-                entries.append(row)
-                actions_in_row += 1
-                if action_if_depths is not None and idx - 1 < len(action_if_depths):
-                    prev_if_depth = max(0, int(action_if_depths[idx - 1]))
-
-        def emit_block_header(kind: str, name: str | None, ticks: int | None):
-            if kind == "event":
-                ev_raw = (name or "").strip()
-                if not ev_raw:
-                    entries.append({"block": "diamond_block", "name": "Событие игрока||", "args": "no"})
-                else:
-                    ev_name = event_variant_to_name(ev_raw)
-                    nk = norm_key(ev_name)
-                    if known_events and nk in known_events:
-                        block, menu_name, expected_sign2 = known_events[nk]
-                        entries.append({"block": block, "name": f"{menu_name}||{expected_sign2}", "args": "no"})
-                    elif known_events:
-                        raise ValueError(f"неизвестное событие: {ev_name}")
-                    else:
-                        entries.append({"block": "diamond_block", "name": ev_name, "args": "no"})
-            elif kind == "func":
-                entries.append({"block": "lapis_block", "name": (name or ""), "args": "no"})
-            elif kind == "loop":
-                t = int(ticks or 5)
-                t = max(5, t)
-                entries.append({"block": "emerald_block", "name": (name or ""), "args": str(t)})
+    def alloc_auto_func_name() -> str:
+        nonlocal auto_func_counter
+        while True:
+            name = f"{AUTO_SPLIT_FUNC_PREFIX}{auto_func_counter}"
+            auto_func_counter += 1
+            if name not in used_func_names:
+                used_func_names.add(name)
+                if auto_func_counter <= 20 or (auto_func_counter % 100 == 0):
+                    _autosplit_dbg(f"alloc_name={name} next_counter={auto_func_counter}")
+                return name
+
+    def build_call_action(func_name: str) -> Action:
+        call_res = compile_builtin(api, f"call({func_name})", spec_sink=spec_sink)
+        if not call_res:
+            raise ValueError("auto-split: call() compile failed")
+        first = call_res[0]
+        return to_action(first)
+
+    def emit_action_rows(
+        action_list: list[Action],
+        *,
+        warn_context: str,
+        continuation_header: dict | None = None,
+        action_if_depths: list[int] | None = None,
+        reserve_implicit_if_closers: bool = False,
+    ):
+        # Physical row budget includes the leading header block (event/func/loop).
+        # We emit that header before calling this helper, so start with 1 occupied slot.
+        actions_in_row = 1
+        prev_if_depth = 0
+        for idx, action in enumerate(action_list, start=1):
+            row_cap = MAX_ACTIONS_PER_ROW
+            if reserve_implicit_if_closers:
+                row_cap = MAX_ACTIONS_PER_ROW - max(0, prev_if_depth)
+                if row_cap <= 1:
+                    raise ValueError(
+                        f"row auto-split: nested if depth ({prev_if_depth}) leaves no room for actions in {warn_context}"
+                    )
+            if actions_in_row >= row_cap:
+                if entries and entries[-1].get("block") != "newline":
+                    print(
+                        f"[warn] row auto-split: exceeded {MAX_ACTIONS_PER_ROW} actions in {warn_context}; "
+                        f"inserted newline before action #{idx}",
+                        file=__import__("sys").stderr,
+                    )
+                    mldsl_events.emit("autosplit", decision="newline", block=warn_context, action=idx)
+                    entries.append({"block": "newline"})
+                    if continuation_header is not None:
+                        # Runtime requires a leading block on each physical row.
+                        entries.append(dict(continuation_header))
+                # New row starts with header, so one slot is already consumed.
+                actions_in_row = 1
+            entries.append(action.to_entry())
+            actions_in_row += 1
+            if action_if_depths is not None and idx - 1 < len(action_if_depths):
+                prev_if_depth = max(0, int(action_if_depths[idx - 1]))
+
+    def emit_block_header(kind: str, name: str | None, ticks: int | None):
+        if kind == "event":
+            ev_raw = (name or "").strip()
+            if not ev_raw:
+                entries.append({"block": "diamond_block", "name": "Событие игрока||", "args": "no"})
             else:
-                raise ValueError(f"Unknown block kind: {kind}")
-
-        def make_header(kind: str, name: str | None, ticks: int | None) -> dict:
-            if kind == "event":
-                ev_raw = (name or "").strip()
-                if not ev_raw:
-                    return {"block": "diamond_block", "name": "Событие игрока||", "args": "no"}
                 ev_name = event_variant_to_name(ev_raw)
                 nk = norm_key(ev_name)
                 if known_events and nk in known_events:
                     block, menu_name, expected_sign2 = known_events[nk]
-                    return {"block": block, "name": f"{menu_name}||{expected_sign2}", "args": "no"}
-                if known_events:
+                    entries.append({"block": block, "name": f"{menu_name}||{expected_sign2}", "args": "no"})
+                elif known_events:
                     raise ValueError(f"неизвестное событие: {ev_name}")
-                return {"block": "diamond_block", "name": ev_name, "args": "no"}
-            if kind == "func":
-                return {"block": "lapis_block", "name": (name or ""), "args": "no"}
-            if kind == "loop":
-                t = int(ticks or 5)
-                t = max(5, t)
-                return {"block": "emerald_block", "name": (name or ""), "args": str(t)}
+                else:
+                    entries.append({"block": "diamond_block", "name": ev_name, "args": "no"})
+        elif kind == "func":
+            entries.append({"block": "lapis_block", "name": (name or ""), "args": "no"})
+        elif kind == "loop":
+            t = int(ticks or 5)
+            t = max(5, t)
+            entries.append({"block": "emerald_block", "name": (name or ""), "args": str(t)})
+        else:
             raise ValueError(f"Unknown block kind: {kind}")
 
-        # Function prologue: pop args stack into declared param variables (sync-only protocol).
-        if current_kind == "func" and current_func_params:
-            insert_at = 0
-            for pn in current_func_params:
-                res = compile_line(
-                    api,
-                    f"array.get_array(arr=arr({ARGS_STACK_NAME}), num=num({STACK_TOP_INDEX}), var=var({pn}))",
-                )
-                if not res:
-                    raise ValueError("func args: не найдено действие 'Получить элемент массива'")
-                current_actions.insert(insert_at, to_tuple(res))
-                current_if_depths.insert(insert_at, 0)
-                insert_at += 1
-                res = compile_line(
-                    api, f"array.remove_array(arr=arr({ARGS_STACK_NAME}), num=num({STACK_TOP_INDEX}))"
-                )
-                if not res:
-                    raise ValueError("func args: не найдено действие 'Удалить элемент массива'")
-                current_actions.insert(insert_at, to_tuple(res))
-                current_if_depths.insert(insert_at, 0)
-                insert_at += 1
+    def make_header(kind: str, name: str | None, ticks: int | None) -> dict:
+        if kind == "event":
+            ev_raw = (name or "").strip()
+            if not ev_raw:
+                return {"block": "diamond_block", "name": "Событие игрока||", "args": "no"}
+            ev_name = event_variant_to_name(ev_raw)
+            nk = norm_key(ev_name)
+            if known_events and nk in known_events:
+                block, menu_name, expected_sign2 = known_events[nk]
+                return {"block": block, "name": f"{menu_name}||{expected_sign2}", "args": "no"}
+            if known_events:
+                raise ValueError(f"неизвестное событие: {ev_name}")
+            return {"block": "diamond_block", "name": ev_name, "args": "no"}
+        if kind == "func":
+            return {"block": "lapis_block", "name": (name or ""), "args": "no"}
+        if kind == "loop":
+            t = int(ticks or 5)
+            t = max(5, t)
+            return {"block": "emerald_block", "name": (name or ""), "args": str(t)}
+        raise ValueError(f"Unknown block kind: {kind}")
+
+    def sel_restore_extra(sel) -> int:
+        return 1 if (sel is not None and sel != DEFAULT_SELECT_PLAYER) else 0
+
+    def no_restore_extra(_sel) -> int:
+        return 0
+
+    def note_row_pack_chain(actions_len: int, boundaries: list, restore_extra) -> list[int] | None:
+        """
+        Plans the whole call chain once (non-greedy packers). Returns the cuts as positions relative to
+        the remaining actions of each step (a restored selection shifts them by one), last cut first,
+        for `pick_row_cut` to pop; None keeps greedy splitting.
+        """
+        nonlocal row_pack_seconds
+        if row_packer == "greedy":
+            return None
+        t0 = time.perf_counter()
+        greedy = _pack_row_cuts(actions_len, boundaries, restore_extra=restore_extra, mode="greedy")
+        packed = _pack_row_cuts(actions_len, boundaries, restore_extra=restore_extra, mode=row_packer)
+        row_pack_seconds += time.perf_counter() - t0
+        if packed is None:
+            return None
+        if greedy is not None:
+            row_pack_stats["chains"] += 1
+            row_pack_stats["rows"] += len(packed[0]) + 1
+            row_pack_stats["restores"] += packed[1]
+            row_pack_stats["greedy_rows"] += len(greedy[0]) + 1
+            row_pack_stats["greedy_restores"] += greedy[1]
+        sel_at = dict(boundaries)
+        steps: list[int] = []
+        prev, carry = 0, 0
+        for cut in packed[0]:
+            steps.append(cut - prev + carry)
+            prev, carry = cut, restore_extra(sel_at.get(cut))
+        return steps[::-1]
+
+    def pick_row_cut(plan: list[int] | None, candidate_positions: list[int]) -> int | None:
+        # Next cut of the chain planned by `note_row_pack_chain`; None keeps the greedy choice.
+        if not plan:
+            return None
+        pos = plan.pop()
+        if pos not in candidate_positions:
+            plan.clear()
+            return None
+        return pos
 
-        # Implicit return to keep return stack consistent.
-        if current_kind == "func" and not current_func_has_return:
-            res = compile_line(
-                api, f"array.vstavit_v_massiv(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}), value=text())"
+    def drain_emitted():
+        if stream is None or not entries:
+            return
+        for row in split_rows(entries):
+            if stream_spool is None:
+                if plan_check is not None:
+                    plan_check.feed_row(row)
+                stream.write_row(row)
+                continue
+            row_id = stream_spool.append(row)
+            stream_proxy_rows.append(_stream_proxy_row(row, row_id))
+        entries.clear()
+
+    def emit_and_drain(block: dict):
+        before = len(entries)
+        emit_block(block)
+        if mldsl_events.sinks:
+            mldsl_events.emit(
+                "block_emitted",
+                kind=block["kind"],
+                name=block["name"] or "",
+                actions=len(block["actions"]),
+                entries=len(entries) - before,
             )
-            if not res:
-                raise ValueError("implicit return: не найдено действие 'Вставить в массив'")
-            append_action(to_tuple(res))
+        drain_emitted()
+
+    def emit_block(block: dict):
+        blk_kind = block["kind"]
+        blk_name = block["name"]
+        blk_ticks = block["ticks"]
+        blk_actions = block["actions"]
+        blk_if_depths = block["if_depths"]
+        blk_boundaries = block["boundaries"]
+        # split rows by inserting a newline marker between blocks
+        if entries:
+            entries.append({"block": "newline"})
+        pending_extracted_helpers: list[tuple[str, list[Action]]] = []
+
 
         # For long events, split into helper function call-chain:
         # event: 42 actions + call(helper_1)
         # helper_1: 42 actions + call(helper_2), etc.
         # This keeps a leading block header for each row chunk.
-        if current_kind == "event" and len(current_actions) > (MAX_ACTIONS_PER_ROW - 1):
-            ev_name = (current_name or "").strip() or "event"
+        if blk_kind == "event" and len(blk_actions) > (MAX_ACTIONS_PER_ROW - 1):
+            ev_name = (blk_name or "").strip() or "event"
             _autosplit_dbg(
-                f"event_split_start name={ev_name} actions={len(current_actions)} max_payload={MAX_ACTIONS_PER_ROW - 1}"
+                f"event_split_start name={ev_name} actions={len(blk_actions)} max_payload={MAX_ACTIONS_PER_ROW - 1}"
             )
             block_kind = "event"
-            block_name = current_name
-            block_ticks = current_loop_ticks
-            actions_left = list(current_actions)
-            if_depths_left = list(current_if_depths)
-            boundaries_left = list(current_safe_boundaries)
+            block_name = blk_name
+            block_ticks = blk_ticks
+            actions_left = list(blk_actions)
+            if_depths_left = list(blk_if_depths)
+            boundaries_left = list(blk_boundaries)
+            row_plan = note_row_pack_chain(len(actions_left), boundaries_left, sel_restore_extra)
             split_num = 0
             while len(actions_left) > (MAX_ACTIONS_PER_ROW - 1):
                 split_num += 1
@@ -3526,7 +4276,7 @@ def compile_entries(path: Path) -> list[dict]:
                 _autosplit_dbg(
                     f"event_split_iter name={ev_name} split_num={split_num} left={len(actions_left)} next={next_func_name}"
                 )
-                candidates: list[tuple[int, tuple[str, str, str] | None, int, tuple[str, str, str] | None]] = []
+                candidates: list[tuple[int, Action | None, int, Action | None]] = []
                 for pos, sel_state in boundaries_left:
                     if pos <= 0 or pos >= len(actions_left):
                         continue
@@ -3541,7 +4291,7 @@ def compile_entries(path: Path) -> list[dict]:
                         f"event_no_candidates name={ev_name} split_num={split_num} left={len(actions_left)}"
                     )
                     _prev_len = len(actions_left)
-                    extracted = _try_extract_if_scope_to_helper(actions_left, build_call_action_tuple(next_func_name))
+                    extracted = _try_extract_if_scope_to_helper(actions_left, build_call_action(next_func_name))
                     if extracted is None:
                         raise ValueError(
                             f"row auto-split: `{ev_name}` has no safe top-level split point within {MAX_ACTIONS_PER_ROW} actions; "
@@ -3563,11 +4313,18 @@ def compile_entries(path: Path) -> list[dict]:
                         f"[warn] row auto-split: `{ev_name}` extracted nested scope -> call({next_func_name})",
                         file=__import__("sys").stderr,
                     )
+                    mldsl_events.emit(
+                        "autosplit", decision="extract", block=ev_name, call=next_func_name, actions=len(helper_body)
+                    )
                     split_num -= 1
                     continue
-                pos, sel_state, _extra, restore_sel = max(
-                    candidates, key=lambda t: (t[0], 1 if t[1] is None else 0)
-                )
+                planned = pick_row_cut(row_plan, [c[0] for c in candidates])
+                if planned is not None:
+                    pos, sel_state, _extra, restore_sel = next(c for c in candidates if c[0] == planned)
+                else:
+                    pos, sel_state, _extra, restore_sel = max(
+                        candidates, key=lambda t: (t[0], 1 if t[1] is None else 0)
+                    )
                 _autosplit_dbg(
                     f"event_pick_candidate name={ev_name} split_num={split_num} pos={pos} candidates={len(candidates)}"
                 )
@@ -3588,12 +4345,14 @@ def compile_entries(path: Path) -> list[dict]:
                         f"forced default single-target before call and restored selection in `{next_func_name}`",
                         file=__import__("sys").stderr,
                     )
-                chunk.append(build_call_action_tuple(next_func_name))
+                    mldsl_events.emit("autosplit", decision="restore_selection", block=ev_name, call=next_func_name)
+                chunk.append(build_call_action(next_func_name))
                 chunk_if_depths.append(0)
                 print(
                     f"[warn] row auto-split: `{ev_name}` part#{split_num} -> call({next_func_name})",
                     file=__import__("sys").stderr,
                 )
+                mldsl_events.emit("autosplit", decision="part", block=ev_name, part=split_num, call=next_func_name, cut=pos)
                 emit_block_header(block_kind, block_name, block_ticks)
                 emit_action_rows(
                     chunk,
@@ -3616,15 +4375,16 @@ def compile_entries(path: Path) -> list[dict]:
             )
         # For long functions, use the same call-chain splitting strategy as events.
         # Avoid relying on repeated same-name function headers across newline rows.
-        elif current_kind == "func" and len(current_actions) > (MAX_ACTIONS_PER_ROW - 1):
-            func_name = (current_name or "").strip() or "func"
+        elif blk_kind == "func" and len(blk_actions) > (MAX_ACTIONS_PER_ROW - 1):
+            func_name = (blk_name or "").strip() or "func"
             _autosplit_dbg(
-                f"func_split_start name={func_name} actions={len(current_actions)} max_payload={MAX_ACTIONS_PER_ROW - 1}"
+                f"func_split_start name={func_name} actions={len(blk_actions)} max_payload={MAX_ACTIONS_PER_ROW - 1}"
             )
-            block_name = current_name
-            actions_left = list(current_actions)
-            if_depths_left = list(current_if_depths)
-            boundaries_left = list(current_safe_boundaries)
+            block_name = blk_name
+            actions_left = list(blk_actions)
+            if_depths_left = list(blk_if_depths)
+            boundaries_left = list(blk_boundaries)
+            row_plan = note_row_pack_chain(len(actions_left), boundaries_left, no_restore_extra)
             split_num = 0
             while len(actions_left) > (MAX_ACTIONS_PER_ROW - 1):
                 split_num += 1
@@ -3648,7 +4408,7 @@ def compile_entries(path: Path) -> list[dict]:
                         f"func_no_candidates name={func_name} split_num={split_num} left={len(actions_left)}"
                     )
                     _prev_len = len(actions_left)
-                    extracted = _try_extract_if_scope_to_helper(actions_left, build_call_action_tuple(next_func_name))
+                    extracted = _try_extract_if_scope_to_helper(actions_left, build_call_action(next_func_name))
                     if extracted is None:
                         raise ValueError(
                             f"row auto-split: `{func_name}` has no safe top-level split point within {MAX_ACTIONS_PER_ROW} actions; "
@@ -3670,9 +4430,14 @@ def compile_entries(path: Path) -> list[dict]:
                         f"[warn] row auto-split: `{func_name}` extracted nested scope -> call({next_func_name})",
                         file=__import__("sys").stderr,
                     )
+                    mldsl_events.emit(
+                        "autosplit", decision="extract", block=func_name, call=next_func_name, actions=len(helper_body)
+                    )
                     split_num -= 1
                     continue
-                pos = max(candidates)
+                pos = pick_row_cut(row_plan, candidates)
+                if pos is None:
+                    pos = max(candidates)
                 _autosplit_dbg(
                     f"func_pick_candidate name={func_name} split_num={split_num} pos={pos} candidates={len(candidates)}"
                 )
@@ -3681,12 +4446,13 @@ def compile_entries(path: Path) -> list[dict]:
                 actions_left = actions_left[pos:]
                 if_depths_left = if_depths_left[pos:]
                 boundaries_left = [(p - pos, s) for p, s in boundaries_left if p > pos]
-                chunk.append(build_call_action_tuple(next_func_name))
+                chunk.append(build_call_action(next_func_name))
                 chunk_if_depths.append(0)
                 print(
                     f"[warn] row auto-split: `{func_name}` part#{split_num} -> call({next_func_name})",
                     file=__import__("sys").stderr,
                 )
+                mldsl_events.emit("autosplit", decision="part", block=func_name, part=split_num, call=next_func_name, cut=pos)
                 emit_block_header("func", block_name, None)
                 emit_action_rows(
                     chunk,
@@ -3706,18 +4472,18 @@ def compile_entries(path: Path) -> list[dict]:
                 reserve_implicit_if_closers=False,
             )
         else:
-            emit_block_header(current_kind, current_name, current_loop_ticks)
+            emit_block_header(blk_kind, blk_name, blk_ticks)
             emit_action_rows(
-                current_actions,
-                warn_context=f"{current_kind} `{current_name or ''}`",
-                continuation_header=make_header(current_kind, current_name, current_loop_ticks),
-                action_if_depths=current_if_depths,
+                blk_actions,
+                warn_context=f"{blk_kind} `{blk_name or ''}`",
+                continuation_header=make_header(blk_kind, blk_name, blk_ticks),
+                action_if_depths=blk_if_depths,
                 reserve_implicit_if_closers=False,
             )
 
         # Emit extracted helper functions created by scope-preserving autosplit.
         # Helpers can still exceed payload budget, so apply the same function call-chain split strategy.
-        helper_queue: list[tuple[str, list[tuple]]] = list(pending_extracted_helpers)
+        helper_queue: list[tuple[str, list[Action]]] = list(pending_extracted_helpers)
         if helper_queue:
             _autosplit_dbg(
                 f"helper_queue_start count={len(helper_queue)} names={','.join(n for n, _ in helper_queue[:5])}"
@@ -3744,6 +4510,7 @@ def compile_entries(path: Path) -> list[dict]:
             actions_left = list(helper_actions)
             if_depths_left = _calc_if_depths(actions_left)
             boundaries_left = _calc_safe_boundaries(actions_left)
+            row_plan = note_row_pack_chain(len(actions_left), boundaries_left, no_restore_extra)
             block_name = helper_name
             split_num = 0
             while len(actions_left) > (MAX_ACTIONS_PER_ROW - 1):
@@ -3767,7 +4534,7 @@ def compile_entries(path: Path) -> list[dict]:
                         f"helper_no_candidates root={helper_name} block={block_name} split_num={split_num} left={len(actions_left)}"
                     )
                     _prev_len = len(actions_left)
-                    extracted = _try_extract_if_scope_to_helper(actions_left, build_call_action_tuple(next_func_name))
+                    extracted = _try_extract_if_scope_to_helper(actions_left, build_call_action(next_func_name))
                     if extracted is None:
                         raise ValueError(
                             f"row auto-split: extracted helper `{helper_name}` still has no safe top-level split point within {MAX_ACTIONS_PER_ROW} actions; "
@@ -3790,9 +4557,18 @@ def compile_entries(path: Path) -> list[dict]:
                         f"[warn] row auto-split: extracted helper `{helper_name}` nested extraction -> call({next_func_name})",
                         file=__import__("sys").stderr,
                     )
+                    mldsl_events.emit(
+                        "autosplit",
+                        decision="extract",
+                        block=helper_name,
+                        call=next_func_name,
+                        actions=len(nested_helper_body),
+                    )
                     continue
 
-                pos = max(candidates)
+                pos = pick_row_cut(row_plan, candidates)
+                if pos is None:
+                    pos = max(candidates)
                 _autosplit_dbg(
                     f"helper_pick_candidate root={helper_name} block={block_name} split_num={split_num} pos={pos} candidates={len(candidates)}"
                 )
@@ -3801,12 +4577,15 @@ def compile_entries(path: Path) -> list[dict]:
                 actions_left = actions_left[pos:]
                 if_depths_left = if_depths_left[pos:]
                 boundaries_left = [(p - pos, s) for p, s in boundaries_left if p > pos]
-                chunk.append(build_call_action_tuple(next_func_name))
+                chunk.append(build_call_action(next_func_name))
                 chunk_if_depths.append(0)
                 print(
                     f"[warn] row auto-split: extracted helper `{helper_name}` part#{split_num} -> call({next_func_name})",
                     file=__import__("sys").stderr,
                 )
+                mldsl_events.emit(
+                    "autosplit", decision="part", block=helper_name, part=split_num, call=next_func_name, cut=pos
+                )
                 emit_block_header("func", block_name, None)
                 emit_action_rows(
                     chunk,
@@ -3827,6 +4606,67 @@ def compile_entries(path: Path) -> list[dict]:
                 reserve_implicit_if_closers=False,
             )
 
+
+    def flush_block():
+        nonlocal current_kind, current_name, current_loop_ticks, current_actions, current_func_params, current_func_has_return
+        nonlocal current_safe_boundaries, current_if_depths
+        if not current_kind:
+            return
+        if profile is not None:
+            profile.flushing(current_kind, current_name)
+        _compile_dbg(
+            f"flush_block.start kind={current_kind} name={current_name or '-'} actions={len(current_actions)} safe_boundaries={len(current_safe_boundaries)} if_depth_max={(max(current_if_depths) if current_if_depths else 0)}"
+        )
+
+        # Function prologue: pop args stack into declared param variables (sync-only protocol).
+        if current_kind == "func" and current_func_params:
+            insert_at = 0
+            for pn in current_func_params:
+                res = compile_line(
+                    api,
+                    f"array.get_array(arr=arr({ARGS_STACK_NAME}), num=num({STACK_TOP_INDEX}), var=var({pn}))",
+                    spec_sink=spec_sink,
+                )
+                if not res:
+                    raise ValueError("func args: не найдено действие 'Получить элемент массива'")
+                current_actions.insert(insert_at, to_action(res))
+                current_if_depths.insert(insert_at, 0)
+                insert_at += 1
+                res = compile_line(
+                    api,
+                    f"array.remove_array(arr=arr({ARGS_STACK_NAME}), num=num({STACK_TOP_INDEX}))",
+                    spec_sink=spec_sink,
+                )
+                if not res:
+                    raise ValueError("func args: не найдено действие 'Удалить элемент массива'")
+                current_actions.insert(insert_at, to_action(res))
+                current_if_depths.insert(insert_at, 0)
+                insert_at += 1
+
+        # Implicit return to keep return stack consistent.
+        if current_kind == "func" and not current_func_has_return:
+            res = compile_line(
+                api,
+                f"array.vstavit_v_massiv(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}), value=text())",
+                spec_sink=spec_sink,
+            )
+            if not res:
+                raise ValueError("implicit return: не найдено действие 'Вставить в массив'")
+            append_action(to_action(res))
+
+        block = {
+            "kind": current_kind,
+            "name": current_name,
+            "ticks": current_loop_ticks,
+            "actions": current_actions,
+            "if_depths": current_if_depths,
+            "boundaries": current_safe_boundaries,
+        }
+        if defer_blocks:
+            deferred_blocks.append(block)
+        else:
+            emit_and_drain(block)
+
         current_kind = None
         current_name = None
         current_loop_ticks = None
@@ -3837,35 +4677,10 @@ def compile_entries(path: Path) -> list[dict]:
         current_if_depths = []
         _compile_dbg(f"flush_block.end entries={len(entries)} auto_func_counter={auto_func_counter}")
 
-    def begin_new_row():
-        # split rows by inserting a newline marker between blocks
-        if entries:
-            entries.append({"block": "newline"})
-
     tmp_counter = 0
 
     def _append_compiled_action(pieces: list[str], spec: dict, *, negated: bool = False):
-        args_str = ",".join(pieces) if pieces else "no"
-        sign1 = strip_colors(spec.get("sign1", "")).strip()
-        sign2 = spec_menu_name(spec)
-        menu = strip_colors(spec.get("menu", "")).strip()
-        sign1_norm = norm_key(sign1)
-        if sign1_norm in sign1_aliases:
-            sign1_norm = norm_key(sign1_aliases[sign1_norm])
-        block = blocks.get(sign1_norm)
-        if not block:
-            raise ValueError(
-                f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-            )
-        block_tok = block.replace("minecraft:", "")
-        expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-        StringName = sign2
-        if expected_sign2:
-            StringName = f"{(menu or sign2)}||{expected_sign2}"
-        if negated:
-            append_action((block_tok, StringName, args_str, True))
-        else:
-            append_action((block_tok, StringName, args_str))
+        append_action(to_action((pieces, spec), negated=negated))
 
     def _compile_call_with_arg_formulas(src_line: str) -> list[tuple[list[str], dict]] | None:
         nonlocal tmp_counter
@@ -3928,7 +4743,13 @@ def compile_entries(path: Path) -> list[dict]:
             tmp_counter += 1
             tmp_name = f"{TMP_VAR_PREFIX}argf{tmp_counter}"
             compiled_prefix.extend(
-                compile_numeric_expression(api, target_var=f"var({tmp_name})", expr_node=node, name_map=name_map)
+                compile_numeric_expression(
+                    api,
+                    target_var=f"var({tmp_name})",
+                    expr_node=node,
+                    name_map=name_map,
+                    spec_sink=spec_sink,
+                )
             )
             kv_resolved[pname] = f"var({tmp_name})"
             changed = True
@@ -3950,11 +4771,12 @@ def compile_entries(path: Path) -> list[dict]:
             rebuilt_parts.append(f"{k}={kv_resolved.get(k, v)}")
 
         rebuilt_line = f"{module}.{func}({', '.join(rebuilt_parts)})"
-        final_res = compile_line(api, rebuilt_line)
+        final_res = compile_line(api, rebuilt_line, spec_sink=spec_sink)
         if not final_res:
             raise ValueError(f"Unknown action: {module}.{func}")
         return [*compiled_prefix, final_res]
 
+    mark_stage("setup")
     for line_idx, raw in enumerate(lines, start=1):
         line = raw.strip()
         if COMPILE_DEEP_DEBUG and (line_idx <= 30 or line_idx % 20 == 0):
@@ -3963,6 +4785,8 @@ def compile_entries(path: Path) -> list[dict]:
             )
         if not line or line.startswith("#"):
             continue
+        if profile is not None:
+            profile.line(line_idx, line, (current_kind, current_name or "") if current_kind else None)
 
         # Optional namespace sugar:
         # If user wrote `import test2` and then uses `test2.hello()`, strip `test2.`.
@@ -3981,7 +4805,7 @@ def compile_entries(path: Path) -> list[dict]:
             if kind == "if":
                 # Exit the server-side piston bracket by advancing the code cursor without placing anything.
                 # (Using "air" as a pause causes some servers to desync/teleport the player.)
-                append_action(("skip", "", "no"))
+                append_action(Action("skip", "", "no"))
             elif kind == "select":
                 prev = select_stack.pop() if select_stack else None
                 restore_default = select_default_stack.pop() if select_default_stack else DEFAULT_SELECT_PLAYER
@@ -4005,7 +4829,7 @@ def compile_entries(path: Path) -> list[dict]:
             block_stack.append("if")
             func = (m_ifp.group(1) or "").strip()
             arg_str = m_ifp.group(2) or ""
-            res = compile_line(api, f"if_player.{func}({arg_str})")
+            res = compile_line(api, f"if_player.{func}({arg_str})", spec_sink=spec_sink)
             if not res:
                 raise ValueError(f"Unknown if_player condition: {func}")
             pieces, spec = res
@@ -4027,7 +4851,7 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+            append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_select_ifp = SELECTOBJECT_IFPLAYER_RE.match(line)
@@ -4040,7 +4864,7 @@ def compile_entries(path: Path) -> list[dict]:
             func = (m_select_ifp.group(1) or "").strip()
             # Convert to lowercase for api lookup
             func_lower = func.lower()
-            res = compile_line(api, f"if_player.{func_lower}()")
+            res = compile_line(api, f"if_player.{func_lower}()", spec_sink=spec_sink)
             if not res:
                 raise ValueError(f"Unknown if_player condition: {func}")
             pieces, spec = res
@@ -4062,7 +4886,7 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+            append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_ifgame = IFGAME_RE.match(line)
@@ -4074,7 +4898,7 @@ def compile_entries(path: Path) -> list[dict]:
             block_stack.append("if")
             func = (m_ifgame.group(1) or "").strip()
             arg_str = m_ifgame.group(2) or ""
-            res = compile_line(api, f"if_game.{func}({arg_str})")
+            res = compile_line(api, f"if_game.{func}({arg_str})", spec_sink=spec_sink)
             if not res:
                 raise ValueError(f"Unknown if_game condition: {func}")
             pieces, spec = res
@@ -4096,7 +4920,7 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+            append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_ifgame_old = IFGAME_OLD_RE.match(line)
@@ -4109,7 +4933,7 @@ def compile_entries(path: Path) -> list[dict]:
             func = (m_ifgame_old.group(1) or "").strip()
             # Convert to lowercase for api lookup
             func_lower = func.lower()
-            res = compile_line(api, f"if_game.{func_lower}()")
+            res = compile_line(api, f"if_game.{func_lower}()", spec_sink=spec_sink)
             if not res:
                 raise ValueError(f"Unknown if_game condition: {func}")
             pieces, spec = res
@@ -4131,7 +4955,7 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+            append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_ifvalue = IFVALUE_RE.match(line)
@@ -4143,7 +4967,7 @@ def compile_entries(path: Path) -> list[dict]:
             block_stack.append("if")
             func = (m_ifvalue.group(1) or "").strip()
             arg_str = m_ifvalue.group(2) or ""
-            res = compile_line(api, f"if_value.{func}({arg_str})")
+            res = compile_line(api, f"if_value.{func}({arg_str})", spec_sink=spec_sink)
             if not res:
                 raise ValueError(f"Unknown if_value condition: {func}")
             pieces, spec = res
@@ -4163,7 +4987,7 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+            append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_ifexists = IFEXISTS_RE.match(line)
@@ -4174,7 +4998,7 @@ def compile_entries(path: Path) -> list[dict]:
                 raise ValueError("ifexists must be inside event/func/loop block")
             block_stack.append("if")
             v = (m_ifexists.group(1) or m_ifexists.group(2) or "").strip()
-            res = compile_line(api, f"if_value.var(var=var({v}))")
+            res = compile_line(api, f"if_value.var(var=var({v}))", spec_sink=spec_sink)
             pieces, spec = res
             sign1 = strip_colors(spec.get("sign1", "")).strip()
             sign2 = spec_menu_name(spec)
@@ -4192,7 +5016,7 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+            append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_ift = IFTEXT_RE.match(line)
@@ -4203,7 +5027,7 @@ def compile_entries(path: Path) -> list[dict]:
                 raise ValueError("iftext must be inside event/func/loop block")
             block_stack.append("if")
             first_if_action = True
-            for res in compile_iftext_condition(api, m_ift.group(1)):
+            for res in compile_iftext_condition(api, m_ift.group(1), spec_sink=spec_sink):
                 pieces, spec = res
                 sign1 = strip_colors(spec.get("sign1", "")).strip()
                 sign2 = spec_menu_name(spec)
@@ -4222,10 +5046,10 @@ def compile_entries(path: Path) -> list[dict]:
                 if expected_sign2:
                     StringName = f"{(menu or sign2)}||{expected_sign2}"
                 if first_if_action:
-                    append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+                    append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
                     first_if_action = False
                 else:
-                    append_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+                    append_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_if = IF_RE.match(line)
@@ -4236,7 +5060,7 @@ def compile_entries(path: Path) -> list[dict]:
                 raise ValueError("if must be inside event/func/loop block")
             block_stack.append("if")
             first_if_action = True
-            for res in compile_if_condition(api, m_if.group(1)):
+            for res in compile_if_condition(api, m_if.group(1), spec_sink=spec_sink):
                 pieces, spec = res
                 sign1 = strip_colors(spec.get("sign1", "")).strip()
                 sign2 = spec_menu_name(spec)
@@ -4255,10 +5079,10 @@ def compile_entries(path: Path) -> list[dict]:
                 if expected_sign2:
                     StringName = f"{(menu or sign2)}||{expected_sign2}"
                 if first_if_action:
-                    append_if_open_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+                    append_if_open_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
                     first_if_action = False
                 else:
-                    append_action((block_tok, StringName, ",".join(pieces) if pieces else "no"))
+                    append_action(Action(block_tok, StringName, ",".join(pieces) if pieces else "no"))
             continue
 
         m_ev = EVENT_RE.match(line)
@@ -4266,7 +5090,6 @@ def compile_entries(path: Path) -> list[dict]:
             if line_negated:
                 raise ValueError("NOT нельзя использовать перед event")
             flush_block()
-            begin_new_row()
             current_kind = "event"
             current_name = (m_ev.group(1) or m_ev.group(2) or "").strip()
             in_block = True
@@ -4276,7 +5099,6 @@ def compile_entries(path: Path) -> list[dict]:
             if line_negated:
                 raise ValueError("NOT нельзя использовать перед func")
             flush_block()
-            begin_new_row()
             current_kind = "func"
             current_name = m_fn.group(1)
             params_raw = (m_fn.group(2) or "").strip()
@@ -4293,7 +5115,6 @@ def compile_entries(path: Path) -> list[dict]:
             if line_negated:
                 raise ValueError("NOT нельзя использовать перед loop")
             flush_block()
-            begin_new_row()
             current_kind = "loop"
             current_name = m_lp.group(1)
             current_loop_ticks = int(m_lp.group(2))
@@ -4322,14 +5143,11 @@ def compile_entries(path: Path) -> list[dict]:
             canon, _spec = find_select_action(chain)
             # Compile via canonical `select` module. `find_action` already keeps
             # backward-compat fallback to legacy `misc` catalogs when needed.
-            sel_tuple, sel_spec = compile_action_tuple("select", canon, arg_str)
+            sel_action, sel_spec = compile_action("select", canon, arg_str)
             if line_negated and not _spec_is_conditional("select", sel_spec):
                 raise ValueError(f"NOT недопустим для неусловного действия: select.{chain}")
-            if line_negated:
-                append_action((sel_tuple[0], sel_tuple[1], sel_tuple[2], True))
-            else:
-                append_action(sel_tuple)
-            current_select = sel_tuple
+            append_action(sel_action.replace(negated=True) if line_negated else sel_action)
+            current_select = sel_action
 
             if has_block:
                 block_stack.append("select")
@@ -4349,7 +5167,7 @@ def compile_entries(path: Path) -> list[dict]:
             inside = (m_nested_msg.group(2) or "").strip()
             tmp_counter += 1
             tmp = f"{TMP_VAR_PREFIX}{tmp_counter}"
-            builtins = compile_builtin(api, f"{tmp} = {fn}({inside})", func_sigs=func_sigs)
+            builtins = compile_builtin(api, f"{tmp} = {fn}({inside})", func_sigs=func_sigs, spec_sink=spec_sink)
             if not builtins:
                 raise ValueError(f"Не получилось скомпилировать вызов функции {fn}() для вложенного message()")
             for pieces, spec in builtins:
@@ -4370,9 +5188,9 @@ def compile_entries(path: Path) -> list[dict]:
                 StringName = sign2
                 if expected_sign2:
                     StringName = f"{(menu or sign2)}||{expected_sign2}"
-                append_action((block_tok, StringName, args_str))
+                append_action(Action(block_tok, StringName, args_str))
             # Now emit the message itself using the computed tmp var.
-            res = compile_line(api, f'player.message("%var({tmp})%")')
+            res = compile_line(api, f'player.message("%var({tmp})%")', spec_sink=spec_sink)
             if not res:
                 raise ValueError("Не найдено действие player.message()")
             pieces, spec = res
@@ -4393,7 +5211,7 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_action((block_tok, StringName, args_str))
+            append_action(Action(block_tok, StringName, args_str))
             continue
 
         m_ret = re.match(r"^\s*return(?:\s*\(\s*(.*?)\s*\)\s*|\s+(.*))\s*$", line, re.I)
@@ -4416,6 +5234,7 @@ def compile_entries(path: Path) -> list[dict]:
             res = compile_line(
                 api,
                 f"array.vstavit_v_massiv(arr=arr({RET_STACK_NAME}), num=num({STACK_TOP_INDEX}), value={expr})",
+                spec_sink=spec_sink,
             )
             if not res:
                 raise ValueError("return: не найдено действие 'Вставить в массив'")
@@ -4437,10 +5256,10 @@ def compile_entries(path: Path) -> list[dict]:
             StringName = sign2
             if expected_sign2:
                 StringName = f"{(menu or sign2)}||{expected_sign2}"
-            append_action((block_tok, StringName, args_str))
+            append_action(Action(block_tok, StringName, args_str))
             continue
 
-        builtins = compile_builtin(api, line, func_sigs=func_sigs, debug_stacks=debug_stacks)
+        builtins = compile_builtin(api, line, func_sigs=func_sigs, debug_stacks=debug_stacks, spec_sink=spec_sink)
         if builtins:
             if line_negated:
                 raise ValueError("NOT недопустим для builtin/sugar выражения")
@@ -4459,7 +5278,7 @@ def compile_entries(path: Path) -> list[dict]:
                 _append_compiled_action(pieces, spec, negated=negated_here)
             continue
 
-        res = compile_line(api, line)
+        res = compile_line(api, line, spec_sink=spec_sink)
         if not res:
             _report_unresolved_line(idx=line_idx, raw_line=line, in_scope=in_block)
             continue
@@ -4470,46 +5289,300 @@ def compile_entries(path: Path) -> list[dict]:
         _append_compiled_action(pieces, spec, negated=line_negated)
 
     _compile_dbg(f"compile_loop.end entries_before_flush={len(entries)}")
+    if profile is not None:
+        profile.end_lines()
+    mark_stage("compile_loop", lines=len(lines))
     flush_block()
+    if defer_blocks:
+        if passes.is_enabled("outline"):
+            outline_counter = 1
+
+            def alloc_outline_func_name() -> str:
+                nonlocal outline_counter
+                while True:
+                    name = f"{OUTLINE_FUNC_PREFIX}{outline_counter}"
+                    outline_counter += 1
+                    if name not in used_func_names:
+                        used_func_names.add(name)
+                        return name
+
+            select_block_tok = DEFAULT_SELECT_PLAYER.block
+            cond_block_toks = {
+                str(v).replace("minecraft:", "")
+                for k, v in blocks.items()
+                if str(k).startswith("если") or str(k) == "иначе"
+            }
+            deferred_blocks, outlined_helpers, outlined_saved = passes.run(
+                "outline",
+                _outline_repeated_action_sequences,
+                deferred_blocks,
+                size=lambda blks: sum(len(b["actions"]) for b in blks),
+                make_call=build_call_action,
+                alloc_name=alloc_outline_func_name,
+                is_barrier=lambda a: a.block == select_block_tok or a.block in cond_block_toks,
+                is_default_selection=lambda a: a.same_block(DEFAULT_SELECT_PLAYER),
+            )
+            _compile_dbg(f"after_outline helpers={outlined_helpers} saved={outlined_saved}")
+            if outlined_helpers:
+                print(
+                    f"[warn] outline: moved {outlined_helpers} repeated sequence(s) into helper function(s), "
+                    f"saved {outlined_saved} block(s)",
+                    file=__import__("sys").stderr,
+                )
+        for block in deferred_blocks:
+            emit_and_drain(block)
+    if stream_spool is not None:
+        entries = join_rows(stream_proxy_rows)
+        stream_proxy_rows = []
     _compile_dbg(f"after_flush entries={len(entries)}")
-    entries, collapsed_autosplit = _collapse_autosplit_trampoline_funcs(entries)
-    _compile_dbg(f"after_collapse_autosplit entries={len(entries)} collapsed={collapsed_autosplit}")
-    if collapsed_autosplit:
+    mark_stage("flush", entries=len(entries))
+    if row_packer != "greedy":
+        passes.record("row-pack-dp", row_pack_seconds, row_pack_stats["greedy_rows"], row_pack_stats["rows"])
+    if row_packer != "greedy" and row_pack_stats["chains"]:
         print(
-            f"[warn] row auto-split post-pass: collapsed {collapsed_autosplit} trampoline helper function(s)",
+            f"[warn] row packer ({row_packer}): {row_pack_stats['chains']} split chain(s), "
+            f"rows {row_pack_stats['rows']} vs greedy {row_pack_stats['greedy_rows']}, "
+            f"selection restores {row_pack_stats['restores']} vs greedy {row_pack_stats['greedy_restores']}",
             file=__import__("sys").stderr,
         )
-    entries, promoted_named = _promote_autosplit_targets_into_named_wrappers(entries)
-    _compile_dbg(f"after_promote_named entries={len(entries)} promoted={promoted_named}")
-    if promoted_named:
-        print(
-            f"[warn] row auto-split post-pass: promoted {promoted_named} named wrapper function(s)",
-            file=__import__("sys").stderr,
+    if passes.is_enabled("collapse-autosplit"):
+        entries, collapsed_autosplit = passes.run(
+            "collapse-autosplit", _collapse_autosplit_trampoline_funcs, entries
         )
+        _compile_dbg(f"after_collapse_autosplit entries={len(entries)} collapsed={collapsed_autosplit}")
+        if collapsed_autosplit:
+            print(
+                f"[warn] row auto-split post-pass: collapsed {collapsed_autosplit} trampoline helper function(s)",
+                file=__import__("sys").stderr,
+            )
+    if passes.is_enabled("promote-named-autosplit"):
+        entries, promoted_named = passes.run(
+            "promote-named-autosplit", _promote_autosplit_targets_into_named_wrappers, entries
+        )
+        _compile_dbg(f"after_promote_named entries={len(entries)} promoted={promoted_named}")
+        if promoted_named:
+            print(
+                f"[warn] row auto-split post-pass: promoted {promoted_named} named wrapper function(s)",
+                file=__import__("sys").stderr,
+            )
+    if passes.is_enabled("tree-shake"):
+        entries, shaken_funcs, shaken_rows, shaken_bytes = passes.run(
+            "tree-shake", _tree_shake_unreachable_funcs, entries, exported_funcs
+        )
+        _compile_dbg(f"after_tree_shake entries={len(entries)} dropped={shaken_funcs}")
+        if shaken_funcs:
+            print(
+                f"[warn] tree-shake: dropped {shaken_funcs} unreachable function(s), "
+                f"saved {shaken_rows} row(s), {shaken_bytes} bytes",
+                file=__import__("sys").stderr,
+            )
+    mark_stage("post_passes", entries=len(entries))
+    if stream_spool is not None:
+        # Phase 2: surviving proxy rows form the patch table (header renames, call retargets);
+        # rows missing from it were dropped by passes.
+        patches: dict[int, tuple[dict, dict[int, str]]] = {}
+        for prow in split_rows(entries):
+            patches[prow[0]["__row"]] = (prow[0], {e["__idx"]: e.get("args") for e in prow[1:] if "__idx" in e})
+        entries = []
+        try:
+            for row_id, row in stream_spool:
+                patch = patches.get(row_id)
+                if patch is None:
+                    continue
+                head, call_args = patch
+                if "name" in head:
+                    row[0]["name"] = head["name"]
+                for idx, args in call_args.items():
+                    row[idx]["args"] = args
+                if plan_check is not None:
+                    plan_check.feed_row(row)
+                stream.write_row(row)
+        finally:
+            stream_spool.close()
+    elif stream is not None:
+        drain_emitted()
+    if plan_check is not None:
+        if stream is None:
+            plan_check.feed_all(entries)
+        plan_issues = plan_check.finish()
+        if plan_check.exhausted:
+            print(
+                f"[warn] plan validation: budget {plan_check_budget * 1000:.0f} ms exceeded, "
+                f"checked {plan_check.count} entries",
+                file=__import__("sys").stderr,
+            )
+        if plan_issues:
+            raise ValueError(f"plan validation: {len(plan_issues)} issue(s)\n{format_issues(plan_issues)}")
+    if pass_stats is not None:
+        pass_stats.extend(passes.stats)
+    mark_stage("finish", entries=len(entries))
     _compile_dbg(f"compile_entries.done entries={len(entries)}")
     return entries
 
-def compile_commands(path: Path) -> list[str]:
-    entries = compile_entries(path)
+
+def compile_plan_file(
+    path: Path,
+    out_path: Path,
+    *,
+    fmt: str = "pretty",
+    row_hashes: bool = False,
+    status: dict | None = None,
+    **kwargs,
+) -> int:
+    """
+    Streaming `compile_entries` + `write_plan`: same output bytes, without the full entries list
+    and serialized string in memory. Returns number of entries written.
+    When `status` is a dict, `status["unchanged"]` is set (existing identical plan left untouched).
+    """
+    with PlanStreamWriter(out_path, fmt, row_hashes=row_hashes) as writer:
+        compile_entries(path, stream=writer, **kwargs)
+    if status is not None:
+        status["unchanged"] = writer.unchanged
+    return writer.count
+
+def _command_action(entry: dict) -> tuple[str, str, str]:
+    args = entry.get("args")
+    return (entry.get("block") or "", entry.get("name") or "", "no" if args == "no" else (args or ""))
+
+
+def _row_split_points(row: list[dict]) -> list[int]:
+    """
+    Indices `i` where `row[i:]` may move into a continuation func: outside every condition scope.
+    A condition without its `skip` closer scopes to the end of the row, so nothing after it can move.
+    """
+    points = []
+    depth = 0
+    for i, e in enumerate(row[1:], start=1):
+        if depth == 0:
+            points.append(i)
+        block = e.get("block")
+        if block in COMMAND_SCOPE_BLOCKS:
+            depth += 1
+        elif block == "skip" and depth:
+            depth -= 1
+    points.append(len(row))
+    return points
+
+
+def pack_row_commands(
+    row: list[dict],
+    *,
+    call_action,
+    alloc_name,
+    max_len: int = MAX_CMD_LEN,
+) -> list[str]:
+    """
+    `/placeadvanced` commands for one plan row, each within `max_len` chars.
+    A row that does not fit is cut (greedily, which gives the fewest commands) at scope boundaries;
+    every piece but the last ends with `call(<continuation>)` and the next piece is that func.
+    A condition scope that does not fit even alone keeps its opener and `skip` in place and its body
+    moves into a func of its own (`if ... { call(<helper>) }`, as the plan autosplit does), which is
+    packed the same way after the row.
+    `call_action(name)` builds the call entry, `alloc_name()` returns an unused func name.
+    """
+
+    def command(header: tuple[str, str, str], body: list[dict]) -> str:
+        return build_placeadvanced_command(
+            event_block=header[0],
+            event_name=header[1],
+            event_args=header[2],
+            actions=[_command_action(e) for e in body],
+        )
+
+    def token_len(e: dict) -> int:
+        return len(_placeadvanced_tokens(*_command_action(e))) + 1
+
     out: list[str] = []
-    i = 0
-    while i < len(entries):
-        e = entries[i]
-        # each event starts a new /placeadvanced command; we emit one command per event block for now
-        if e.get("block") != "diamond_block":
-            i += 1
-            continue
-        event_name = e.get("name") or ""
-        actions: list[tuple[str, str, str]] = []
-        i += 1
-        while i < len(entries) and entries[i].get("block") != "diamond_block":
-            a = entries[i]
-            actions.append((a.get("block") or "", a.get("name") or "", "no" if a.get("args") == "no" else (a.get("args") or "")))
-            i += 1
-        cmd = build_placeadvanced_command(event_block="diamond_block", event_name=event_name, actions=actions)
-        if len(cmd) > MAX_CMD_LEN:
-            raise ValueError(f"/placeadvanced too long: {len(cmd)} > {MAX_CMD_LEN} chars")
-        out.append(cmd)
+    queue: list[tuple[tuple[str, str, str], list[dict]]] = [
+        ((row[0].get("block") or "", row[0].get("name") or "", row[0].get("args") or "no"), list(row[1:]))
+    ]
+    while queue:
+        header, body = queue.pop(0)
+        while True:
+            budget = max_len - len(command(header, []))
+            # ends[i]: length of the action tokens body[:i-1] (with separating spaces), as row indices.
+            ends = [0, 0]
+            for e in body:
+                ends.append(ends[-1] + token_len(e))
+            if ends[-1] <= budget:
+                out.append(command(header, body))
+                break
+            next_name = alloc_name()
+            call = call_action(next_name)
+            budget -= token_len(call)
+            cut = 1
+            for p in _row_split_points([row[0], *body]):
+                if 1 < p < len(body) + 1 and ends[p] <= budget:
+                    cut = p
+            if cut > 1:
+                out.append(command(header, [*body[: cut - 1], call]))
+                header = (FUNC_HEADER_BLOCK, next_name, "no")
+                body = body[cut - 1 :]
+                continue
+            # The first top-level item (an action or a whole condition scope) does not fit before a call.
+            is_scope = body[0].get("block") in COMMAND_SCOPE_BLOCKS
+            close = len(body) if is_scope else 0
+            depth = 0
+            for i, e in enumerate(body if is_scope else ()):
+                if e.get("block") in COMMAND_SCOPE_BLOCKS:
+                    depth += 1
+                elif e.get("block") == "skip" and depth:
+                    depth -= 1
+                    if depth == 0:
+                        close = i
+                        break
+            inner = body[1:close]
+            item_end = min(close + 1, len(body))
+            if is_scope and sum(map(token_len, inner)) > token_len(call):
+                # Scope body -> helper func; opener and `skip` stay here.
+                body = [body[0], call, *body[close:]]
+                queue.append(((FUNC_HEADER_BLOCK, next_name, "no"), inner))
+            elif item_end < len(body) and sum(map(token_len, body[:item_end])) > token_len(call):
+                # The item fits only without a continuation call after it: it moves into a func of its own.
+                queue.append(((FUNC_HEADER_BLOCK, next_name, "no"), body[:item_end]))
+                body = [call, *body[item_end:]]
+            else:
+                raise ValueError(
+                    f"/placeadvanced too long: `{header[1]}` action `{body[0].get('name') or body[0].get('block')}` "
+                    f"({token_len(body[0]) - 1} chars) does not fit {max_len} chars even in a continuation command; use --plan"
+                )
+    return out
+
+
+def compile_commands(
+    path: Path, *, max_len: int = MAX_CMD_LEN, action_specs: dict[int, dict] | None = None, **kwargs
+) -> list[str]:
+    """
+    `/placeadvanced` commands for `path`, one per plan row; rows longer than `max_len` chars
+    continue in `COMMAND_CONT_FUNC_PREFIX<N>` funcs (see `pack_row_commands`).
+    Other keyword arguments go to `compile_entries` (`source`, `strict_unknown`, ...).
+    """
+    entries = compile_entries(path, action_specs=action_specs, **kwargs)
+    rows = split_rows(entries)
+    used_names = {row_func_name(row) for row in rows}
+    counter = 1
+    call_template: Action | None = None
+
+    def alloc_name() -> str:
+        nonlocal counter
+        while f"{COMMAND_CONT_FUNC_PREFIX}{counter}" in used_names:
+            counter += 1
+        name = f"{COMMAND_CONT_FUNC_PREFIX}{counter}"
+        used_names.add(name)
+        return name
+
+    def call_action(name: str) -> dict:
+        nonlocal call_template
+        if call_template is None:
+            res = compile_builtin(load_api(), "call(__mldsl_cont)")
+            if not res:
+                raise ValueError("commands: call() compile failed")
+            call_template = action_from_result(res[0], blocks=load_allactions_map(), sign1_aliases=load_sign1_aliases())
+        return dict(call_template.to_entry(), args=call_template.args.replace("__mldsl_cont", name))
+
+    out: list[str] = []
+    for row in rows:
+        out.extend(pack_row_commands(row, call_action=call_action, alloc_name=alloc_name, max_len=max_len))
     return out
 
 def main():
@@ -4523,19 +5596,91 @@ def main():
     ap.add_argument("file", help="Path to .mldsl file")
     ap.add_argument("--plan", dest="plan_path", default=None, help="Write plan.json (entries format) to this path")
     ap.add_argument("--print-plan", action="store_true", help="Print plan.json (entries format) to stdout")
+    ap.add_argument(
+        "--tree-shake",
+        action="store_true",
+        help="Drop funcs unreachable from events/loops/`export` (plan output only)",
+    )
+    ap.add_argument(
+        "--outline",
+        action="store_true",
+        help="Move repeated action sequences into shared helper funcs (plan output only)",
+    )
+    ap.add_argument(
+        "--row-packer",
+        choices=ROW_PACKERS,
+        default="greedy",
+        help=(
+            "Call-chain row packing for long blocks: greedy (default) or dp (optimal cuts over top-level "
+            "boundaries only; blocks that need if-scope extraction fall back to greedy; reported vs greedy)"
+        ),
+    )
+    ap.add_argument(
+        "--cost-report",
+        dest="cost_report_path",
+        default=None,
+        help="Write static runtime cost report JSON to this path and print hotspot table to stderr",
+    )
+    ap.add_argument(
+        "--format",
+        dest="plan_format",
+        choices=PLAN_FORMATS,
+        default="pretty",
+        help="plan.json format: pretty (default) or compact (minified + string table)",
+    )
+    ap.add_argument(
+        "--row-hashes",
+        action="store_true",
+        help="Embed per-row content hashes and a plan fingerprint as `meta` in plan output",
+    )
+    ap.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write --plan incrementally while compiling (same output, lower peak memory)",
+    )
+    ap.add_argument(
+        "-O",
+        dest="opt_level",
+        choices=["0", "1", "2", "s"],
+        default="0",
+        help="Optimization preset: -O0 (default, historical output), -O1, -O2, -Os",
+    )
+    ap.add_argument("--enable-pass", action="append", default=[], metavar="NAME", help="Enable a single pass")
+    ap.add_argument("--disable-pass", action="append", default=[], metavar="NAME", help="Disable a single pass")
+    ap.add_argument("--pass-stats", action="store_true", help="Print per-pass wall time and size delta to stderr")
     args = ap.parse_args()
 
     src = Path(args.file)
 
-    if args.plan_path or args.print_plan:
-        entries = compile_entries(src)
-        plan = {"entries": entries}
-        if args.plan_path:
-            out_path = Path(args.plan_path)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(plan, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    if args.plan_path or args.print_plan or args.cost_report_path:
+        pass_stats: list[dict] = []
+        compile_kwargs = dict(
+            tree_shake=args.tree_shake,
+            outline=args.outline,
+            row_packer=args.row_packer,
+            opt_level=f"O{args.opt_level}",
+            enable_passes=args.enable_pass,
+            disable_passes=args.disable_pass,
+            pass_stats=pass_stats,
+        )
+        if args.stream and args.plan_path:
+            compile_plan_file(
+                src, Path(args.plan_path), fmt=args.plan_format, row_hashes=args.row_hashes, **compile_kwargs
+            )
+            entries = read_plan(Path(args.plan_path)) if (args.print_plan or args.cost_report_path) else []
+        else:
+            entries = compile_entries(src, **compile_kwargs)
+            if args.plan_path:
+                write_plan(Path(args.plan_path), entries, args.plan_format, row_hashes=args.row_hashes)
+        if args.pass_stats:
+            print(format_pass_stats(pass_stats), file=__import__("sys").stderr)
+        if args.cost_report_path:
+            from mldsl_cost import format_cost_table, write_cost_report
+
+            report = write_cost_report(entries, Path(args.cost_report_path))
+            print(format_cost_table(report), file=__import__("sys").stderr)
         if args.print_plan:
-            print(json.dumps(plan, ensure_ascii=False, indent=2))
+            print(dumps_plan(entries, args.plan_format, row_hashes=args.row_hashes), end="")
         return
 
     cmds = compile_commands(src)
@@ -0,0 +1,207 @@
+"""
+Static runtime cost report over plan entries (`plan.json` entries format).
+
+Units are events, funcs and loops (grouped by row header, continuation rows included).
+Worst case assumes every conditional body runs and follows static `call(...)` targets transitively.
+"""
+
+from __future__ import annotations
+
+import json
+
+from mldsl_plan import (
+    EVENT_HEADER_BLOCKS,
+    FUNC_HEADER_BLOCK,
+    LOOP_HEADER_BLOCK,
+    call_target,
+    split_rows,
+)
+
+COST_REPORT_VERSION = 1
+ARRAY_BLOCK = "bookshelf"
+SELECT_BLOCK = "purpur_block"
+SCOPE_CLOSER_BLOCK = "skip"
+# Server tick rate; loop weight is runs per second (20 / ticks).
+TICKS_PER_SECOND = 20
+
+
+def _unit_kind(header: dict) -> str | None:
+    block = header.get("block")
+    if block in EVENT_HEADER_BLOCKS:
+        return "event"
+    if block == FUNC_HEADER_BLOCK:
+        return "func"
+    if block == LOOP_HEADER_BLOCK:
+        return "loop"
+    return None
+
+
+def _is_array_op(entry: dict) -> bool:
+    if entry.get("block") == ARRAY_BLOCK:
+        return True
+    return "массив" in str(entry.get("name") or "").lower()
+
+
+def _loop_ticks(header: dict) -> int:
+    try:
+        return max(1, int(str(header.get("args") or "").strip()))
+    except ValueError:
+        return 1
+
+
+def cost_report(entries: list[dict]) -> dict:
+    """Builds the cost report dict: per-unit metrics plus hotspot ranking."""
+    units: dict[tuple[str, str], dict] = {}
+    for row in split_rows(entries):
+        kind = _unit_kind(row[0])
+        if kind is None:
+            continue
+        name = str(row[0].get("name") or "")
+        key = (kind, name)
+        unit = units.get(key)
+        if unit is None:
+            unit = {
+                "kind": kind,
+                "name": name,
+                "rows": 0,
+                "actions": 0,
+                "executed": 0,
+                "array_ops": 0,
+                "selection_switches": 0,
+                "calls": [],
+                "dynamic_calls": 0,
+                "ticks": _loop_ticks(row[0]) if kind == "loop" else None,
+            }
+            units[key] = unit
+        unit["rows"] += 1
+        for entry in row[1:]:
+            unit["actions"] += 1
+            if entry.get("block") == SCOPE_CLOSER_BLOCK:
+                continue
+            unit["executed"] += 1
+            if _is_array_op(entry):
+                unit["array_ops"] += 1
+            if entry.get("block") == SELECT_BLOCK:
+                unit["selection_switches"] += 1
+            is_call, target = call_target(entry)
+            if is_call:
+                if target is None:
+                    unit["dynamic_calls"] += 1
+                else:
+                    unit["calls"].append(target)
+
+    funcs = {name: unit for (kind, name), unit in units.items() if kind == "func"}
+    memo: dict[str, tuple[int, int, int, int, bool]] = {}
+    in_progress: set[str] = set()
+
+    def _frame(name: str | None, unit: dict) -> list:
+        # [name, calls, next call index, executed, array ops, selections, depth, recursive]
+        return [name, unit["calls"], 0, unit["executed"], unit["array_ops"], unit["selection_switches"], 0, False]
+
+    def _totals(name: str | None, unit: dict) -> tuple[int, int, int, int, bool]:
+        # (worst executed, worst array ops, worst selection switches, call depth, recursive);
+        # `name` is set for funcs (memoized). Iterative post-order: autosplit helper chains can be very deep.
+        if name is not None and name in memo:
+            return memo[name]
+        if name is not None:
+            in_progress.add(name)
+        stack = [_frame(name, unit)]
+        while True:
+            frame = stack[-1]
+            if frame[2] < len(frame[1]):
+                target = frame[1][frame[2]]
+                frame[2] += 1
+                callee = funcs.get(target)
+                if callee is None:
+                    continue
+                if target in in_progress:
+                    frame[7] = True
+                    continue
+                sub = memo.get(target)
+                if sub is None:
+                    in_progress.add(target)
+                    stack.append(_frame(target, callee))
+                    continue
+            else:
+                stack.pop()
+                sub = (frame[3], frame[4], frame[5], frame[6], frame[7])
+                if frame[0] is not None:
+                    in_progress.discard(frame[0])
+                    memo[frame[0]] = sub
+                if not stack:
+                    return sub
+                frame = stack[-1]
+            frame[3] += sub[0]
+            frame[4] += sub[1]
+            frame[5] += sub[2]
+            frame[6] = max(frame[6], sub[3] + 1)
+            frame[7] = frame[7] or sub[4]
+
+    out_units: list[dict] = []
+    for (kind, name), unit in units.items():
+        executed, array_ops, selections, depth, recursive = _totals(name if kind == "func" else None, unit)
+        weight = (TICKS_PER_SECOND / unit["ticks"]) if kind == "loop" else 1.0
+        out_units.append(
+            {
+                "kind": kind,
+                "name": name,
+                "rows": unit["rows"],
+                "actions": unit["actions"],
+                "worst_case_actions": executed,
+                "array_ops": array_ops,
+                "selection_switches": selections,
+                "call_depth": depth,
+                "static_calls": len(unit["calls"]),
+                "dynamic_calls": unit["dynamic_calls"],
+                "recursive": recursive,
+                "ticks": unit["ticks"],
+                "weight": round(weight, 3),
+                "score": round(executed * weight, 3),
+            }
+        )
+
+    hotspots = sorted(out_units, key=lambda u: (-u["score"], u["kind"], u["name"]))
+    return {
+        "version": COST_REPORT_VERSION,
+        "units": out_units,
+        "hotspots": [{"kind": u["kind"], "name": u["name"], "score": u["score"]} for u in hotspots],
+    }
+
+
+def format_cost_table(report: dict, *, limit: int | None = None) -> str:
+    """Renders the report as a fixed-width table, hotspots first."""
+    cols = [
+        ("kind", "kind"),
+        ("name", "name"),
+        ("rows", "rows"),
+        ("actions", "acts"),
+        ("worst_case_actions", "worst"),
+        ("array_ops", "arr"),
+        ("selection_switches", "sel"),
+        ("call_depth", "depth"),
+        ("ticks", "ticks"),
+        ("score", "score"),
+    ]
+    by_key = {(u["kind"], u["name"]): u for u in report.get("units", [])}
+    ordered = [by_key[(h["kind"], h["name"])] for h in report.get("hotspots", [])]
+    if limit is not None:
+        ordered = ordered[:limit]
+    table = [[title for _key, title in cols]]
+    for u in ordered:
+        row = []
+        for key, _title in cols:
+            val = u.get(key)
+            if key == "name" and u.get("recursive"):
+                val = f"{val}*"
+            row.append("-" if val is None else str(val))
+        table.append(row)
+    widths = [max(len(r[i]) for r in table) for i in range(len(cols))]
+    lines = ["  ".join(cell.ljust(widths[i]) for i, cell in enumerate(r)).rstrip() for r in table]
+    return "\n".join(lines)
+
+
+def write_cost_report(entries: list[dict], path) -> dict:
+    report = cost_report(entries)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return report
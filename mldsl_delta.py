@@ -0,0 +1,133 @@
+"""
+Row-level plan delta: what changed between a previously printed plan (`--base`) and a new one.
+
+Rows are identified by `<header block>:<header name>#<occurrence>`. Generated helper funcs
+(`__autosplit_row_N`, `__outline_seq_N`) are renumbered per compile, so before diffing the new
+plan's helpers are renamed to the base names of helpers with the same content.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from mldsl_plan import (
+    FUNC_HEADER_BLOCK,
+    generated_func_parts,
+    is_generated_func_name,
+    plan_row_hashes,
+    rename_funcs,
+    row_content_key,
+    split_rows,
+)
+
+DELTA_FORMAT = "mldsl-plan-delta"
+DELTA_VERSION = 1
+
+
+def _func_rows(rows: list[list[dict]]) -> dict[str, list[list[dict]]]:
+    out: dict[str, list[list[dict]]] = {}
+    for row in rows:
+        if row and row[0].get("block") == FUNC_HEADER_BLOCK:
+            out.setdefault(str(row[0].get("name") or ""), []).append(row)
+    return out
+
+
+def align_generated_names(base_entries: list[dict], new_entries: list[dict]) -> tuple[list[dict], dict[str, str]]:
+    """
+    Renames generated helper funcs of the new plan to base names when the helper content matches
+    (compared with helper numbers normalized). Unmatched helpers that would collide with a reused
+    base name get fresh numbers. Returns (renamed entries, mapping new -> base/fresh).
+    """
+    base_funcs = _func_rows(split_rows(base_entries))
+    new_funcs = _func_rows(split_rows(new_entries))
+
+    by_content: dict[tuple[str, ...], list[str]] = {}
+    for name, rows in base_funcs.items():
+        if is_generated_func_name(name):
+            by_content.setdefault(tuple(row_content_key(r) for r in rows), []).append(name)
+
+    mapping: dict[str, str] = {}
+    for name, rows in new_funcs.items():
+        if not is_generated_func_name(name):
+            continue
+        candidates = by_content.get(tuple(row_content_key(r) for r in rows))
+        if candidates:
+            mapping[name] = candidates.pop(0)
+
+    claimed = set(mapping.values())
+    numbers = [parts[1] for name in [*base_funcs, *new_funcs] for parts in [generated_func_parts(name)] if parts]
+    next_num = max(numbers, default=0) + 1
+    for name in new_funcs:
+        if not is_generated_func_name(name) or name in mapping or name not in claimed:
+            continue
+        prefix, _num = generated_func_parts(name)
+        mapping[name] = f"{prefix}{next_num}"
+        next_num += 1
+
+    mapping = {old: new for old, new in mapping.items() if old != new}
+    return rename_funcs(new_entries, mapping), mapping
+
+
+def _row_ids(rows: list[list[dict]]) -> list[str]:
+    seen: dict[tuple[str, str], int] = {}
+    ids: list[str] = []
+    for row in rows:
+        key = (str(row[0].get("block") or ""), str(row[0].get("name") or ""))
+        k = seen.get(key, 0)
+        seen[key] = k + 1
+        ids.append(f"{key[0]}:{key[1]}#{k}")
+    return ids
+
+
+def plan_delta(base_entries: list[dict], new_entries: list[dict]) -> dict:
+    """
+    Diffs two plans row by row (call `align_generated_names` first to absorb helper renumbering).
+    Indexes are physical row positions (0-based) in the respective plan.
+    """
+    base_rows = split_rows(base_entries)
+    new_rows = split_rows(new_entries)
+    new_hashes, fingerprint = plan_row_hashes(new_entries)
+    base_by_id = {rid: (idx, row) for idx, (rid, row) in enumerate(zip(_row_ids(base_rows), base_rows))}
+    added: list[dict] = []
+    changed: list[dict] = []
+    unchanged = 0
+    new_ids = _row_ids(new_rows)
+    for idx, (rid, row) in enumerate(zip(new_ids, new_rows)):
+        base = base_by_id.get(rid)
+        if base is None:
+            added.append({"id": rid, "index": idx, "hash": new_hashes[idx], "entries": row})
+        elif row_content_key(base[1], normalize=False) != row_content_key(row, normalize=False):
+            changed.append(
+                {"id": rid, "index": idx, "base_index": base[0], "hash": new_hashes[idx], "entries": row}
+            )
+        else:
+            unchanged += 1
+    new_id_set = set(new_ids)
+    removed = [
+        {"id": rid, "base_index": idx} for rid, (idx, _row) in base_by_id.items() if rid not in new_id_set
+    ]
+    return {
+        "format": DELTA_FORMAT,
+        "version": DELTA_VERSION,
+        "rows_base": len(base_rows),
+        "rows_new": len(new_rows),
+        "base_fingerprint": plan_row_hashes(base_entries)[1],
+        "fingerprint": fingerprint,
+        "unchanged": unchanged,
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+    }
+
+
+def write_delta(path: Path, delta: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(delta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def format_delta_summary(delta: dict) -> str:
+    return (
+        f"delta: +{len(delta['added'])} added, ~{len(delta['changed'])} changed, "
+        f"-{len(delta['removed'])} removed, {delta['unchanged']} unchanged row(s)"
+    )
@@ -0,0 +1,93 @@
+"""
+Structured compiler telemetry: events go to registered sinks (JSONL file, in-process callback).
+
+With no sink registered `emit` returns right away; hot paths check `sinks` before building the event.
+Event records are flat dicts: `{"event": name, "ts": unix seconds, **fields}`.
+
+Events:
+- `compile_started` / `compile_finished` / `compile_failed`: path, ms, entries, rows (finished), error (failed);
+- `stage`: compiler stage boundary with its wall time (`stage`, `ms`, optional `lines`/`entries`);
+- `block_emitted`: top-level block flushed to the plan (`kind`, `name`, `actions`, `entries`);
+- `autosplit`: row auto-split decision (`decision`: part/extract/restore_selection/newline, `block`, `call`);
+- `unresolved_line`: unrecognized source line (`line`, `text`, `in_scope`, `strict`);
+- `cache`: data cache lookup (`cache`, `hit`);
+- `donate_tier`: required donate tier of the compiled source (`tier`, `matched`).
+
+`MLDSL_EVENTS=path.jsonl` (or `mldsl compile --events path.jsonl`) appends events to a file, so batch builds
+can be aggregated across processes.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+ENV_VAR = "MLDSL_EVENTS"
+
+Sink = Callable[[dict], None]
+sinks: list[Sink] = []
+
+
+def emit(event: str, **fields) -> None:
+    if not sinks:
+        return
+    record = {"event": event, "ts": round(time.time(), 6), **fields}
+    for sink in list(sinks):
+        sink(record)
+
+
+def add_sink(sink: Sink) -> Sink:
+    sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink: Sink) -> None:
+    if sink in sinks:
+        sinks.remove(sink)
+
+
+@contextmanager
+def sink(callback: Sink) -> Iterator[Sink]:
+    """Registers `callback` for the duration of the block."""
+    add_sink(callback)
+    try:
+        yield callback
+    finally:
+        remove_sink(callback)
+
+
+class JsonlSink:
+    """Appends one JSON object per line; each record is flushed so concurrent builds interleave by line."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def __call__(self, record: dict) -> None:
+        import json  # kept out of module scope: the CLI imports this module on every start
+
+        self._fh.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+@contextmanager
+def jsonl_sink(path: Path) -> Iterator[JsonlSink]:
+    out = JsonlSink(path)
+    add_sink(out)
+    try:
+        yield out
+    finally:
+        remove_sink(out)
+        out.close()
+
+
+def env_jsonl_path() -> Path | None:
+    raw = os.environ.get(ENV_VAR, "").strip()
+    return Path(raw).expanduser() if raw else None
@@ -0,0 +1,128 @@
+"""
+Build fingerprint of a plan: what the compiler output depends on.
+
+Covers the source `import` closure (file contents), the data snapshot (api_aliases, Aliases.json,
+allactions.txt, gamevalues, actions catalog), the compiler version and the output options.
+It is stored next to the plan as `<plan>.fingerprint` (the plan bytes stay as before), so
+`mldsl compile --fingerprint-only` can tell whether a compile would change the plan without compiling.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import mldsl_compile
+from mldsl_paths import actions_catalog_path
+
+# Bump on output-affecting compiler changes that the source hash below cannot see (frozen builds).
+COMPILER_VERSION = "1"
+FINGERPRINT_SUFFIX = ".fingerprint"
+FINGERPRINT_FORMAT = "mldsl-build-fingerprint"
+# Modules whose code shapes the plan; hashed into the compiler version when the sources are available.
+_COMPILER_MODULES = ("mldsl_compile.py", "mldsl_plan.py", "mldsl_passes.py", "mldsl_validate.py")
+
+
+def _file_sha256(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def compiler_version() -> str:
+    """`COMPILER_VERSION`, plus a hash of the compiler sources when running from source."""
+    here = Path(__file__).resolve().parent
+    return mldsl_compile._memo_by_files(
+        "compiler_version", [here / name for name in _COMPILER_MODULES], lambda: _compiler_version(here)
+    )
+
+
+def _compiler_version(here: Path) -> str:
+    h = hashlib.sha256()
+    found = False
+    for name in _COMPILER_MODULES:
+        digest = _file_sha256(here / name)
+        if digest is not None:
+            found = True
+            h.update(f"{name}:{digest}\n".encode("utf-8"))
+    return f"{COMPILER_VERSION}+src.{h.hexdigest()[:12]}" if found else COMPILER_VERSION
+
+
+def data_snapshot_hash() -> str:
+    """
+    Hash of the data files the compiler loads (missing files count as absent).
+    Reused while the files keep their mtime/size, like the compiler's own data caches.
+    """
+    paths = {
+        "api_aliases": mldsl_compile.API_PATH,
+        "aliases": mldsl_compile.ALIASES_PATH,
+        "allactions": mldsl_compile.ALLACTIONS_PATH,
+        "gamevalues": mldsl_compile.GAMEVALUES_PATH,
+        "actions_catalog": actions_catalog_path(),
+    }
+    return mldsl_compile._memo_by_files("data_snapshot_hash", list(paths.values()), lambda: _data_snapshot_hash(paths))
+
+
+def _data_snapshot_hash(paths: dict[str, Path]) -> str:
+    h = hashlib.sha256()
+    for key, path in paths.items():
+        h.update(f"{key}:{_file_sha256(path) or '-'}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def build_fingerprint(entry: Path, options: dict, *, source: str | None = None) -> dict:
+    """
+    Fingerprint record for compiling `entry` with `options` (JSON-serializable output options).
+    Source paths are relative to the entry file's directory, so the record is stable across checkouts.
+    `source` is the in-memory contents of `entry` (`mldsl compile -`).
+    """
+    entry = Path(entry).resolve()
+    sources = {}
+    for path in mldsl_compile.source_closure(entry, source=source):
+        rel = os.path.relpath(path, entry.parent).replace("\\", "/")
+        if source is not None and path == entry:
+            sources[rel] = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        else:
+            sources[rel] = _file_sha256(path) or "-"
+    record = {
+        "compiler": compiler_version(),
+        "data": data_snapshot_hash(),
+        "sources": sources,
+        "options": options,
+    }
+    canonical = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return {"format": FINGERPRINT_FORMAT, "fingerprint": hashlib.sha256(canonical.encode("utf-8")).hexdigest(), **record}
+
+
+def fingerprint_path(plan_path: Path) -> Path:
+    plan_path = Path(plan_path)
+    return plan_path.with_name(plan_path.name + FINGERPRINT_SUFFIX)
+
+
+def read_fingerprint(plan_path: Path) -> dict | None:
+    try:
+        data = json.loads(fingerprint_path(plan_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and data.get("format") == FINGERPRINT_FORMAT else None
+
+
+def write_fingerprint(plan_path: Path, fingerprint: dict) -> None:
+    """Stores `fingerprint` with the hash of the plan file as it is now."""
+    record = {**fingerprint, "plan_sha256": _file_sha256(plan_path)}
+    path = fingerprint_path(plan_path)
+    text = json.dumps(record, ensure_ascii=False, indent=2) + "\n"
+    if path.exists() and path.read_text(encoding="utf-8") == text:
+        return
+    path.write_text(text, encoding="utf-8")
+
+
+def plan_is_current(plan_path: Path, fingerprint: dict) -> bool:
+    """True when the plan on disk was produced from the same inputs and was not modified since."""
+    stored = read_fingerprint(plan_path)
+    if stored is None or stored.get("fingerprint") != fingerprint.get("fingerprint"):
+        return False
+    return stored.get("plan_sha256") is not None and stored.get("plan_sha256") == _file_sha256(plan_path)
@@ -0,0 +1,73 @@
+"""
+Import-time breakdown for CLI startup (`MLDSL_IMPORT_PROFILE=1 mldsl ...`).
+
+Wraps `builtins.__import__` and times each module the first time it is imported (inclusive time
+and self time without nested imports). Works in the frozen `mldsl.exe` too, where `-X importtime`
+is not available. The table goes to stderr when the process exits, slowest (self time) first.
+"""
+
+from __future__ import annotations
+
+import atexit
+import builtins
+import os
+import sys
+import time
+
+ENV_VAR = "MLDSL_IMPORT_PROFILE"
+DEFAULT_LIMIT = 25
+
+_records: dict[str, list[float]] = {}
+_stack: list[list[float]] = []
+_installed_at: float | None = None
+
+
+def enabled() -> bool:
+    return os.environ.get(ENV_VAR, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def install(*, report_at_exit: bool = True) -> None:
+    """Starts recording imports; idempotent."""
+    global _installed_at
+    if _installed_at is not None:
+        return
+    _installed_at = time.perf_counter()
+    real_import = builtins.__import__
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return real_import(name, globals, locals, fromlist, level)
+        frame = [0.0]  # time spent in nested first-time imports
+        _stack.append(frame)
+        t0 = time.perf_counter()
+        try:
+            return real_import(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - t0
+            _stack.pop()
+            if _stack:
+                _stack[-1][0] += total
+            if name not in _records:
+                _records[name] = [total, total - frame[0]]
+
+    builtins.__import__ = timed_import
+    if report_at_exit:
+        atexit.register(lambda: print(format_report(), file=sys.stderr))
+
+
+def records() -> dict[str, tuple[float, float]]:
+    """Module name -> (inclusive seconds, self seconds)."""
+    return {name: (rec[0], rec[1]) for name, rec in _records.items()}
+
+
+def format_report(limit: int = DEFAULT_LIMIT) -> str:
+    rows = sorted(_records.items(), key=lambda kv: -kv[1][1])
+    since = (time.perf_counter() - _installed_at) * 1000 if _installed_at is not None else 0.0
+    self_total = sum(rec[1] for rec in _records.values()) * 1000
+    lines = [f"[import-profile] {len(rows)} module(s), {self_total:.1f} ms importing, {since:.1f} ms since start"]
+    lines.append(f"{'self ms':>9} {'incl ms':>9}  module")
+    for name, (incl, self_s) in rows[:limit]:
+        lines.append(f"{self_s * 1000:9.2f} {incl * 1000:9.2f}  {name}")
+    if len(rows) > limit:
+        lines.append(f"... {len(rows) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,122 @@
+"""
+Plan linker: merges independently compiled plans into one world plan (`mldsl link a.json b.json -o world.json`).
+
+Works on whole physical rows (row boundaries are kept). Funcs are compared by content
+(`plan_row_hashes`: generated helpers are hashed by their own content, so helper numbering does not matter):
+- a func defined with the same content in an earlier plan is dropped (shared library code is placed once);
+- a user func whose name is taken by a different body is renamed to `<name>__<plan#>` in the later plan
+  (static `call(...)` targets are retargeted; callers whose body changed this way are compared again);
+- generated helpers (`__autosplit_row_N`, `__outline_seq_N`) are matched by content or moved to a fresh
+  number range above every input plan.
+"""
+
+from __future__ import annotations
+
+from mldsl_plan import (
+    generated_func_parts,
+    is_generated_func_name,
+    join_rows,
+    plan_row_hashes,
+    rename_funcs,
+    row_func_name,
+    split_rows,
+)
+
+
+def _func_signatures(rows: list[list[dict]], row_hashes: list[str]) -> dict[str, tuple[str, ...]]:
+    sigs: dict[str, list[str]] = {}
+    for row, h in zip(rows, row_hashes):
+        name = row_func_name(row)
+        if name is not None:
+            sigs.setdefault(name, []).append(h)
+    return {name: tuple(hs) for name, hs in sigs.items()}
+
+
+def link_plans(plans: list[list[dict]], *, labels: list[str] | None = None) -> tuple[list[dict], dict]:
+    """
+    Links plan entry lists in order. Returns (entries, report); the report lists dropped duplicates
+    and renames per plan label.
+    """
+    labels = list(labels or [f"plan#{i + 1}" for i in range(len(plans))])
+    all_names: set[str] = set()
+    next_num: dict[str, int] = {}
+    for entries in plans:
+        for row in split_rows(entries):
+            name = row_func_name(row)
+            if name is None:
+                continue
+            all_names.add(name)
+            parts = generated_func_parts(name)
+            if parts:
+                next_num[parts[0]] = max(next_num.get(parts[0], 1), parts[1] + 1)
+
+    taken: dict[str, tuple[str, ...]] = {}
+    helper_by_sig: dict[tuple[str, ...], str] = {}
+    out_rows: list[list[dict]] = []
+    report = {"plans": len(plans), "deduped": [], "renamed": [], "rows": 0}
+
+    for plan_no, (entries, label) in enumerate(zip(plans, labels), start=1):
+        # 1) Rename user funcs that clash with a different earlier body; repeat since renames change callers.
+        user_map: dict[str, str] = {}
+        while True:
+            renamed = rename_funcs(entries, user_map)
+            rows = split_rows(renamed)
+            sigs = _func_signatures(rows, plan_row_hashes(renamed)[0])
+            clashes = [
+                name
+                for name, sig in sigs.items()
+                if not is_generated_func_name(name) and name in taken and taken[name] != sig
+            ]
+            if not clashes:
+                break
+            for name in clashes:
+                fresh = f"{name}__{plan_no}"
+                k = 2
+                while fresh in all_names:
+                    fresh = f"{name}__{plan_no}_{k}"
+                    k += 1
+                all_names.add(fresh)
+                user_map[name] = fresh
+                report["renamed"].append({"plan": label, "from": name, "to": fresh})
+
+        # 2) Drop funcs already linked with the same content; match or renumber generated helpers.
+        drop: set[str] = set()
+        helper_map: dict[str, str] = {}
+        for name, sig in sigs.items():
+            if is_generated_func_name(name):
+                existing = helper_by_sig.get(sig)
+                if existing is not None:
+                    drop.add(name)
+                    if existing != name:
+                        helper_map[name] = existing
+                    report["deduped"].append({"plan": label, "func": name, "as": existing})
+                    continue
+                final = name
+                if name in taken:
+                    prefix, _num = generated_func_parts(name)
+                    final = f"{prefix}{next_num[prefix]}"
+                    next_num[prefix] += 1
+                    helper_map[name] = final
+                helper_by_sig[sig] = final
+                taken[final] = sig
+            elif name in taken:
+                drop.add(name)
+                report["deduped"].append({"plan": label, "func": name, "as": name})
+            else:
+                taken[name] = sig
+
+        for row in rows:
+            if row_func_name(row) in drop:
+                continue
+            out_rows.append(rename_funcs(row, helper_map))
+
+    entries = join_rows(out_rows)
+    report["rows"] = len(out_rows)
+    return entries, report
+
+
+def format_link_summary(report: dict) -> str:
+    return (
+        f"linked {report['plans']} plan(s): {report['rows']} row(s), "
+        f"{len(report['deduped'])} duplicate func(s) dropped, {len(report['renamed'])} func(s) renamed"
+    )
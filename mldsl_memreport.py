@@ -0,0 +1,126 @@
+"""
+Per-stage memory report (`mldsl compile --mem-report out.json`) built on `tracemalloc`.
+
+At every compiler stage boundary (the same marks as `--profile`) the report records:
+- `peak_kb`: traced peak during the stage (the peak is reset at each mark);
+- `retained_kb`: traced memory still alive at the end of the stage, `delta_kb` its growth over the stage;
+- `top`: source lines (`file:line`) whose live allocations grew the most during the stage.
+The report ends with the top allocation sites still alive at the last mark.
+
+Tracing slows the compile down several times; numbers are traced Python allocations, not RSS.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tracemalloc
+from pathlib import Path
+
+MEM_TOP_SITES = 10
+# Allocations made by the profiler itself and by the import machinery are not attributed to stages.
+_IGNORED_FILES = (
+    tracemalloc.__file__,
+    os.path.abspath(__file__),
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    "<unknown>",
+)
+
+
+_active: "MemReport | None" = None
+
+
+def _kb(size: int) -> int:
+    return round(size / 1024)
+
+
+class MemReport:
+    """Traces allocations from creation to `stop()`; pass as `compile_entries(mem_report=...)`."""
+
+    def __init__(self, top: int = MEM_TOP_SITES):
+        global _active
+        if _active is not None:
+            # A previous report was not stopped (compile error in `watch`): do not keep tracing for it.
+            _active.stop()
+        _active = self
+        self.top = top
+        self.stages: list[dict] = []
+        self.sites: list[dict] = []
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._start_kb = _kb(tracemalloc.get_traced_memory()[0])
+        self._prev_kb = self._start_kb
+        self._prev_sites: dict[str, int] = self._site_sizes(self._snapshot())
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        snap = tracemalloc.take_snapshot()
+        return snap.filter_traces([tracemalloc.Filter(False, name) for name in _IGNORED_FILES])
+
+    @staticmethod
+    def _site_sizes(snap: tracemalloc.Snapshot) -> dict[str, int]:
+        return {_site(stat.traceback): stat.size for stat in snap.statistics("lineno")}
+
+    def mark(self, stage: str, **info) -> None:
+        """Ends stage `stage` (it started at the previous mark)."""
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        sites = self._site_sizes(self._snapshot())
+        grown = sorted(
+            ((size - self._prev_sites.get(site, 0), site) for site, size in sites.items()),
+            reverse=True,
+        )
+        self.stages.append(
+            {
+                "stage": stage,
+                "peak_kb": _kb(peak),
+                "retained_kb": _kb(current),
+                "delta_kb": _kb(current) - self._prev_kb,
+                "top": [{"site": site, "kb": _kb(size)} for size, site in grown[: self.top] if size > 0],
+                **info,
+            }
+        )
+        live = sorted(sites.items(), key=lambda kv: -kv[1])[: self.top]
+        self.sites = [{"site": site, "kb": _kb(size)} for site, size in live]
+        self._prev_sites = sites
+        self._prev_kb = _kb(current)
+        tracemalloc.reset_peak()
+
+    def stop(self) -> None:
+        global _active
+        if self._started and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started = False
+        if _active is self:
+            _active = None
+
+    def peak_kb(self) -> int:
+        return max((st["peak_kb"] for st in self.stages), default=0)
+
+    def report(self) -> dict:
+        return {"start_kb": self._start_kb, "peak_kb": self.peak_kb(), "stages": self.stages, "top_sites": self.sites}
+
+    def write(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        return path
+
+
+def _site(tb: tracemalloc.Traceback) -> str:
+    frame = tb[0]
+    return f"{Path(frame.filename).name}:{frame.lineno}"
+
+
+def format_mem_summary(report: MemReport, limit: int = 3) -> str:
+    stages = ", ".join(f"{st['stage']} {st['peak_kb']}/{st['retained_kb']}" for st in report.stages)
+    worst = max(report.stages, key=lambda st: st["peak_kb"], default=None)
+    out = f"memory (KiB peak/retained): {stages}"
+    if worst is not None and worst["top"]:
+        sites = "; ".join(f"{s['site']} +{s['kb']}" for s in worst["top"][:limit])
+        out += f"; grew in {worst['stage']}: {sites}"
+    return out
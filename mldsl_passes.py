@@ -0,0 +1,103 @@
+"""
+Optimization pass registry and pass manager for `compile_entries`.
+
+Passes run over the compiler IR in pipeline order:
+- `blocks` stage: flushed block records (action tuples) before row placement;
+- `placement` stage: row packing strategy used while emitting rows;
+- `entries` stage: plan entries after placement.
+
+`-O0` is the historical default pipeline (byte-identical output).
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Iterable
+
+# name -> (stage, description); dict order is pipeline order.
+PASSES: dict[str, tuple[str, str]] = {
+    "outline": ("blocks", "move repeated action sequences into shared helper funcs"),
+    "row-pack-dp": ("placement", "optimal call-chain cuts over top-level boundaries (instead of greedy)"),
+    "collapse-autosplit": ("entries", "collapse autosplit trampoline helper funcs"),
+    "promote-named-autosplit": ("entries", "promote autosplit targets into named wrapper funcs"),
+    "tree-shake": ("entries", "drop funcs unreachable from events/loops/`export`"),
+}
+
+_O0 = ("collapse-autosplit", "promote-named-autosplit")
+OPT_LEVELS: dict[str, tuple[str, ...]] = {
+    "O0": _O0,
+    "O1": (*_O0, "row-pack-dp"),
+    "O2": (*_O0, "row-pack-dp", "tree-shake"),
+    "Os": (*_O0, "row-pack-dp", "tree-shake", "outline"),
+}
+
+
+def normalize_opt_level(level: str | None) -> str:
+    raw = str(level or "O0").strip()
+    key = raw if raw[:1] in {"O", "o"} else f"O{raw}"
+    key = "O" + key[1:]
+    if key not in OPT_LEVELS:
+        raise ValueError(f"opt level: неизвестный уровень `{raw}` (ожидается: {', '.join(OPT_LEVELS)})")
+    return key
+
+
+def resolve_passes(
+    opt_level: str | None = "O0",
+    enable: Iterable[str] = (),
+    disable: Iterable[str] = (),
+) -> frozenset[str]:
+    """Preset passes for `opt_level`, plus `enable`, minus `disable` (disable wins)."""
+    enabled = set(OPT_LEVELS[normalize_opt_level(opt_level)])
+    for group in (enable, disable):
+        for name in group:
+            if name not in PASSES:
+                raise ValueError(f"pass: неизвестный проход `{name}` (доступны: {', '.join(PASSES)})")
+    enabled.update(enable)
+    enabled.difference_update(disable)
+    return frozenset(enabled)
+
+
+class PassManager:
+    """Runs enabled passes and records wall time and IR size delta per pass."""
+
+    def __init__(self, enabled: Iterable[str]):
+        self.enabled = frozenset(enabled)
+        self.stats: list[dict] = []
+
+    def is_enabled(self, name: str) -> bool:
+        return name in self.enabled
+
+    def run(self, name: str, fn: Callable, ir, *args, size: Callable = len, **kwargs):
+        """
+        Calls `fn(ir, *args, **kwargs)`; its result must be the new IR or a tuple starting with it.
+        Returns the result unchanged.
+        """
+        before = size(ir)
+        t0 = time.perf_counter()
+        res = fn(ir, *args, **kwargs)
+        elapsed = time.perf_counter() - t0
+        new_ir = res[0] if isinstance(res, tuple) else res
+        self.record(name, elapsed, before, size(new_ir))
+        return res
+
+    def record(self, name: str, seconds: float, before: int, after: int):
+        self.stats.append(
+            {
+                "pass": name,
+                "stage": PASSES[name][0],
+                "seconds": seconds,
+                "before": before,
+                "after": after,
+                "delta": after - before,
+            }
+        )
+
+
+def format_pass_stats(stats: list[dict]) -> str:
+    lines = [f"{'pass':<24} {'stage':<10} {'ms':>9} {'before':>8} {'after':>8} {'delta':>7}"]
+    for st in stats:
+        lines.append(
+            f"{st['pass']:<24} {st['stage']:<10} {st['seconds'] * 1000:>9.2f} "
+            f"{st['before']:>8} {st['after']:>8} {st['delta']:>+7}"
+        )
+    return "\n".join(lines)
@@ -91,6 +91,11 @@ def api_aliases_path() -> Path:
     return out_dir() / "api_aliases.json"
 
 
+def bundled_api_snapshot_path() -> Path:
+    # Precompiled API snapshot shipped next to mldsl.exe (see mldsl_api_snapshot.py).
+    return _executable_dir() / "api_aliases.snapshot"
+
+
 def actions_catalog_path() -> Path:
     return out_dir() / "actions_catalog.json"
 
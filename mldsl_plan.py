@@ -0,0 +1,477 @@
+"""
+Plan-level helpers (entries format of `plan.json`).
+
+A plan is a flat list of entries; physical rows are separated by `{"block": "newline"}`
+and every row starts with a header block (event/func/loop).
+"""
+
+from __future__ import annotations
+
+import filecmp
+import hashlib
+import json
+import os
+import re
+import stat
+import tempfile
+from pathlib import Path
+
+FUNC_HEADER_BLOCK = "lapis_block"
+LOOP_HEADER_BLOCK = "emerald_block"
+EVENT_HEADER_BLOCKS = {"diamond_block", "gold_block"}
+HEADER_BLOCKS = {FUNC_HEADER_BLOCK, LOOP_HEADER_BLOCK, *EVENT_HEADER_BLOCKS}
+
+# Compiler-generated helper funcs: numbered by per-compile counters, so names are not stable across edits.
+AUTO_SPLIT_FUNC_PREFIX = "__autosplit_row_"
+OUTLINE_FUNC_PREFIX = "__outline_seq_"
+_GENERATED_FUNC_RE = re.compile(rf"({re.escape(AUTO_SPLIT_FUNC_PREFIX)}|{re.escape(OUTLINE_FUNC_PREFIX)})(\d+)")
+
+_CALL_NAME_NEEDLES = ("вызвать функцию", "call function")
+_CALL_TARGET_RE = re.compile(r"slot\(13\)=([a-z_]+)\((.*?)\)(?:,|$)", re.I)
+_LITERAL_FUNC_NAME_RE = re.compile(r"^[\w\u0400-\u04FF]+$")
+
+# Serialized plan formats: `pretty` is the historical `{"entries": [...]}` with indent=2;
+# `compact` is minified JSON with an interned string table (see `dumps_plan`).
+PLAN_FORMATS = ("pretty", "compact")
+COMPACT_PLAN_FORMAT = "mldsl-plan-compact"
+COMPACT_PLAN_VERSION = 1
+_COMPACT_KEYS = ("block", "name", "args")
+# Row hash length in hex chars (64 bits); the plan fingerprint is the full sha256.
+ROW_HASH_LEN = 16
+
+
+def generated_func_parts(name: str) -> tuple[str, int] | None:
+    """(prefix, number) for generated helper names, otherwise None."""
+    m = _GENERATED_FUNC_RE.fullmatch(str(name or ""))
+    return (m.group(1), int(m.group(2))) if m else None
+
+
+def is_generated_func_name(name: str) -> bool:
+    return generated_func_parts(name) is not None
+
+
+def normalize_generated_names(text: str) -> str:
+    """Replaces generated helper numbers (`__autosplit_row_12`) with `#` so content compares across renumbering."""
+    return _GENERATED_FUNC_RE.sub(lambda m: f"{m.group(1)}#", str(text or ""))
+
+
+def row_content_key(row: list[dict], *, normalize: bool = True) -> str:
+    """Canonical text of a physical row (block/name/args/negated of every entry)."""
+    norm = normalize_generated_names if normalize else str
+    parts = [
+        [str(e.get("block") or ""), norm(e.get("name") or ""), norm(e.get("args") or ""), bool(e.get("negated"))]
+        for e in row
+    ]
+    return json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+
+
+def rename_funcs(entries: list[dict], mapping: dict[str, str]) -> list[dict]:
+    """Renames func headers and literal `call(...)` targets; entries not touched are shared, not copied."""
+    if not mapping:
+        return entries
+    out: list[dict] = []
+    for e in entries:
+        if e.get("block") == FUNC_HEADER_BLOCK and e.get("name") in mapping:
+            e = dict(e, name=mapping[e["name"]])
+        else:
+            is_call, target = call_target(e)
+            if is_call and target in mapping:
+                args = re.sub(
+                    rf"text\(\s*{re.escape(target)}\s*\)", f"text({mapping[target]})", str(e.get("args")), count=1
+                )
+                e = dict(e, args=args)
+        out.append(e)
+    return out
+
+
+def _sha256_hex(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RowHasher:
+    """
+    Stable per-row content hashes (sha256 over canonical JSON text, first ROW_HASH_LEN hex chars).
+
+    Generated helper names are replaced by content-derived names (hash of the helper's own rows),
+    so hashes do not depend on autosplit/outline counters, yet a row calling a different helper
+    body still hashes differently. Rows are fed one by one (streaming-friendly); `finish()`
+    resolves helper references and returns (row_hashes, plan_fingerprint).
+    """
+
+    def __init__(self):
+        # per row: (normalized text digest, generated names referenced, owning generated func or None)
+        self._rows: list[tuple[str, list[str], str | None]] = []
+
+    def add_row(self, row: list[dict]) -> None:
+        if not row:
+            return
+        owner = row_func_name(row)
+        if owner is not None and not is_generated_func_name(owner):
+            owner = None
+        refs: list[str] = []
+        for e in row:
+            for field in ("name", "args"):
+                refs.extend(m.group(0) for m in _GENERATED_FUNC_RE.finditer(str(e.get(field) or "")))
+        refs = [r for r in refs if r != owner]
+        self._rows.append((_sha256_hex(row_content_key(row)), refs, owner))
+
+    def finish(self) -> tuple[list[str], str]:
+        func_rows: dict[str, list[int]] = {}
+        for idx, (_digest, _refs, owner) in enumerate(self._rows):
+            if owner is not None:
+                func_rows.setdefault(owner, []).append(idx)
+
+        row_hashes: list[str | None] = [None] * len(self._rows)
+        canon: dict[str, str] = {}
+
+        def row_hash(idx: int) -> str:
+            digest, refs, _owner = self._rows[idx]
+            resolved = [canon.get(r, normalize_generated_names(r)) for r in refs]
+            return _sha256_hex(digest + "|" + ",".join(resolved))[:ROW_HASH_LEN]
+
+        # Iterative post-order over helper references (autosplit chains can be very deep).
+        state: dict[str, int] = {}  # 1 = on stack, 2 = done (references on stack are left unresolved)
+        for root in func_rows:
+            if state.get(root):
+                continue
+            stack = [(root, iter({r for i in func_rows[root] for r in self._rows[i][1]}))]
+            state[root] = 1
+            while stack:
+                name, deps = stack[-1]
+                nxt = next((d for d in deps if d in func_rows and not state.get(d)), None)
+                if nxt is not None:
+                    state[nxt] = 1
+                    stack.append((nxt, iter({r for i in func_rows[nxt] for r in self._rows[i][1]})))
+                    continue
+                stack.pop()
+                for i in func_rows[name]:
+                    row_hashes[i] = row_hash(i)
+                prefix, _num = generated_func_parts(name)
+                canon[name] = f"{prefix}~" + _sha256_hex("\n".join(row_hashes[i] for i in func_rows[name]))[:ROW_HASH_LEN]
+                state[name] = 2
+
+        out = [h if h is not None else row_hash(i) for i, h in enumerate(row_hashes)]
+        return out, _sha256_hex("\n".join(out))
+
+
+def plan_row_hashes(entries: list[dict]) -> tuple[list[str], str]:
+    """(per-row hashes, whole-plan fingerprint) for plan entries."""
+    hasher = RowHasher()
+    for row in split_rows(entries):
+        hasher.add_row(row)
+    return hasher.finish()
+
+
+def plan_meta(row_hashes: list[str], fingerprint: str) -> dict:
+    return {"hash": f"sha256/{ROW_HASH_LEN}", "fingerprint": fingerprint, "row_hashes": row_hashes}
+
+
+def split_rows(entries: list[dict]) -> list[list[dict]]:
+    """Splits plan entries into physical rows (newline markers are dropped)."""
+    rows: list[list[dict]] = []
+    cur: list[dict] = []
+    for e in entries:
+        if e.get("block") == "newline":
+            if cur:
+                rows.append(cur)
+            cur = []
+            continue
+        cur.append(e)
+    if cur:
+        rows.append(cur)
+    return rows
+
+
+def join_rows(rows: list[list[dict]]) -> list[dict]:
+    out: list[dict] = []
+    for row in rows:
+        if not row:
+            continue
+        if out:
+            out.append({"block": "newline"})
+        out.extend(row)
+    return out
+
+
+def row_func_name(row: list[dict]) -> str | None:
+    """Returns function name when row is a `func` row (lapis header), otherwise None."""
+    if not row or row[0].get("block") != FUNC_HEADER_BLOCK:
+        return None
+    return str(row[0].get("name") or "")
+
+
+def is_call_function_entry(entry: dict) -> bool:
+    if not isinstance(entry, dict):
+        return False
+    name = re.sub(r"\s+", " ", str(entry.get("name") or "")).strip().lower()
+    return any(n in name for n in _CALL_NAME_NEEDLES)
+
+
+def call_target(entry: dict) -> tuple[bool, str | None]:
+    """
+    Inspects a plan entry for a function call.
+    Returns (is_call, target): target is the literal function name for `text(name)` calls,
+    or None when the call target is dynamic (variable/placeholder) and cannot be resolved statically.
+    """
+    if not is_call_function_entry(entry):
+        return False, None
+    m = _CALL_TARGET_RE.search(str(entry.get("args") or ""))
+    if not m or m.group(1).lower() != "text":
+        return True, None
+    target = m.group(2).strip()
+    if not _LITERAL_FUNC_NAME_RE.match(target):
+        return True, None
+    return True, target
+
+
+def _compact_entry(entry: dict, intern) -> list | dict:
+    keys = set(entry)
+    if keys == {"block"}:
+        return [intern(entry["block"])]
+    if keys in ({"block", "name", "args"}, {"block", "name", "args", "negated"}) and all(
+        isinstance(entry[k], str) for k in _COMPACT_KEYS
+    ) and isinstance(entry.get("negated", False), bool):
+        row = [intern(entry[k]) for k in _COMPACT_KEYS]
+        if "negated" in entry:
+            row.append(1 if entry["negated"] else 0)
+        return row
+    # Anything unusual is kept verbatim so the format stays lossless.
+    return dict(entry)
+
+
+def dumps_plan(entries: list[dict], fmt: str = "pretty", *, row_hashes: bool = False) -> str:
+    """
+    Serializes plan entries.
+    compact: {"format", "version", "entries": [[block, name, args(, negated)] | [block] | {...}], "strings": [...]}
+    where block/name/args are indexes into `strings` (newline markers are `[block]`).
+    With `row_hashes`, an optional trailing `meta` object carries per-row hashes and the plan fingerprint.
+    """
+    meta = plan_meta(*plan_row_hashes(entries)) if row_hashes else None
+    if fmt == "pretty":
+        doc = {"entries": entries}
+        if meta is not None:
+            doc["meta"] = meta
+        return json.dumps(doc, ensure_ascii=False, indent=2) + "\n"
+    if fmt != "compact":
+        raise ValueError(f"plan format: неизвестный формат `{fmt}` (ожидается: {', '.join(PLAN_FORMATS)})")
+    strings: list[str] = []
+    index: dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        idx = index.get(value)
+        if idx is None:
+            idx = index[value] = len(strings)
+            strings.append(value)
+        return idx
+
+    packed = [_compact_entry(e, intern) for e in entries]
+    # `strings` goes last so the streaming writer can emit the same bytes.
+    doc = {
+        "format": COMPACT_PLAN_FORMAT,
+        "version": COMPACT_PLAN_VERSION,
+        "entries": packed,
+        "strings": strings,
+    }
+    if meta is not None:
+        doc["meta"] = meta
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def loads_plan(text: str) -> list[dict]:
+    """Parses a serialized plan (either format) back to entries."""
+    data = json.loads(text)
+    if not isinstance(data, dict) or not isinstance(data.get("entries"), list):
+        raise ValueError("plan: ожидается объект с полем `entries`")
+    fmt = data.get("format")
+    if fmt is None:
+        return data["entries"]
+    if fmt != COMPACT_PLAN_FORMAT:
+        raise ValueError(f"plan: неизвестный формат `{fmt}`")
+    version = data.get("version")
+    if version != COMPACT_PLAN_VERSION:
+        raise ValueError(f"plan: неподдерживаемая версия compact-формата `{version}` (ожидается {COMPACT_PLAN_VERSION})")
+    strings = data.get("strings") or []
+    out: list[dict] = []
+    for item in data["entries"]:
+        if isinstance(item, dict):
+            out.append(item)
+            continue
+        if len(item) == 1:
+            out.append({"block": strings[item[0]]})
+            continue
+        entry = {k: strings[i] for k, i in zip(_COMPACT_KEYS, item)}
+        if len(item) > 3:
+            entry["negated"] = bool(item[3])
+        out.append(entry)
+    return out
+
+
+def _same_text(path: Path, text: str) -> bool:
+    try:
+        return path.read_text(encoding="utf-8") == text
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def _open_replace_temp(path: Path):
+    """
+    Opens a temp file next to `path` for an atomic `os.replace`. It gets the mode of the existing
+    `path` (or the umask default for a new file), since `mkstemp` creates it private (0600).
+    Returns (text file handle, temp path).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        try:
+            mode = stat.S_IMODE(path.stat().st_mode)
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp, mode)
+        return os.fdopen(fd, "w", encoding="utf-8"), Path(tmp)
+    except BaseException:
+        os.close(fd)
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def write_plan(path: Path, entries: list[dict], fmt: str = "pretty", *, row_hashes: bool = False) -> bool:
+    """
+    Writes the serialized plan. An existing file with the same content is left untouched
+    (no mtime change for file watchers); otherwise it is replaced atomically, so a reader never
+    sees a half-written plan. Returns whether the file was written.
+    """
+    path = Path(path)
+    text = dumps_plan(entries, fmt, row_hashes=row_hashes)
+    if _same_text(path, text):
+        return False
+    fh, tmp = _open_replace_temp(path)
+    try:
+        with fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return True
+
+
+def read_plan(path: Path) -> list[dict]:
+    return loads_plan(Path(path).read_text(encoding="utf-8"))
+
+
+def read_plan_meta(path: Path) -> dict | None:
+    """Optional `meta` object (row hashes / fingerprint) of a serialized plan."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    meta = data.get("meta") if isinstance(data, dict) else None
+    return meta if isinstance(meta, dict) else None
+
+
+class PlanStreamWriter:
+    """
+    Incremental plan writer: produces the same bytes as `write_plan(path, entries, fmt)`
+    without holding all entries in memory. Rows are written via `write_row`; the target file
+    is replaced atomically on `close()` (a failed compile leaves the previous plan intact).
+    When the result equals the existing file, the file is left untouched and `unchanged` is set.
+    """
+
+    def __init__(self, path: Path, fmt: str = "pretty", *, row_hashes: bool = False):
+        if fmt not in PLAN_FORMATS:
+            raise ValueError(f"plan format: неизвестный формат `{fmt}` (ожидается: {', '.join(PLAN_FORMATS)})")
+        self.path = Path(path)
+        self.fmt = fmt
+        self.count = 0
+        self.rows = 0
+        self.unchanged = False
+        self._strings: list[str] = []
+        self._index: dict[str, int] = {}
+        self._hasher = RowHasher() if row_hashes else None
+        self._fh, self._tmp = _open_replace_temp(self.path)
+        if fmt == "pretty":
+            self._fh.write('{\n  "entries": [')
+        else:
+            head = json.dumps({"format": COMPACT_PLAN_FORMAT, "version": COMPACT_PLAN_VERSION}, separators=(",", ":"))
+            self._fh.write(head[:-1] + ',"entries":[')
+
+    def _intern(self, value: str) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = self._index[value] = len(self._strings)
+            self._strings.append(value)
+        return idx
+
+    def write_entry(self, entry: dict) -> None:
+        if self.fmt == "pretty":
+            body = json.dumps(entry, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+            self._fh.write(("," if self.count else "") + "\n    " + body)
+        else:
+            packed = _compact_entry(entry, self._intern)
+            self._fh.write(("," if self.count else "") + json.dumps(packed, ensure_ascii=False, separators=(",", ":")))
+        self.count += 1
+
+    def write_row(self, row: list[dict]) -> None:
+        if not row:
+            return
+        if self.rows:
+            self.write_entry({"block": "newline"})
+        for entry in row:
+            self.write_entry(entry)
+        if self._hasher is not None:
+            self._hasher.add_row(row)
+        self.rows += 1
+
+    def close(self) -> None:
+        meta = plan_meta(*self._hasher.finish()) if self._hasher is not None else None
+        if self.fmt == "pretty":
+            self._fh.write("\n  ]" if self.count else "]")
+            if meta is not None:
+                body = json.dumps(meta, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                self._fh.write(',\n  "meta": ' + body)
+            self._fh.write("\n}\n")
+        else:
+            self._fh.write('],"strings":' + json.dumps(self._strings, ensure_ascii=False, separators=(",", ":")))
+            if meta is not None:
+                self._fh.write(',"meta":' + json.dumps(meta, ensure_ascii=False, separators=(",", ":")))
+            self._fh.write("}\n")
+        self._fh.close()
+        if self.path.exists() and filecmp.cmp(self._tmp, self.path, shallow=False):
+            self._tmp.unlink()
+            self.unchanged = True
+            return
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        self._fh.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "PlanStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class RowSpool:
+    """Temporary on-disk row store (one JSON row per line) for two-phase streaming output."""
+
+    def __init__(self):
+        self._fh = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.rows = 0
+
+    def append(self, row: list[dict]) -> int:
+        self._fh.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.rows += 1
+        return self.rows - 1
+
+    def __iter__(self):
+        self._fh.flush()
+        self._fh.seek(0)
+        for row_id, line in enumerate(self._fh):
+            yield row_id, json.loads(line)
+
+    def close(self) -> None:
+        self._fh.close()
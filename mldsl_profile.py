@@ -0,0 +1,114 @@
+"""
+Compile timing trace (`mldsl compile --profile out.json`) in Chrome trace-event format.
+
+Open the file in `chrome://tracing` or https://ui.perfetto.dev. Three tracks:
+- `stages`: compiler stages (data load, imports, normalize, inline blocks, vfunc, multiselect, func collect,
+  compile loop, flush, post-passes, ...); each span ends at the stage boundary mark.
+- `blocks`: top-level blocks (event/func/loop), including the flush (row split, auto-split) of the block.
+- `lines`: every line of the compile loop with its text. Lines are numbered after `import` inlining and
+  vfunc/multiselect expansion, i.e. as the compile loop sees them.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+TRACE_PID = 1
+_TRACKS = {"stages": 1, "blocks": 2, "lines": 3}
+
+
+class CompileProfile:
+    """Collects spans; pass as `compile_entries(profile=...)`, then `write(path)`."""
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._last_mark = self._t0
+        self.events: list[dict] = []
+        self._line: tuple[int, str, float] | None = None
+        self._line_block: tuple[str, str] | None = None
+        self._block: tuple[tuple[str, str], float] | None = None
+
+    def _us(self, t: float) -> float:
+        return round((t - self._t0) * 1e6, 3)
+
+    def _span(self, track: str, name: str, start: float, end: float, args: dict | None = None) -> None:
+        ev = {
+            "name": name,
+            "cat": track,
+            "ph": "X",
+            "ts": self._us(start),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": TRACE_PID,
+            "tid": _TRACKS[track],
+        }
+        if args:
+            ev["args"] = args
+        self.events.append(ev)
+
+    def mark(self, stage: str, **args) -> None:
+        """Ends stage `stage` (it started at the previous mark)."""
+        now = time.perf_counter()
+        self._span("stages", stage, self._last_mark, now, args)
+        self._last_mark = now
+
+    def line(self, idx: int, text: str, block: tuple[str, str] | None) -> None:
+        """Start of compile-loop line `idx`; `block` is the (kind, name) open before it, if any."""
+        now = time.perf_counter()
+        self._close_line(now, block)
+        self._line = (idx, text, now)
+
+    def flushing(self, kind: str, name: str | None) -> None:
+        """The current line flushes block (kind, name): its time belongs to that block."""
+        self._line_block = (kind, name or "")
+
+    def end_lines(self) -> None:
+        now = time.perf_counter()
+        self._close_line(now, None)
+        self._switch_block(None, now)
+
+    def _close_line(self, now: float, block_after: tuple[str, str] | None) -> None:
+        if self._line is not None:
+            idx, text, start = self._line
+            self._span("lines", f"{idx}: {text[:80]}", start, now, {"line": idx, "text": text})
+            owner = self._line_block or (block_after if block_after and block_after[0] else None)
+            if owner is not None:
+                self._switch_block(owner, start)
+                if self._line_block is not None:
+                    self._switch_block(None, now)
+        self._line = None
+        self._line_block = None
+
+    def _switch_block(self, block: tuple[str, str] | None, at: float) -> None:
+        cur = self._block
+        if cur is not None and cur[0] == block:
+            return
+        if cur is not None:
+            kind, name = cur[0]
+            self._span("blocks", f"{kind} {name}".strip(), cur[1], at, {"kind": kind, "name": name})
+        self._block = (block, at) if block is not None else None
+
+    def trace(self) -> dict:
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": TRACE_PID, "tid": tid, "args": {"name": track}}
+            for track, tid in _TRACKS.items()
+        ]
+        return {"traceEvents": meta + self.events, "displayTimeUnit": "ms"}
+
+    def write(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.trace(), ensure_ascii=False) + "\n", encoding="utf-8")
+        return path
+
+    def stage_totals(self) -> list[tuple[str, float]]:
+        """(stage, ms) in order, for a short summary."""
+        return [(ev["name"], ev["dur"] / 1000) for ev in self.events if ev["cat"] == "stages"]
+
+
+def format_profile_summary(profile: CompileProfile, limit: int = 5) -> str:
+    stages = ", ".join(f"{name} {ms:.1f}" for name, ms in profile.stage_totals())
+    lines = sorted((ev for ev in profile.events if ev["cat"] == "lines"), key=lambda ev: -ev["dur"])[:limit]
+    slow = "; ".join(f"line {ev['args']['line']} {ev['dur'] / 1000:.1f} ms" for ev in lines)
+    return f"profile (ms): {stages}" + (f"; slowest: {slow}" if slow else "")
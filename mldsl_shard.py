@@ -0,0 +1,140 @@
+"""
+Plan sharding (`mldsl compile --plan plan.json --shards N`): splits a plan into independent parts
+that can be printed concurrently (several printers or areas).
+
+Unit of placement: an event/loop row (rows of same-named events are independent), or a func with all
+its rows. A unit that calls a generated helper (`__autosplit_row_N`, `__outline_seq_N`) is kept in one
+shard with it, so a helper chain is never split. Units go to the least loaded shard, largest first (balanced by block count); each shard keeps
+the plan's row order. Together the shards hold exactly the rows of the full plan.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import re
+from pathlib import Path
+
+from mldsl_plan import (
+    FUNC_HEADER_BLOCK,
+    call_target,
+    is_generated_func_name,
+    join_rows,
+    split_rows,
+    write_plan,
+)
+
+SHARDS_FORMAT = "mldsl-plan-shards"
+SHARDS_VERSION = 1
+
+
+def _unit_key(idx: int, row: list[dict]) -> tuple[str, str] | int:
+    """Funcs are grouped by name (their rows are one callable); any other row is a unit of its own."""
+    if row[0].get("block") == FUNC_HEADER_BLOCK:
+        return FUNC_HEADER_BLOCK, str(row[0].get("name") or "")
+    return idx
+
+
+def shard_rows(entries: list[dict], shards: int) -> list[list[list[dict]]]:
+    """Partitions plan rows into at most `shards` groups (fewer when there are fewer units)."""
+    if shards < 1:
+        raise ValueError("--shards должен быть >= 1")
+    rows = split_rows(entries)
+    keys = [_unit_key(idx, row) for idx, row in enumerate(rows)]
+    parent: dict[tuple[str, str] | int, tuple[str, str] | int] = {}
+
+    def find(k):
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    for key in keys:
+        parent.setdefault(key, key)
+    for key, row in zip(keys, rows):
+        for e in row[1:]:
+            is_call, target = call_target(e)
+            helper = (FUNC_HEADER_BLOCK, target)
+            if is_call and target and is_generated_func_name(target) and helper in parent:
+                a, b = find(key), find(helper)
+                if a != b:
+                    parent[b] = a
+
+    groups: dict[tuple[str, str] | int, list[int]] = {}
+    weights: dict[tuple[str, str] | int, int] = {}
+    for idx, row in enumerate(rows):
+        root = find(keys[idx])
+        groups.setdefault(root, []).append(idx)
+        weights[root] = weights.get(root, 0) + len(row)
+
+    count = min(shards, len(groups)) or 1
+    heap = [(0, k) for k in range(count)]
+    assigned: list[list[int]] = [[] for _ in range(count)]
+    # Largest first; ties by first row, so the split is deterministic.
+    for root in sorted(groups, key=lambda r: (-weights[r], groups[r][0])):
+        load, k = heapq.heappop(heap)
+        assigned[k].extend(groups[root])
+        heapq.heappush(heap, (load + weights[root], k))
+    return [[rows[i] for i in sorted(idxs)] for idxs in assigned]
+
+
+def shard_path(plan_path: Path, k: int) -> Path:
+    plan_path = Path(plan_path)
+    return plan_path.with_name(f"{plan_path.stem}.shard-{k}{plan_path.suffix}")
+
+
+def manifest_path(plan_path: Path) -> Path:
+    plan_path = Path(plan_path)
+    return plan_path.with_name(f"{plan_path.stem}.shards.json")
+
+
+def write_shards(
+    plan_path: Path,
+    entries: list[dict],
+    shards: int,
+    fmt: str = "pretty",
+    *,
+    row_hashes: bool = False,
+) -> dict:
+    """
+    Writes `<plan>.shard-K.json` (K from 1) and the `<plan>.shards.json` manifest; shard files of an
+    earlier run with more shards are removed. Returns the manifest.
+    """
+    plan_path = Path(plan_path)
+    parts = shard_rows(entries, shards)
+    manifest = {
+        "format": SHARDS_FORMAT,
+        "version": SHARDS_VERSION,
+        "plan": plan_path.name,
+        "total_blocks": sum(len(row) for part in parts for row in part),
+        "shards": [],
+    }
+    for k, part in enumerate(parts, start=1):
+        path = shard_path(plan_path, k)
+        write_plan(path, join_rows(part), fmt, row_hashes=row_hashes)
+        manifest["shards"].append(
+            {
+                "file": path.name,
+                "rows": len(part),
+                "blocks": sum(len(row) for row in part),
+                "funcs": sorted({str(row[0].get("name") or "") for row in part if row[0].get("block") == FUNC_HEADER_BLOCK}),
+                "events": [
+                    f"{row[0].get('block')}:{row[0].get('name')}" for row in part if row[0].get("block") != FUNC_HEADER_BLOCK
+                ],
+            }
+        )
+    stale_re = re.compile(rf"{re.escape(plan_path.stem)}\.shard-(\d+){re.escape(plan_path.suffix)}")
+    for old in plan_path.parent.glob(f"{plan_path.stem}.shard-*{plan_path.suffix}"):
+        m = stale_re.fullmatch(old.name)
+        if m and int(m.group(1)) > len(parts):
+            old.unlink()
+    text = json.dumps(manifest, ensure_ascii=False, indent=2) + "\n"
+    path = manifest_path(plan_path)
+    if not (path.exists() and path.read_text(encoding="utf-8") == text):
+        path.write_text(text, encoding="utf-8")
+    return manifest
+
+
+def format_shards_summary(manifest: dict) -> str:
+    loads = ", ".join(str(s["blocks"]) for s in manifest["shards"])
+    return f"shards: {len(manifest['shards'])} (blocks per shard: {loads}; total {manifest['total_blocks']})"
@@ -0,0 +1,257 @@
+"""
+Schema validation of plan entries (`plan.json` entries format).
+
+A hand-written single-pass checker: entries are fed one by one (`PlanValidator.feed`), so it runs
+over a streamed plan as well as over an in-memory list. Checks:
+- entry kinds: row headers, `newline`, `skip` scope closers and known action blocks;
+- every physical row starts with a header and fits `MAX_ROW_ENTRIES` (header included);
+- `negated` only on conditional blocks;
+- `args` syntax: `no`, loop ticks, or `slot(N)=value` / `clicks(N,M)=K` pieces joined by `,`.
+
+Used by `mldsl validate-plan` and as an always-on post-compile check of `compile_entries`
+(bounded by `MLDSL_VALIDATE_BUDGET_MS`).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+
+from mldsl_plan import FUNC_HEADER_BLOCK, HEADER_BLOCKS, LOOP_HEADER_BLOCK
+
+# Physical row budget, header included (same as `mldsl_compile.MAX_ACTIONS_PER_ROW`).
+MAX_ROW_ENTRIES = 43
+NEWLINE_BLOCK = "newline"
+SCOPE_CLOSER_BLOCK = "skip"
+# Action blocks of allactions.txt; the compiler passes the set resolved from its own allactions map.
+ACTION_BLOCKS = frozenset(
+    {
+        "cobblestone",
+        "nether_brick",
+        "bookshelf",
+        "purpur_block",
+        "lapis_ore",
+        "iron_block",
+        "planks",
+        "red_nether_brick",
+        "brick_block",
+        "obsidian",
+        "end_stone",
+    }
+)
+# `not ...` is accepted for conditions and for conditional selection (`select.if_player...`).
+NEGATABLE_BLOCKS = frozenset({"planks", "red_nether_brick", "brick_block", "obsidian", "end_stone", "purpur_block"})
+DEFAULT_MAX_ISSUES = 50
+# Post-compile check time budget; `0` disables the check.
+DEFAULT_BUDGET_MS = 500
+_BUDGET_CHECK_EVERY = 256
+
+_ARG_PIECE_SPLIT_RE = re.compile(r",(?=(?:slot\(\d+\)|clicks\(\d+,\d+\))=)")
+# Pieces as `compile_line` emits them: `slot(N)=<value>` and `clicks(slot,n)=0` enum clicks.
+# A value is what `wrap_value` returns: empty (empty argument), `kind(...)`, or a raw ANY/VECTOR literal.
+_SLOT_PIECE_RE = re.compile(r"slot\(\d+\)=(.*)", re.S)
+# `text(...)` payloads are not escaped by the compiler: any contents up to the closing paren.
+_TEXT_VALUE_RE = re.compile(r"text\(.*\)", re.S)
+_CLICKS_PIECE_RE = re.compile(r"clicks\(\d+,\d+\)=\d+")
+_TICKS_RE = re.compile(r"[1-9]\d*")
+
+
+def _slot_value_ok(value: str) -> bool:
+    """
+    Empty, `text(...)`, or a `kind(...)`/raw literal whose parens balance outside `"..."` strings
+    (backslash escapes), with every string terminated and no `|` outside strings.
+    """
+    if value == "" or _TEXT_VALUE_RE.fullmatch(value):
+        return True
+    depth = 0
+    in_str = escaped = False
+    for ch in value:
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth < 0:
+                return False
+        elif ch == "|":
+            return False
+    return depth == 0 and not in_str
+
+
+def _args_error(args: str) -> str | None:
+    if args == "no":
+        return None
+    for piece in _ARG_PIECE_SPLIT_RE.split(args):
+        m = _SLOT_PIECE_RE.fullmatch(piece)
+        if not ((m and _slot_value_ok(m.group(1))) or _CLICKS_PIECE_RE.fullmatch(piece)):
+            return f"некорректный фрагмент args `{piece[:60]}`"
+    return None
+
+
+class PlanValidator:
+    """
+    Streaming plan checker. `feed` entries in order, then `finish()` returns the issue list
+    (`entry N: ...`, N is the 0-based entry index). At most `max_issues` issues are kept.
+    With `budget_s`, checking stops once `feed_row`/`feed_all` have spent the budget (`exhausted` is set).
+    """
+
+    def __init__(
+        self,
+        *,
+        action_blocks=None,
+        negatable_blocks=None,
+        max_issues: int = DEFAULT_MAX_ISSUES,
+        budget_s: float | None = None,
+    ):
+        self.action_blocks = frozenset(action_blocks) if action_blocks else ACTION_BLOCKS
+        self.negatable_blocks = frozenset(negatable_blocks) if negatable_blocks else NEGATABLE_BLOCKS
+        self.max_issues = max_issues
+        self.budget_s = budget_s
+        self.issues: list[str] = []
+        self.count = 0
+        self.rows = 0
+        self.exhausted = False
+        self.spent_s = 0.0
+        self._row_len = 0
+
+    def _issue(self, msg: str) -> None:
+        if len(self.issues) < self.max_issues:
+            self.issues.append(f"entry {self.count}: {msg}")
+
+    def feed(self, entry) -> None:
+        if self.exhausted:
+            return
+        self._check(entry)
+        self.count += 1
+
+    def _spend(self, seconds: float) -> None:
+        self.spent_s += seconds
+        if self.budget_s is not None and self.spent_s > self.budget_s:
+            self.exhausted = True
+
+    def feed_row(self, row: list[dict]) -> None:
+        """Feeds a physical row (with the separating `newline` for every row after the first)."""
+        if not row or self.exhausted:
+            return
+        t0 = time.perf_counter()
+        if self.rows:
+            self.feed({"block": NEWLINE_BLOCK})
+        for entry in row:
+            self.feed(entry)
+        self._spend(time.perf_counter() - t0)
+
+    def feed_all(self, entries) -> None:
+        """Feeds an entries list; only time spent here counts against the budget."""
+        t0 = time.perf_counter()
+        for i, entry in enumerate(entries, start=1):
+            self.feed(entry)
+            if i % _BUDGET_CHECK_EVERY == 0:
+                now = time.perf_counter()
+                self._spend(now - t0)
+                t0 = now
+                if self.exhausted:
+                    return
+        self._spend(time.perf_counter() - t0)
+
+    def _check(self, entry) -> None:
+        if not isinstance(entry, dict):
+            self._issue(f"запись должна быть объектом, получено {type(entry).__name__}")
+            return
+        block = entry.get("block")
+        if not isinstance(block, str):
+            self._issue("нет строкового поля `block`")
+            return
+        if block == NEWLINE_BLOCK:
+            if self._row_len == 0:
+                self._issue("пустой ряд (`newline` в начале плана или два подряд)")
+            self._row_len = 0
+            extra = set(entry) - {"block"}
+            if extra:
+                self._issue(f"лишние поля у `newline`: {', '.join(sorted(extra))}")
+            return
+
+        name = entry.get("name")
+        args = entry.get("args")
+        if not isinstance(name, str):
+            self._issue(f"`{block}`: нет строкового поля `name`")
+        if not isinstance(args, str):
+            self._issue(f"`{block}`: нет строкового поля `args`")
+            args = None
+        extra = set(entry) - {"block", "name", "args", "negated"}
+        if extra:
+            self._issue(f"`{block}`: неизвестные поля {', '.join(sorted(extra))}")
+
+        if self._row_len == 0:
+            self.rows += 1
+            if block not in HEADER_BLOCKS:
+                self._issue(f"ряд должен начинаться с заголовка (event/func/loop), получено `{block}`")
+        elif block in HEADER_BLOCKS:
+            self._issue(f"заголовок `{block}` не в начале ряда")
+        self._row_len += 1
+        if self._row_len == MAX_ROW_ENTRIES + 1:
+            self._issue(f"ряд длиннее {MAX_ROW_ENTRIES} блоков (с заголовком)")
+
+        if "negated" in entry:
+            if entry["negated"] is not True:
+                self._issue(f"`{block}`: `negated` допускается только как true")
+            elif block not in self.negatable_blocks:
+                self._issue(f"`{block}`: `negated` допустим только для условий")
+
+        if block in HEADER_BLOCKS:
+            if block == LOOP_HEADER_BLOCK:
+                if args is not None and not _TICKS_RE.fullmatch(args):
+                    self._issue(f"цикл `{name}`: args должен быть числом тиков, получено `{args}`")
+            elif args is not None and args != "no":
+                self._issue(f"заголовок `{block}`: args должен быть `no`, получено `{args[:60]}`")
+            if block == FUNC_HEADER_BLOCK and not name:
+                self._issue("функция без имени")
+            return
+        if block == SCOPE_CLOSER_BLOCK:
+            if name != "" or args not in (None, "no"):
+                self._issue("`skip` должен иметь name=\"\" и args=\"no\"")
+            return
+        if block not in self.action_blocks:
+            self._issue(f"неизвестный блок `{block}`")
+            return
+        if args is not None:
+            err = _args_error(args)
+            if err:
+                self._issue(f"`{block}` `{name}`: {err}")
+
+    def finish(self) -> list[str]:
+        if self.count and self._row_len == 0 and not self.exhausted and len(self.issues) < self.max_issues:
+            self.issues.append(f"entry {self.count - 1}: `newline` в конце плана")
+        return self.issues
+
+
+def validate_plan(entries, **kwargs) -> list[str]:
+    """Validates a full entries list; returns issues (empty when valid)."""
+    validator = PlanValidator(**kwargs)
+    validator.feed_all(entries)
+    return validator.finish()
+
+
+def format_issues(issues: list[str], *, limit: int = 10) -> str:
+    lines = issues[:limit]
+    if len(issues) > limit:
+        lines.append(f"... и ещё {len(issues) - limit}")
+    return "\n".join(lines)
+
+
+def post_compile_budget_s() -> float | None:
+    """Budget of the post-compile check from `MLDSL_VALIDATE_BUDGET_MS`; None disables the check."""
+    raw = (os.environ.get("MLDSL_VALIDATE_BUDGET_MS") or "").strip()
+    try:
+        ms = float(raw) if raw else float(DEFAULT_BUDGET_MS)
+    except ValueError:
+        ms = float(DEFAULT_BUDGET_MS)
+    return ms / 1000.0 if ms > 0 else None
@@ -0,0 +1,95 @@
+"""
+`mldsl watch`: recompile a plan whenever the entry file or anything in its `import` closure changes.
+
+Polls file stamps (mtime/size) of `source_closure(entry)` plus `api_aliases.json`; no extra dependencies.
+A burst of saves is debounced: the rebuild starts once the files have been stable for `debounce` seconds.
+Rebuilds run in the same process, so the parsed API/aliases stay loaded between compiles (see
+`mldsl_compile._memo_by_files`), and the plan is replaced atomically by `write_plan`. The closure is
+re-read after every rebuild, so added/removed imports are picked up.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import mldsl_compile
+
+WATCH_INTERVAL_S = 0.25
+WATCH_DEBOUNCE_S = 0.3
+
+
+def watched_paths(entry: Path) -> list[Path]:
+    return [*mldsl_compile.source_closure(entry), Path(mldsl_compile.API_PATH)]
+
+
+def file_stamps(paths: list[Path]) -> dict[Path, tuple | None]:
+    out: dict[Path, tuple | None] = {}
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:
+            out[path] = None
+            continue
+        out[path] = (st.st_mtime_ns, st.st_size)
+    return out
+
+
+def _changed(old: dict, new: dict) -> list[Path]:
+    return [p for p in new if old.get(p, ()) != new[p]] + [p for p in old if p not in new]
+
+
+def _log(message: str) -> None:
+    print(f"[watch] {message}", file=sys.stderr, flush=True)
+
+
+def watch(
+    entry: Path,
+    rebuild: Callable[[], int],
+    *,
+    interval: float = WATCH_INTERVAL_S,
+    debounce: float = WATCH_DEBOUNCE_S,
+    max_builds: int | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+    log: Callable[[str], None] = _log,
+) -> int:
+    """
+    Runs `rebuild()` once, then again after each debounced change. A failing rebuild (exception or
+    non-zero exit) is logged and watching goes on. Returns after `max_builds` builds (tests), else runs
+    until interrupted. Returns the exit code of the last build.
+    """
+    entry = Path(entry).resolve()
+    builds = 0
+    code = 0
+    reason = "start"
+    while True:
+        builds += 1
+        t0 = time.perf_counter()
+        try:
+            code = int(rebuild() or 0)
+            status = f"exit {code}"
+        except Exception as exc:  # keep watching: the next save may fix it
+            code = 1
+            status = f"error: {exc}"
+        log(f"#{builds} {reason}: {(time.perf_counter() - t0) * 1000:.1f} ms, {status}")
+        if max_builds is not None and builds >= max_builds:
+            return code
+
+        paths = watched_paths(entry)
+        built = file_stamps(paths)
+        seen = built
+        changed_at = None
+        while True:
+            sleep(interval)
+            now = file_stamps(paths)
+            if now != seen:
+                seen = now
+                changed_at = clock()
+                continue
+            if now != built and changed_at is not None and clock() - changed_at >= debounce:
+                names = [p.name for p in _changed(built, now)]
+                reason = ", ".join(names[:3]) + (f" (+{len(names) - 3})" if len(names) > 3 else "")
+                break
@@ -140,6 +140,22 @@ def main() -> int:
             raise SystemExit(f"Expected generated out/ at: {local_out}")
         copy_tree(local_out, seed_out_dir)
 
+    # 4.1) Precompiled API snapshot next to mldsl.exe (load_api prefers it over parsing JSON).
+    #      Written after seed_out so it is not older than the shipped api_aliases.json.
+    api_snapshot = app_dir / "api_aliases.snapshot"
+    run(
+        [
+            python,
+            "-c",
+            "import json, sys; from pathlib import Path; "
+            "from mldsl_api_snapshot import write_api_snapshot; "
+            "write_api_snapshot(json.loads(Path(sys.argv[1]).read_text(encoding='utf-8')), Path(sys.argv[2]))",
+            str(seed_out_dir / "api_aliases.json"),
+            str(api_snapshot),
+        ],
+        cwd=repo,
+    )
+
     # 5) Build VS Code extension VSIX (bundled into installer by default).
     if not args.no_vsix:
         ext_dir = repo / "tools" / "mldsl-vscode"
@@ -188,6 +204,7 @@ def main() -> int:
     print("- app:", app_dir)
     print("- assets:", assets_dir)
     print("- seed_out:", seed_out_dir)
+    print("- api snapshot:", api_snapshot)
     if args.mods_from:
         print("- mods:", mods_dir)
     if not args.no_vsix:
@@ -0,0 +1,33 @@
+import mldsl_compile
+from mldsl_compile import Action
+from test_compile_select_and_sugar import _api_base
+
+
+def test_action_record_flags_equality_and_entry():
+    name = "".join(["Сообщение", "||", "Сообщение"])
+    a = Action("cobblestone", name, "slot(9)=text(a)")
+    b = Action("cobblestone", "Сообщение||Сообщение", "slot(9)=text(a)")
+    assert a == b and hash(a) == hash(b)
+    assert a.name is b.name
+    assert not hasattr(a, "__dict__")
+
+    opener = a.replace(if_open=True)
+    assert opener != a and opener.same_block(a)
+    assert opener.to_entry() == {"block": "cobblestone", "name": name, "args": "slot(9)=text(a)"}
+    assert Action("obsidian", "x", "", negated=True).to_entry() == {
+        "block": "obsidian",
+        "name": "x",
+        "args": "no",
+        "negated": True,
+    }
+
+
+def test_compiled_actions_share_interned_names(tmp_path, monkeypatch):
+    path = tmp_path / "case_action_record.mldsl"
+    lines = ['event("Вход") {'] + [f'    player.msg(text="m{i}")' for i in range(5)] + ["}"]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    entries = mldsl_compile.compile_entries(path)
+    names = [e["name"] for e in entries[1:]]
+    assert len(names) == 5
+    assert all(n is names[0] for n in names)
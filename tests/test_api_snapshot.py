@@ -0,0 +1,76 @@
+import json
+import os
+
+import mldsl_compile
+from mldsl_api_snapshot import (
+    ApiSnapshot,
+    compact_api,
+    load_fresh_snapshot,
+    read_api_snapshot,
+    write_api_snapshot,
+)
+from test_compile_select_and_sugar import _api_base
+
+
+def _linear_alias(api, module, alias):
+    for canon, spec in api[module].items():
+        if alias in (spec.get("aliases") or []):
+            return canon
+    return None
+
+
+def test_snapshot_roundtrip_and_alias_index(tmp_path):
+    api = _api_base()
+    api["player"]["msg"]["description"] = "doc only"
+    path = write_api_snapshot(api, tmp_path / "api_aliases.snapshot")
+    snap = read_api_snapshot(path)
+    assert isinstance(snap, ApiSnapshot)
+    assert dict(snap) == compact_api(api)
+    assert "description" not in snap["player"]["msg"]
+    for module, mod in api.items():
+        for spec in mod.values():
+            for alias in spec.get("aliases") or []:
+                assert snap.alias_index[module][alias] == _linear_alias(api, module, alias)
+    assert mldsl_compile.find_action(snap, "player", "msg")[0] == mldsl_compile.find_action(api, "player", "msg")[0]
+
+
+def test_snapshot_ignored_when_json_is_newer_or_magic_differs(tmp_path):
+    api = _api_base()
+    json_path = tmp_path / "api_aliases.json"
+    json_path.write_text(json.dumps(api, ensure_ascii=False), encoding="utf-8")
+    snap_path = write_api_snapshot(api, tmp_path / "api_aliases.snapshot")
+    assert load_fresh_snapshot(json_path, [snap_path]) is not None
+
+    mtime = json_path.stat().st_mtime
+    os.utime(snap_path, (mtime - 10, mtime - 10))
+    assert load_fresh_snapshot(json_path, [snap_path]) is None
+
+    os.utime(snap_path, (mtime + 10, mtime + 10))
+    snap_path.write_bytes(b"MLDSL-API-SNAPSHOT 0 other\n" + snap_path.read_bytes().split(b"\n", 1)[1])
+    os.utime(snap_path, (mtime + 10, mtime + 10))
+    assert load_fresh_snapshot(json_path, [snap_path]) is None
+
+
+def test_load_api_prefers_bundled_snapshot_and_falls_back_to_json(tmp_path, monkeypatch):
+    json_path = tmp_path / "out" / "api_aliases.json"
+    json_path.parent.mkdir()
+    json_path.write_text(json.dumps(_api_base(), ensure_ascii=False), encoding="utf-8")
+    bundled = tmp_path / "app" / "api_aliases.snapshot"
+    bundled.parent.mkdir()
+    monkeypatch.setattr(mldsl_compile, "API_PATH", json_path)
+    monkeypatch.setattr(mldsl_compile, "bundled_api_snapshot_path", lambda: bundled)
+
+    stale = _api_base()
+    stale["player"]["msg"]["aliases"] = ["bundled_only"]
+    write_api_snapshot(stale, bundled)
+    mtime = json_path.stat().st_mtime
+    os.utime(bundled, (mtime + 10, mtime + 10))
+    assert mldsl_compile.load_api().alias_index["player"].get("bundled_only") == "msg"
+
+    # User regenerated out/: the newer JSON wins and refreshes the cache next to it.
+    os.utime(json_path, (mtime + 20, mtime + 20))
+    api = mldsl_compile.load_api()
+    assert "bundled_only" not in api.alias_index["player"]
+    assert (tmp_path / "out" / "api_aliases.snapshot").exists()
+    assert dict(mldsl_compile.load_api()) == compact_api(_api_base())
+    assert mldsl_compile.load_api() is mldsl_compile.load_api()
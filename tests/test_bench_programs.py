@@ -0,0 +1,73 @@
+import contextlib
+import importlib.util
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+import mldsl_compile
+
+
+ROOT = Path(__file__).resolve().parents[1]
+TOOLS = ROOT / "tools"
+
+
+def _load_tool(name: str):
+    had_tools = str(TOOLS) in sys.path
+    if not had_tools:
+        sys.path.insert(0, str(TOOLS))
+    spec = importlib.util.spec_from_file_location(f"tools_{name}_local", TOOLS / f"{name}.py")
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"cannot load module spec: {name}")
+    mod = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(mod)
+        return mod
+    finally:
+        if not had_tools and str(TOOLS) in sys.path:
+            sys.path.remove(str(TOOLS))
+
+
+bench_programs = _load_tool("bench_programs")
+bench_compile = _load_tool("bench_compile")
+
+
+@pytest.mark.parametrize("name", sorted(bench_programs.GENERATORS))
+def test_generated_programs_compile_against_pinned_api(tmp_path: Path, monkeypatch, name: str):
+    api = json.loads(bench_programs.BENCH_API_PATH.read_text(encoding="utf-8"))
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: api)
+    entry = bench_programs.GENERATORS[name](tmp_path, 0.02)
+    with contextlib.redirect_stderr(io.StringIO()):
+        entries = mldsl_compile.compile_entries(entry, strict_unknown=True)
+    assert entries
+
+
+def test_check_flags_regressions_over_threshold():
+    base = {"a": {"best_ms": 100.0, "peak_kb": 1000, "entries": 10, "scale": 1.0}}
+    ok = {"a": {"best_ms": 115.0, "peak_kb": 1100, "entries": 10, "scale": 1.0}}
+    assert bench_compile.check(ok, base, 20) == []
+
+    slow = {"a": {"best_ms": 130.0, "peak_kb": 1000, "entries": 11, "scale": 1.0}}
+    failures = bench_compile.check(slow, base, 20)
+    assert len(failures) == 2
+    assert "best_ms" in failures[0] and "entries" in failures[1]
+
+    rescaled = {"a": {**ok["a"], "scale": 0.5}}
+    assert "not comparable" in bench_compile.check(rescaled, base, 20)[0]
+    assert bench_compile.check(ok, None, 20) == []
+
+
+def test_time_threshold_applies_to_wall_time_only():
+    base = {"a": {"best_ms": 100.0, "peak_kb": 1000, "entries": 10, "scale": 1.0}}
+    slow = {"a": {"best_ms": 250.0, "peak_kb": 1000, "entries": 10, "scale": 1.0}}
+    assert bench_compile.check(slow, base, 20, time_threshold=200) == []
+    fat = {"a": {"best_ms": 100.0, "peak_kb": 1300, "entries": 10, "scale": 1.0}}
+    assert "peak_kb" in bench_compile.check(fat, base, 20, time_threshold=200)[0]
+
+
+def test_committed_baseline_covers_every_case():
+    baseline = json.loads((TOOLS / "bench_compile_baseline.json").read_text(encoding="utf-8"))
+    assert set(baseline) == set(bench_programs.GENERATORS)
+    assert {case["scale"] for case in baseline.values()} == {0.2}
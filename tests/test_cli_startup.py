@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+HEAVY = ("json", "hashlib", "runpy", "mldsl_compile", "mldsl_plan", "mldsl_fingerprint")
+
+
+def _run(code, tmp_path, **env):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO,
+        env={**os.environ, "MLDSL_DATA_DIR": str(tmp_path), **env},
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        check=True,
+    )
+
+
+def test_paths_and_help_skip_compiler_imports(tmp_path):
+    code = (
+        "import sys, mldsl_cli\n"
+        "try:\n    mldsl_cli.main(sys.argv[1:] or ['paths'])\nexcept SystemExit:\n    pass\n"
+        f"print('loaded=' + ','.join(m for m in {HEAVY!r} if m in sys.modules))\n"
+    )
+    out = _run(code, tmp_path).stdout
+    assert "data_root=" in out and out.rstrip().endswith("loaded=")
+
+    out = _run(code.replace("sys.argv[1:] or ['paths']", "['compile', '--help']"), tmp_path).stdout
+    assert "--plan" in out and out.rstrip().endswith("loaded=")
+
+
+def test_import_profile_breakdown(tmp_path):
+    res = _run("import mldsl_cli; mldsl_cli.main(['paths'])", tmp_path, MLDSL_IMPORT_PROFILE="1")
+    lines = res.stderr.splitlines()
+    assert lines[0].startswith("[import-profile] ")
+    assert "argparse" in res.stderr and "mldsl_paths" in res.stderr
+    self_ms = [float(line.split()[0]) for line in lines[2:] if not line.startswith("...")]
+    assert self_ms == sorted(self_ms, reverse=True)
+
+
+def test_bench_startup_minimal_compile_succeeds(tmp_path, monkeypatch):
+    import argparse
+    import importlib.util
+    import shutil
+
+    tools = REPO / "tools"
+    monkeypatch.syspath_prepend(str(tools))
+    spec = importlib.util.spec_from_file_location("tools_bench_startup_local", tools / "bench_startup.py")
+    bench = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench)
+
+    data = tmp_path / "data"
+    (data / "out").mkdir(parents=True)
+    shutil.copy2(REPO / "seed" / "out" / "api_aliases.json", data / "out" / "api_aliases.json")
+    monkeypatch.setenv("MLDSL_DATA_DIR", str(data))
+    work = tmp_path / "work"
+    work.mkdir()
+    results = bench.run_cases(argparse.Namespace(exe=None, runs=1), work)
+    assert results["compile minimal"]["exit"] == 0
+    assert (work / "plan.json").exists()
@@ -0,0 +1,69 @@
+import pytest
+
+import mldsl_compile
+from mldsl_compile import MAX_CMD_LEN, compile_commands, pack_row_commands
+from test_compile_select_and_sugar import _api_base
+
+
+def _commands(tmp_path, monkeypatch, lines, **kwargs):
+    path = tmp_path / "case_commands.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return compile_commands(path, **kwargs)
+
+
+def test_short_event_is_one_command(tmp_path, monkeypatch):
+    cmds = _commands(tmp_path, monkeypatch, ['event("Вход") {', '    player.msg(text="a")', "}"])
+    assert cmds == ['/placeadvanced diamond_block "вход" no cobblestone "Сообщение" "slot(9)=text(a)"']
+
+
+def test_long_event_continues_in_funcs(tmp_path, monkeypatch):
+    lines = ['event("Вход") {'] + [f'    player.msg(text="message {i}")' for i in range(20)] + ["}"]
+    lines += ["loop tick every 20 {", '    player.msg(text="t")', "}"]
+    cmds = _commands(tmp_path, monkeypatch, lines)
+
+    assert len(cmds) > 2
+    assert all(len(c) <= MAX_CMD_LEN for c in cmds)
+    assert cmds[0].startswith('/placeadvanced diamond_block "вход" no ')
+    assert cmds[0].endswith('"slot(13)=text(__cmd_cont_1)"')
+    assert cmds[1].startswith('/placeadvanced lapis_block "__cmd_cont_1" no ')
+    assert cmds[-1] == '/placeadvanced emerald_block "tick" 20 cobblestone "Сообщение" "slot(9)=text(t)"'
+    body = " ".join(cmds)
+    assert all(f"text(message {i})" in body for i in range(20))
+
+
+def test_condition_scope_is_not_cut():
+    head = {"block": "diamond_block", "name": "вход", "args": "no"}
+    cond = {"block": "obsidian", "name": "Переменная существует", "args": "slot(13)=var(x)"}
+    skip = {"block": "skip", "name": "", "args": "no"}
+
+    def msg(i):
+        return {"block": "cobblestone", "name": "Сообщение", "args": f"slot(9)=text(m{i})"}
+
+    names = iter(f"c{i}" for i in range(1, 10))
+    call = lambda name: {"block": "cobblestone", "name": "Вызвать функцию", "args": f"slot(13)=text({name})"}
+    row = [head, msg(0), cond, msg(1), msg(2), skip, msg(3), msg(4)]
+    cmds = pack_row_commands(row, call_action=call, alloc_name=lambda: next(names), max_len=240)
+    assert len(cmds) == 3
+    assert "text(c1)" in cmds[0] and "obsidian" not in cmds[0]
+    assert "obsidian" in cmds[1] and "skip" in cmds[1] and cmds[1].endswith('"slot(13)=text(c2)"')
+
+    huge = {"block": "cobblestone", "name": "Сообщение", "args": "slot(9)=text(" + "x" * 240 + ")"}
+    with pytest.raises(ValueError, match="/placeadvanced too long"):
+        pack_row_commands([head, huge], call_action=call, alloc_name=lambda: next(names), max_len=240)
+
+
+def test_oversized_condition_body_moves_to_helper_func(tmp_path, monkeypatch):
+    lines = ['event("Вход") {', '    player.msg(text="before")']
+    lines += ["    if_value.переменная_существует(var=x) {"]
+    lines += [f'        player.msg(text="inside message {i}")' for i in range(20)]
+    lines += ["    }", '    player.msg(text="after")', "}"]
+    cmds = _commands(tmp_path, monkeypatch, lines)
+
+    assert all(len(c) <= MAX_CMD_LEN for c in cmds)
+    # opener, call(helper) and the `skip` closer stay in one command; the body continues in helper funcs
+    (scope,) = [c for c in cmds if " obsidian " in c]
+    assert 'obsidian "Переменная существует" "slot(13)=var(x),slot(31)=var(x)" cobblestone "Вызвать функцию" ' in scope
+    assert ' skip "" "no" cobblestone "Сообщение" "slot(9)=text(after)"' in scope
+    body = " ".join(cmds)
+    assert all(f"text(inside message {i})" in body for i in range(20))
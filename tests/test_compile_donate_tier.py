@@ -10,6 +10,18 @@ def _write_json(path: Path, obj) -> None:
     path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+def _required_tier_for_source(monkeypatch, api_path: Path, code: str):
+    import mldsl_compile
+    from test_compile_select_and_sugar import _api_base
+
+    # Modules missing from `api_path` (selectors, arrays) come from the shared test API; tier maps use `api_path` only.
+    api = {**_api_base(), **json.loads(api_path.read_text(encoding="utf-8"))}
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: api)
+    action_specs: dict[int, dict] = {}
+    mldsl_compile.compile_source(code, options={"action_specs": action_specs})
+    return mldsl_cli._compute_required_tier(action_specs.values())
+
+
 def test_required_tier_king_wins_over_gamer(tmp_path, monkeypatch):
     api_path = tmp_path / "api_aliases.json"
     catalog_path = tmp_path / "actions_catalog.json"
@@ -21,13 +33,13 @@ def test_required_tier_king_wins_over_gamer(tmp_path, monkeypatch):
             "player": {
                 "message": {
                     "aliases": ["soobshchenie"],
-                    "sign1": "A",
+                    "sign1": "Действие игрока",
                     "sign2": "B",
                     "gui": "G1",
                 },
                 "damage": {
                     "aliases": ["uron"],
-                    "sign1": "C",
+                    "sign1": "Действие игрока",
                     "sign2": "D",
                     "gui": "G2",
                 },
@@ -37,9 +49,9 @@ def test_required_tier_king_wins_over_gamer(tmp_path, monkeypatch):
     _write_json(
         catalog_path,
         [
-            {"signs": ["A", "B"], "gui": "G1"},  # id 0
+            {"signs": ["Действие игрока", "B"], "gui": "G1"},  # id 0
             {"signs": ["X", "Y"], "gui": "Gx"},  # id 1
-            {"signs": ["C", "D"], "gui": "G2"},  # id 2
+            {"signs": ["Действие игрока", "D"], "gui": "G2"},  # id 2
         ],
     )
     rank_path.write_text(
@@ -51,8 +63,8 @@ def test_required_tier_king_wins_over_gamer(tmp_path, monkeypatch):
     monkeypatch.setattr(mldsl_cli, "actions_catalog_path", lambda: catalog_path)
     monkeypatch.setattr(mldsl_cli, "repo_root", lambda: tmp_path)
 
-    tier, level, matched, detected = mldsl_cli._compute_required_tier_for_source(
-        'player.message(text="x")\nplayer.damage(num=1)\n'
+    tier, level, matched, detected = _required_tier_for_source(
+        monkeypatch, api_path, 'func f {\n    player.message()\n    player.damage()\n}\n'
     )
     assert tier == "king"
     assert level == mldsl_cli.TIER_LEVEL["king"]
@@ -65,16 +77,93 @@ def test_required_tier_player_when_no_matches(tmp_path, monkeypatch):
     catalog_path = tmp_path / "actions_catalog.json"
     rank_path = tmp_path / "donaterequire.txt"
 
-    _write_json(api_path, {"player": {}})
-    _write_json(catalog_path, [])
+    _write_json(api_path, {"player": {"message": {"aliases": [], "sign1": "Действие игрока", "sign2": "B", "gui": "G1"}}})
+    _write_json(catalog_path, [{"signs": ["Действие игрока", "B"], "gui": "G1"}])
     rank_path.write_text("gamer can\n1\n", encoding="utf-8")
 
     monkeypatch.setattr(mldsl_cli, "api_aliases_path", lambda: api_path)
     monkeypatch.setattr(mldsl_cli, "actions_catalog_path", lambda: catalog_path)
     monkeypatch.setattr(mldsl_cli, "repo_root", lambda: tmp_path)
 
-    tier, level, matched, detected = mldsl_cli._compute_required_tier_for_source("player.unknown()")
+    tier, level, matched, detected = _required_tier_for_source(
+        monkeypatch, api_path, 'func f {\n    player.message()\n}\n'
+    )
     assert tier == "player"
     assert level == 0
     assert matched == []
     assert detected == []
+
+
+def _setup_tier_data(tmp_path, monkeypatch):
+    from test_compile_select_and_sugar import _api_base
+
+    api_path = tmp_path / "api_aliases.json"
+    catalog_path = tmp_path / "actions_catalog.json"
+    _write_json(api_path, _api_base())
+    _write_json(catalog_path, [{"signs": ["Действие игрока", "Вызвать функцию"]}, {"signs": ["Действие игрока", "Сообщение"]}])
+    (tmp_path / "donaterequire.txt").write_text("king can\n1\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_cli, "api_aliases_path", lambda: api_path)
+    monkeypatch.setattr(mldsl_cli, "actions_catalog_path", lambda: catalog_path)
+    monkeypatch.setattr(mldsl_cli, "repo_root", lambda: tmp_path)
+    return api_path
+
+
+def test_required_tier_from_compiled_specs_sees_imports(tmp_path, monkeypatch, capsys):
+    import mldsl_compile
+    from test_compile_select_and_sugar import _api_base
+
+    _setup_tier_data(tmp_path, monkeypatch)
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    (tmp_path / "lib.mldsl").write_text('func f {\n    player.msg(text="f")\n}\n', encoding="utf-8")
+    src = tmp_path / "main.mldsl"
+    src.write_text('import lib\nevent("Вход") {\n    call(f)\n}\n', encoding="utf-8")
+
+    assert mldsl_cli.main(["compile", str(src), "--plan", str(tmp_path / "plan.json")]) == 0
+    err = capsys.readouterr().err
+    assert "required donate tier: king (matched actions: 1; detected: player.msg)" in err
+
+
+def test_tier_index_is_cached_next_to_api(tmp_path, monkeypatch):
+    _setup_tier_data(tmp_path, monkeypatch)
+    spec = {"sign1": "Действие игрока", "sign2": "Сообщение"}
+    assert mldsl_cli._compute_required_tier([spec])[:3] == ("king", mldsl_cli.TIER_LEVEL["king"], [1])
+    assert (tmp_path / "api_aliases.tiers.json").exists()
+
+    def _no_rebuild(*_a):
+        raise AssertionError("tier index rebuilt")
+
+    mldsl_cli._tier_index_cache.clear()
+    monkeypatch.setattr(mldsl_cli, "_build_tier_index", _no_rebuild)
+    assert mldsl_cli._compute_required_tier([spec])[0] == "king"
+
+    monkeypatch.undo()
+    _setup_tier_data(tmp_path, monkeypatch)
+    (tmp_path / "donaterequire.txt").write_text("gamer can\n1\n", encoding="utf-8")
+    assert mldsl_cli._compute_required_tier([spec])[0] == "gamer"
+
+
+def test_action_specs_are_per_compile_under_threads(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import mldsl_compile
+    from test_compile_select_and_sugar import _api_base
+
+    api = _api_base()
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: api)
+    sources = {
+        "msg": 'func f {\n' + '    player.msg(text="a")\n' * 200 + '}\n',
+        "select": 'func g {\n' + '    select.if_player.переменная_существует(var=s)\n' * 200 + '}\n',
+    }
+
+    def run(name):
+        specs: dict[int, dict] = {}
+        mldsl_compile.compile_source(sources[name], options={"action_specs": specs})
+        return name, {spec["sign2"] for spec in specs.values()}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(run, ["msg", "select"] * 4))
+    seen = {name: set() for name in sources}
+    for name, signs in results:
+        seen[name] |= signs
+    assert "Сообщение" in seen["msg"] and "Сообщение" not in seen["select"]
+    assert "Игрок по условию" in seen["select"] and "Игрок по условию" not in seen["msg"]
@@ -0,0 +1,65 @@
+import json
+
+import mldsl_cli
+import mldsl_compile
+import mldsl_events
+from test_compile_select_and_sugar import _api_base
+
+
+def _src(n):
+    body = "".join(f'    player.msg(text="m{i}")\n' for i in range(n))
+    return 'event("Вход") {\n' + body + "    aervaeR()\n}\nfunc f {\n    player.msg(text=\"f\")\n}\n"
+
+
+def test_callback_sink_gets_compile_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    got: list[dict] = []
+    with mldsl_events.sink(got.append):
+        entries = mldsl_compile.compile_source(_src(60), base_dir=tmp_path, options={"warn_unknown": False})
+    assert not mldsl_events.sinks
+
+    names = [ev["event"] for ev in got]
+    assert names[0] == "compile_started" and names[-1] == "compile_finished"
+    assert got[-1]["entries"] == len(entries) and got[-1]["ms"] >= 0
+    stages = [ev["stage"] for ev in got if ev["event"] == "stage"]
+    assert stages[0] == "load_data" and "compile_loop" in stages and stages[-1] == "finish"
+    splits = [ev for ev in got if ev["event"] == "autosplit"]
+    assert splits and splits[0]["decision"] == "part" and splits[0]["call"].startswith("__autosplit_row_")
+    assert [(ev["line"], ev["text"]) for ev in got if ev["event"] == "unresolved_line"] == [(62, "aervaeR()")]
+    assert [(ev["kind"], ev["name"]) for ev in got if ev["event"] == "block_emitted"] == [("event", "Вход"), ("func", "f")]
+
+    got.clear()
+    with mldsl_events.sink(got.append):
+        try:
+            mldsl_compile.compile_source(_src(1), base_dir=tmp_path, options={"strict_unknown": True})
+        except ValueError:
+            pass
+    assert got[-1]["event"] == "compile_failed" and "aervaeR" in got[-1]["error"]
+
+
+def test_cli_events_jsonl(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    src = tmp_path / "main.mldsl"
+    src.write_text(_src(2), encoding="utf-8")
+    out = tmp_path / "events.jsonl"
+    for _ in range(2):
+        assert mldsl_cli.main(["compile", str(src), "--plan", str(tmp_path / "plan.json"), "--events", str(out)]) == 0
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["event"] for r in records].count("compile_started") == 2
+    assert records[-1]["event"] == "donate_tier" and records[-1]["tier"] == "player"
+    assert not mldsl_events.sinks
+
+
+def test_cli_events_from_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    src = tmp_path / "main.mldsl"
+    src.write_text(_src(2), encoding="utf-8")
+    out = tmp_path / "env_events.jsonl"
+    monkeypatch.setenv(mldsl_events.ENV_VAR, str(out))
+    assert mldsl_events.env_jsonl_path() == out
+    assert mldsl_cli.main(["compile", str(src), "--plan", str(tmp_path / "plan.json")]) == 0
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["event"] for r in records].count("compile_started") == 1
+    assert not mldsl_events.sinks
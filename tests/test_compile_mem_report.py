@@ -0,0 +1,44 @@
+import json
+import tracemalloc
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_memreport import MemReport
+from test_compile_select_and_sugar import _api_base
+
+SRC = 'event("Вход") {\n    player.msg(text="hi")\n}\n\nfunc f {\n    player.msg(text="f")\n}\n'
+
+
+def test_mem_report_per_stage_peak_and_retained(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    plain = mldsl_compile.compile_source(SRC, base_dir=tmp_path)
+    report = MemReport()
+    try:
+        assert mldsl_compile.compile_source(SRC, base_dir=tmp_path, options={"mem_report": report}) == plain
+        keep = [bytearray(1024 * 1024)]
+        report.mark("extra")
+    finally:
+        report.stop()
+    assert not tracemalloc.is_tracing()
+
+    stages = [st["stage"] for st in report.stages]
+    assert stages[:2] == ["load_data", "imports"] and stages[-2:] == ["finish", "extra"]
+    extra = report.stages[-1]
+    assert extra["delta_kb"] > 0 and extra["peak_kb"] >= extra["retained_kb"]
+    assert extra["top"][0]["site"].startswith("test_compile_mem_report.py:") and extra["top"][0]["kb"] >= 1024
+    assert report.report()["top_sites"][0]["kb"] >= 1024
+    del keep
+
+
+def test_cli_mem_report_writes_json(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    src = tmp_path / "main.mldsl"
+    src.write_text(SRC, encoding="utf-8")
+    out = tmp_path / "mem.json"
+    assert mldsl_cli.main(["compile", str(src), "--plan", str(tmp_path / "plan.json"), "--mem-report", str(out)]) == 0
+    assert "memory (KiB peak/retained): load_data" in capsys.readouterr().err
+    assert not tracemalloc.is_tracing()
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert report["stages"][-1]["stage"] == "write_plan"
+    assert report["peak_kb"] == max(st["peak_kb"] for st in report["stages"])
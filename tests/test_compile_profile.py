@@ -0,0 +1,40 @@
+import json
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_profile import CompileProfile
+from test_compile_select_and_sugar import _api_base
+
+SRC = 'event("Вход") {\n    player.msg(text="hi")\n}\n\n# note\nfunc f {\n    player.msg(text="f")\n}\n'
+
+
+def test_profile_stages_blocks_and_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    profile = CompileProfile()
+    plain = mldsl_compile.compile_source(SRC, base_dir=tmp_path)
+    assert mldsl_compile.compile_source(SRC, base_dir=tmp_path, options={"profile": profile}) == plain
+
+    by_cat: dict[str, list[dict]] = {}
+    for ev in profile.trace()["traceEvents"]:
+        by_cat.setdefault(ev.get("cat", "meta"), []).append(ev)
+    stages = [ev["name"] for ev in by_cat["stages"]]
+    assert stages[:2] == ["load_data", "imports"] and stages[-1] == "finish"
+    assert {"expand_vfunc", "compile_loop", "flush", "post_passes"} <= set(stages)
+    assert [ev["name"] for ev in by_cat["blocks"]] == ["event Вход", "func f"]
+    assert [ev["args"]["line"] for ev in by_cat["lines"]] == [1, 2, 3, 6, 7, 8]
+    loop = next(ev for ev in by_cat["stages"] if ev["name"] == "compile_loop")
+    for ev in by_cat["blocks"] + by_cat["lines"]:
+        assert ev["ph"] == "X" and loop["ts"] <= ev["ts"] and ev["ts"] + ev["dur"] <= loop["ts"] + loop["dur"] + 1
+
+
+def test_cli_profile_writes_chrome_trace(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    src = tmp_path / "main.mldsl"
+    src.write_text(SRC, encoding="utf-8")
+    out = tmp_path / "trace.json"
+    assert mldsl_cli.main(["compile", str(src), "--plan", str(tmp_path / "plan.json"), "--profile", str(out)]) == 0
+    assert "profile (ms): load_data" in capsys.readouterr().err
+    trace = json.loads(out.read_text(encoding="utf-8"))
+    assert trace["traceEvents"][0]["ph"] == "M"
+    assert any(ev.get("name") == "write_plan" for ev in trace["traceEvents"])
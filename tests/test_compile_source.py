@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+
+import pytest
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_plan import read_plan
+from test_compile_select_and_sugar import _api_base
+
+MAIN = 'import lib\nevent("Вход") {\n    call(f)\n    player.msg(text="hi")\n}\n'
+LIB = 'func f {\n    player.msg(text="lib")\n}\n'
+
+
+def _stdin(monkeypatch, text):
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(text.encode("utf-8"))))
+
+
+def test_compile_source_matches_file_and_takes_options(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.delenv("MLDSL_STRICT_UNKNOWN", raising=False)
+    (tmp_path / "lib.mldsl").write_text(LIB, encoding="utf-8")
+    (tmp_path / "main.mldsl").write_text(MAIN, encoding="utf-8")
+
+    from_file = mldsl_compile.compile_entries(tmp_path / "main.mldsl")
+    assert mldsl_compile.compile_source(MAIN, base_dir=tmp_path) == from_file
+    assert not list(tmp_path.glob("<stdin>*"))
+
+    bad = 'event("Вход") {\n    aervaeR()\n}\n'
+    with pytest.raises(ValueError, match="нераспознанная строка"):
+        mldsl_compile.compile_source(bad, base_dir=tmp_path, options={"strict_unknown": True})
+    assert "MLDSL_STRICT_UNKNOWN" not in os.environ
+    assert mldsl_compile.compile_source(bad, base_dir=tmp_path, options={"warn_unknown": False})
+
+
+def test_cli_compile_stdin(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "lib.mldsl").write_text(LIB, encoding="utf-8")
+    (tmp_path / "main.mldsl").write_text(MAIN, encoding="utf-8")
+    assert mldsl_cli.main(["compile", "main.mldsl", "--plan", "file.json"]) == 0
+
+    _stdin(monkeypatch, MAIN)
+    assert mldsl_cli.main(["compile", "-", "--plan", "plan.json"]) == 0
+    assert read_plan(tmp_path / "plan.json") == read_plan(tmp_path / "file.json")
+
+    _stdin(monkeypatch, MAIN)
+    assert mldsl_cli.main(["compile", "-", "--plan", "plan.json", "--fingerprint-only"]) == 0
+    _stdin(monkeypatch, MAIN.replace("hi", "changed"))
+    assert mldsl_cli.main(["compile", "-", "--plan", "plan.json", "--fingerprint-only"]) == 1
+    capsys.readouterr()
+
+    _stdin(monkeypatch, MAIN)
+    assert mldsl_cli.main(["compile", "-"]) == 0
+    assert "/placeadvanced" in capsys.readouterr().out
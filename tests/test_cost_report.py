@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_cost import cost_report, format_cost_table, write_cost_report
+from test_compile_select_and_sugar import _api_base
+
+
+def _compile(tmp_path, monkeypatch, lines):
+    path = tmp_path / "case_cost.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return mldsl_compile.compile_entries(path)
+
+
+def _unit(report, kind, name):
+    return next(u for u in report["units"] if u["kind"] == kind and u["name"] == name)
+
+
+def test_cost_report_follows_calls_and_weights_loops(tmp_path, monkeypatch):
+    lines = [
+        "func helper {",
+        '    player.msg(text="a")',
+        '    player.msg(text="b")',
+        "}",
+        'event("Вход") {',
+        "    call(helper)",
+        "    call(helper)",
+        "}",
+        "loop tick 5 {",
+        "    call(helper)",
+        "}",
+    ]
+    report = cost_report(_compile(tmp_path, monkeypatch, lines))
+
+    helper = _unit(report, "func", "helper")
+    event = _unit(report, "event", "вход")
+    loop = _unit(report, "loop", "tick")
+    assert helper["call_depth"] == 0
+    assert event["static_calls"] == 2
+    assert event["worst_case_actions"] == 2 + 2 * helper["worst_case_actions"]
+    assert event["call_depth"] == 1
+    assert loop["ticks"] == 5
+    assert loop["weight"] == 4.0
+    assert loop["score"] == loop["worst_case_actions"] * 4.0
+    assert report["hotspots"][0] == {"kind": "loop", "name": "tick", "score": loop["score"]}
+
+
+def test_cost_report_counts_rows_and_marks_recursion():
+    entries = [
+        {"block": "lapis_block", "name": "r", "args": "no"},
+        {"block": "bookshelf", "name": "Вставить в массив||Вставить в массив", "args": "no"},
+        {"block": "purpur_block", "name": "Выбрать объект||x", "args": "no"},
+        {"block": "cobblestone", "name": "Вызвать функцию||Вызвать функцию", "args": "slot(13)=text(r)"},
+        {"block": "skip", "name": "", "args": "no"},
+        {"block": "newline"},
+        {"block": "lapis_block", "name": "r", "args": "no"},
+        {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": "no"},
+    ]
+    report = cost_report(entries)
+    unit = _unit(report, "func", "r")
+    assert unit["rows"] == 2
+    assert unit["actions"] == 5
+    assert unit["worst_case_actions"] == 4
+    assert unit["array_ops"] == 1
+    assert unit["selection_switches"] == 1
+    assert unit["recursive"] is True
+    assert "r*" in format_cost_table(report)
+
+
+def test_cost_report_deep_helper_chain():
+    # An autosplit chain deeper than the recursion limit (e.g. one 100k-action event).
+    depth = 3000
+    call = {"block": "cobblestone", "name": "Вызвать функцию||Вызвать функцию"}
+    msg = {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": "no"}
+    entries = [{"block": "diamond_block", "name": "вход", "args": "no"}, msg, {**call, "args": "slot(13)=text(h0)"}]
+    for i in range(depth):
+        entries += [{"block": "newline"}, {"block": "lapis_block", "name": f"h{i}", "args": "no"}, msg]
+        if i + 1 < depth:
+            entries.append({**call, "args": f"slot(13)=text(h{i + 1})"})
+    report = cost_report(entries)
+    event = _unit(report, "event", "вход")
+    assert event["call_depth"] == depth
+    assert event["worst_case_actions"] == 2 + depth + (depth - 1)
+    assert _unit(report, "func", "h0")["call_depth"] == depth - 1
+
+
+def test_write_cost_report_outputs_json(tmp_path):
+    entries = [{"block": "diamond_block", "name": "вход", "args": "no"}]
+    out = tmp_path / "reports" / "cost.json"
+    write_cost_report(entries, out)
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert data["version"] == 1
+    assert data["hotspots"] == [{"kind": "event", "name": "вход", "score": 0.0}]
+
+
+def test_plan_only_options_require_plan(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    src = tmp_path / "main.mldsl"
+    src.write_text('event("Вход") {\n    player.msg(text="a")\n}\n', encoding="utf-8")
+    for extra in (["--cost-report", str(tmp_path / "cost.json")], ["-O2"], ["--format", "compact"]):
+        with pytest.raises(ValueError, match="требует --plan"):
+            mldsl_cli.main(["compile", str(src), *extra])
+    assert not (tmp_path / "cost.json").exists()
@@ -0,0 +1,77 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import mldsl_compile
+from test_compile_select_and_sugar import _api_base
+
+
+ROOT = Path(__file__).resolve().parents[1]
+TOOLS = ROOT / "tools"
+
+
+def _load_dslpy_compile():
+    had_tools = str(TOOLS) in sys.path
+    if not had_tools:
+        sys.path.insert(0, str(TOOLS))
+    spec = importlib.util.spec_from_file_location("tools_dslpy_compile_local", TOOLS / "dslpy_compile.py")
+    if spec is None or spec.loader is None:
+        raise RuntimeError("cannot load module spec: dslpy_compile")
+    mod = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(mod)
+        return mod
+    finally:
+        if not had_tools and str(TOOLS) in sys.path:
+            sys.path.remove(str(TOOLS))
+
+
+dslpy_compile = _load_dslpy_compile()
+
+
+def _fake_transpiler(calls: list[str]):
+    # Stand-in for tools/_premium/dslpy_transpile.py: `say <text>` lines -> one event.
+    def transpile(src: str) -> str:
+        calls.append(src)
+        body = [f'    player.msg(text="{ln.split(" ", 1)[1]}")' for ln in src.splitlines() if ln.startswith("say ")]
+        if not body:
+            raise ValueError("nothing to say")
+        return 'event("Вход") {\n' + "\n".join(body) + "\n}\n"
+
+    return lambda: transpile
+
+
+def test_template_directive_parsing():
+    assert dslpy_compile.template_name("\ufeff\n  @import timer_start 2\n") == "timer_start"
+    assert dslpy_compile.template_name('@Template "examples\\hold_rightclick" # x') == "examples/hold_rightclick"
+    assert dslpy_compile.template_name("import dsl\n@import timer_start") is None
+
+
+def test_batch_shares_session_and_caches_templates(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    calls: list[str] = []
+    monkeypatch.setattr(dslpy_compile, "_load_transpiler", _fake_transpiler(calls))
+    examples = tmp_path / "examples"
+    examples.mkdir()
+    (examples / "greet.dslpy").write_text("say hello\n", encoding="utf-8")
+    monkeypatch.setattr(dslpy_compile, "EXAMPLES_DIR", examples)
+
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.dslpy").write_text("@import greet\n", encoding="utf-8")
+    (src / "b.dslpy").write_text("@template greet\n", encoding="utf-8")
+    (src / "c.dslpy").write_text("say c\nsay d\n", encoding="utf-8")
+    (src / "d.dslpy").write_text("pass\n", encoding="utf-8")
+    plans = tmp_path / "plans"
+
+    assert dslpy_compile.main(["--batch", str(src), "--plan-dir", str(plans)]) == 1
+    out = capsys.readouterr()
+    assert [ln.split(" (")[0] for ln in out.out.splitlines()] == ["OK: a.dslpy", "OK: b.dslpy", "OK: c.dslpy"]
+    assert "ERROR: d.dslpy: dslpy: ValueError: nothing to say" in out.err
+    # The template is transpiled once for both files that import it.
+    assert calls == ["say hello\n", "say c\nsay d\n", "pass\n"]
+    assert (src / "c.mldsl").read_text(encoding="utf-8").count("player.msg") == 2
+    plan = json.loads((plans / "a.plan.json").read_text(encoding="utf-8"))
+    assert plan == json.loads((plans / "b.plan.json").read_text(encoding="utf-8"))
+    assert not (plans / "d.plan.json").exists()
@@ -0,0 +1,61 @@
+import mldsl_compile
+from mldsl_plan import call_target, split_rows
+from test_compile_select_and_sugar import _api_base
+
+
+def _compile(tmp_path, monkeypatch, lines, **kwargs):
+    path = tmp_path / "case_outline.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return mldsl_compile.compile_entries(path, **kwargs)
+
+
+def _repeated_program(events: int = 3, body_len: int = 8):
+    lines = []
+    for ev in range(events):
+        lines.append(f'event("Ev{ev}") {{')
+        lines.append(f'    player.msg(text="head{ev}")')
+        for i in range(body_len):
+            lines.append(f'    player.msg(text="shared{i}")')
+        lines.append("}")
+    return lines
+
+
+def _action_count(entries):
+    return sum(1 for e in entries if e.get("block") != "newline")
+
+
+def test_outline_moves_repeated_sequence_into_helper(tmp_path, monkeypatch, capsys):
+    lines = _repeated_program()
+    plain = _compile(tmp_path, monkeypatch, lines)
+    outlined = _compile(tmp_path, monkeypatch, lines, outline=True)
+
+    assert _action_count(outlined) < _action_count(plain)
+    rows = split_rows(outlined)
+    helper_rows = [r for r in rows if str(r[0].get("name") or "").startswith(mldsl_compile.OUTLINE_FUNC_PREFIX)]
+    assert len(helper_rows) == 1
+    helper_name = helper_rows[0][0]["name"]
+    assert len(helper_rows[0]) == 1 + 8
+    for row in rows:
+        if row[0].get("block") != "diamond_block":
+            continue
+        targets = [call_target(e)[1] for e in row if call_target(e)[0]]
+        assert targets == [helper_name]
+    assert "outline: moved 1 repeated sequence(s)" in capsys.readouterr().err
+
+
+def test_outline_keeps_short_or_unique_sequences(tmp_path, monkeypatch):
+    lines = _repeated_program(events=2, body_len=3)
+    assert _compile(tmp_path, monkeypatch, lines, outline=True) == _compile(tmp_path, monkeypatch, lines)
+
+
+def test_outline_skips_windows_under_custom_selection(tmp_path, monkeypatch):
+    lines = []
+    for ev in range(3):
+        lines.append(f'event("Ev{ev}") {{')
+        lines.append("    select.if_player.переменная_существует(var=x)")
+        for i in range(8):
+            lines.append(f'    player.msg(text="shared{i}")')
+        lines.append("}")
+    plain = _compile(tmp_path, monkeypatch, lines)
+    assert _compile(tmp_path, monkeypatch, lines, outline=True) == plain
@@ -0,0 +1,61 @@
+import pytest
+
+import mldsl_compile
+from mldsl_passes import OPT_LEVELS, PASSES, PassManager, format_pass_stats, resolve_passes
+from test_compile_select_and_sugar import _api_base
+
+
+def _write(tmp_path, lines):
+    path = tmp_path / "case_passes.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def _long_program():
+    lines = ["func heavy {"]
+    for i in range(60):
+        lines.append(f'    player.msg(text="m{i}")')
+    lines.extend(["}", 'event("Вход") {', "    call(heavy)", "}", "func dead {", '    player.msg(text="d")', "}"])
+    return lines
+
+
+def test_resolve_passes_presets_and_overrides():
+    assert resolve_passes("O0") == {"collapse-autosplit", "promote-named-autosplit"}
+    assert resolve_passes("s") == set(OPT_LEVELS["Os"])
+    assert resolve_passes("O2", disable=["tree-shake"]) == set(OPT_LEVELS["O1"])
+    assert resolve_passes("O0", enable=["outline"], disable=["outline"]) == set(OPT_LEVELS["O0"])
+    assert set(OPT_LEVELS["Os"]) == set(PASSES)
+    with pytest.raises(ValueError, match="opt level"):
+        resolve_passes("O3")
+    with pytest.raises(ValueError, match="pass: неизвестный проход `inline`"):
+        resolve_passes("O0", enable=["inline"])
+
+
+def test_pass_manager_records_time_and_delta():
+    pm = PassManager({"tree-shake"})
+    out, dropped = pm.run("tree-shake", lambda ir: (ir[:1], len(ir) - 1), [1, 2, 3])
+    assert (out, dropped) == ([1], 2)
+    (rec,) = pm.stats
+    assert rec["pass"] == "tree-shake" and rec["stage"] == "entries"
+    assert (rec["before"], rec["after"], rec["delta"]) == (3, 1, -2)
+    assert rec["seconds"] >= 0
+    assert "tree-shake" in format_pass_stats(pm.stats)
+
+
+def test_o0_matches_default_and_records_default_passes(tmp_path, monkeypatch):
+    path = _write(tmp_path, _long_program())
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    stats = []
+    assert mldsl_compile.compile_entries(path, opt_level="O0", pass_stats=stats) == mldsl_compile.compile_entries(path)
+    assert [s["pass"] for s in stats] == ["collapse-autosplit", "promote-named-autosplit"]
+
+
+def test_o2_enables_tree_shake_and_single_pass_flags_match(tmp_path, monkeypatch):
+    path = _write(tmp_path, _long_program())
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    stats = []
+    o2 = mldsl_compile.compile_entries(path, opt_level="O2", pass_stats=stats)
+    assert "dead" not in {e.get("name") for e in o2 if e.get("block") == "lapis_block"}
+    assert [s["pass"] for s in stats] == ["row-pack-dp", "collapse-autosplit", "promote-named-autosplit", "tree-shake"]
+    assert o2 == mldsl_compile.compile_entries(path, tree_shake=True, row_packer="dp")
+    assert o2 != mldsl_compile.compile_entries(path, opt_level="O2", disable_passes=["tree-shake"])
@@ -0,0 +1,55 @@
+import mldsl_compile
+from mldsl_delta import align_generated_names, plan_delta
+from mldsl_plan import join_rows
+from test_compile_select_and_sugar import _api_base
+
+
+def _compile(tmp_path, monkeypatch, lines):
+    path = tmp_path / "case_delta.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return mldsl_compile.compile_entries(path)
+
+
+def _program(first_len: int):
+    lines = ['event("Вход") {']
+    lines += [f'    player.msg(text="a{i}")' for i in range(first_len)]
+    lines += ["}", 'event("Выход") {']
+    lines += [f'    player.msg(text="b{i}")' for i in range(100)]
+    lines += ["}"]
+    return lines
+
+
+def test_delta_absorbs_autosplit_renumbering(tmp_path, monkeypatch):
+    base = _compile(tmp_path, monkeypatch, _program(60))
+    new = _compile(tmp_path, monkeypatch, _program(100))
+
+    raw = plan_delta(base, new)
+    aligned, renamed = align_generated_names(base, new)
+    delta = plan_delta(base, aligned)
+
+    assert renamed
+    assert len(delta["changed"]) + len(delta["added"]) < len(raw["changed"]) + len(raw["added"])
+    # Only the edited event chain differs: its tail helper grows and one extra helper row appears;
+    # the untouched event keeps its (renumbered in the new compile) helpers under base names.
+    assert [c["id"] for c in delta["changed"]] == ["lapis_block:__autosplit_row_1#0"]
+    assert [a["id"] for a in delta["added"]] == ["lapis_block:__autosplit_row_5#0"]
+    assert delta["removed"] == []
+    assert delta["unchanged"] == delta["rows_new"] - 2
+    # Calls in the renamed plan point at helpers that exist in it.
+    heads = {e["name"] for e in aligned if e.get("block") == "lapis_block"}
+    for e in aligned:
+        if "Вызвать функцию" in str(e.get("name")):
+            assert e["args"].split("text(")[1].rstrip(")") in heads
+
+
+def test_delta_reports_added_changed_removed_rows():
+    head = {"block": "diamond_block", "name": "вход", "args": "no"}
+    msg = lambda t: {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": f"slot(9)=text({t})"}  # noqa: E731
+    base = join_rows([[head, msg("a")], [{"block": "lapis_block", "name": "gone", "args": "no"}]])
+    new = join_rows([[head, msg("b")], [{"block": "lapis_block", "name": "fresh", "args": "no"}]])
+    delta = plan_delta(base, new)
+    assert [(c["id"], c["index"], c["base_index"]) for c in delta["changed"]] == [("diamond_block:вход#0", 0, 0)]
+    assert [a["id"] for a in delta["added"]] == ["lapis_block:fresh#0"]
+    assert delta["removed"] == [{"id": "lapis_block:gone#0", "base_index": 1}]
+    assert plan_delta(base, base)["unchanged"] == 2
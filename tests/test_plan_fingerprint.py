@@ -0,0 +1,117 @@
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_fingerprint import build_fingerprint, fingerprint_path, read_fingerprint
+from mldsl_plan import PlanStreamWriter, write_plan
+from test_compile_select_and_sugar import _api_base
+
+ROW = [{"block": "diamond_block", "name": "вход", "args": "no"}]
+
+
+def _setup(tmp_path, monkeypatch):
+    (tmp_path / "lib.mldsl").write_text('func f {\n    player.msg(text="f")\n}\n', encoding="utf-8")
+    src = tmp_path / "main.mldsl"
+    src.write_text('import lib\nevent("Вход") {\n    call(f)\n}\n', encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    return src
+
+
+def _touch_old(path):
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+
+def test_identical_plan_is_not_rewritten(tmp_path):
+    out = tmp_path / "plan.json"
+    assert write_plan(out, ROW) is True
+    _touch_old(out)
+    assert write_plan(out, ROW) is False
+    assert out.stat().st_mtime_ns == 1_000_000_000
+
+    with PlanStreamWriter(out) as writer:
+        writer.write_row(ROW)
+    assert writer.unchanged
+    assert out.stat().st_mtime_ns == 1_000_000_000
+    assert [p.name for p in tmp_path.iterdir()] == ["plan.json"]
+
+
+def test_fingerprint_covers_import_closure_and_options(tmp_path, monkeypatch):
+    src = _setup(tmp_path, monkeypatch)
+    fp = build_fingerprint(src, {"opt_level": "O0"})
+    assert sorted(fp["sources"]) == ["lib.mldsl", "main.mldsl"]
+    assert build_fingerprint(src, {"opt_level": "O0"})["fingerprint"] == fp["fingerprint"]
+    assert build_fingerprint(src, {"opt_level": "O2"})["fingerprint"] != fp["fingerprint"]
+
+    (tmp_path / "lib.mldsl").write_text('func f {\n    player.msg(text="g")\n}\n', encoding="utf-8")
+    assert build_fingerprint(src, {"opt_level": "O0"})["fingerprint"] != fp["fingerprint"]
+
+
+def test_cli_reports_unchanged_and_fingerprint_only(tmp_path, monkeypatch, capsys):
+    src = _setup(tmp_path, monkeypatch)
+    plan = tmp_path / "plan.json"
+    argv = ["compile", str(src), "--plan", str(plan)]
+
+    assert mldsl_cli.main([*argv, "--fingerprint-only"]) == 1
+    assert "changed:" in capsys.readouterr().out
+    assert not plan.exists()
+
+    assert mldsl_cli.main(argv) == 0
+    assert "OK: wrote" in capsys.readouterr().out
+    assert read_fingerprint(plan)["sources"].keys() == {"main.mldsl", "lib.mldsl"}
+    _touch_old(plan)
+
+    assert mldsl_cli.main([*argv, "--fingerprint-only"]) == 0
+    assert capsys.readouterr().out.startswith("unchanged:")
+    assert mldsl_cli.main([*argv, "--stream"]) == 0
+    assert "OK: unchanged" in capsys.readouterr().out
+    assert plan.stat().st_mtime_ns == 1_000_000_000
+
+    assert mldsl_cli.main([*argv, "-O", "2", "--fingerprint-only"]) == 1
+    (tmp_path / "main.mldsl").write_text('import lib\nevent("Вход") {\n    call(f)\n    call(f)\n}\n', encoding="utf-8")
+    assert mldsl_cli.main([*argv, "--fingerprint-only"]) == 1
+    capsys.readouterr()
+    assert mldsl_cli.main(argv) == 0
+    assert "OK: wrote" in capsys.readouterr().out
+    assert fingerprint_path(plan).exists()
+
+
+def test_data_files_are_hashed_once_while_unchanged(tmp_path, monkeypatch):
+    import mldsl_fingerprint
+
+    src = _setup(tmp_path, monkeypatch)
+    api_file = tmp_path / "api_aliases.json"
+    api_file.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "API_PATH", api_file)
+    hashed = []
+    real_sha = mldsl_fingerprint._file_sha256
+    monkeypatch.setattr(mldsl_fingerprint, "_file_sha256", lambda p: hashed.append(Path(p)) or real_sha(p))
+
+    fp = build_fingerprint(src, {"opt_level": "O0"})
+    assert api_file in hashed
+    hashed.clear()
+    assert build_fingerprint(src, {"opt_level": "O0"})["fingerprint"] == fp["fingerprint"]
+    assert sorted(p.name for p in hashed) == ["lib.mldsl", "main.mldsl"]
+
+    api_file.write_text('{"player": {}}', encoding="utf-8")
+    assert build_fingerprint(src, {"opt_level": "O0"})["data"] != fp["data"]
+    assert api_file in hashed
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+def test_written_plan_keeps_file_mode(tmp_path):
+    old_umask = os.umask(0o022)
+    try:
+        out = tmp_path / "plan.json"
+        assert write_plan(out, ROW) is True
+        assert stat.S_IMODE(out.stat().st_mode) == 0o644
+
+        os.chmod(out, 0o640)
+        assert write_plan(out, [*ROW, {"block": "cobblestone", "name": "x", "args": "no"}]) is True
+        assert stat.S_IMODE(out.stat().st_mode) == 0o640
+    finally:
+        os.umask(old_umask)
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import mldsl_compile
+from mldsl_plan import COMPACT_PLAN_VERSION, dumps_plan, loads_plan, read_plan, write_plan
+from test_compile_select_and_sugar import _api_base
+
+
+def _entries(tmp_path, monkeypatch):
+    lines = ['event("Вход") {']
+    for i in range(50):
+        lines.append(f'    player.msg(text="m{i % 3}")')
+    lines.append("}")
+    path = tmp_path / "case_plan_format.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return mldsl_compile.compile_entries(path)
+
+
+@pytest.mark.parametrize("fmt", ["pretty", "compact"])
+def test_plan_round_trips(tmp_path, monkeypatch, fmt):
+    entries = _entries(tmp_path, monkeypatch)
+    entries.append({"block": "planks", "name": "x||y", "args": "no", "negated": True})
+    entries.append({"block": "custom", "extra": [1, 2]})
+    out = tmp_path / f"plan.{fmt}.json"
+    write_plan(out, entries, fmt)
+    assert read_plan(out) == entries
+
+
+def test_pretty_format_is_historical_layout(tmp_path, monkeypatch):
+    entries = _entries(tmp_path, monkeypatch)
+    assert dumps_plan(entries) == json.dumps({"entries": entries}, ensure_ascii=False, indent=2) + "\n"
+
+
+def test_compact_format_interns_strings(tmp_path, monkeypatch):
+    entries = _entries(tmp_path, monkeypatch)
+    text = dumps_plan(entries, "compact")
+    data = json.loads(text)
+    assert data["format"] == "mldsl-plan-compact"
+    assert data["version"] == COMPACT_PLAN_VERSION
+    assert len(data["strings"]) == len(set(data["strings"]))
+    assert "\n" not in text.rstrip("\n")
+    assert len(text.encode("utf-8")) < len(dumps_plan(entries).encode("utf-8")) / 2
+
+
+def test_compact_reader_rejects_unknown_version():
+    with pytest.raises(ValueError, match="версия"):
+        loads_plan(json.dumps({"format": "mldsl-plan-compact", "version": 99, "strings": [], "entries": []}))
+    with pytest.raises(ValueError, match="format"):
+        dumps_plan([], "msgpack")
@@ -0,0 +1,81 @@
+import mldsl_cli
+from mldsl_link import link_plans
+from mldsl_plan import call_target, join_rows, read_plan, split_rows, write_plan
+
+NL = {"block": "newline"}
+
+
+def _head(block, name):
+    return {"block": block, "name": name, "args": "no"}
+
+
+def _msg(t):
+    return {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": f"slot(9)=text({t})"}
+
+
+def _call(name):
+    return {"block": "cobblestone", "name": "Вызвать функцию||Вызвать функцию", "args": f"slot(13)=text({name})"}
+
+
+def _func(name, *body):
+    return [_head("lapis_block", name), *body]
+
+
+def _event(name, *body):
+    return [_head("diamond_block", name), *body]
+
+
+def _funcs(entries):
+    return [row[0]["name"] for row in split_rows(entries) if row[0]["block"] == "lapis_block"]
+
+
+def test_link_dedupes_library_and_renames_clashes():
+    lib = _func("lib", _msg("lib"))
+    a = join_rows([_event("вход", _call("lib"), _call("util")), lib, _func("util", _msg("a"))])
+    b = join_rows([_event("выход", _call("lib"), _call("util")), lib, _func("util", _msg("b"))])
+    entries, report = link_plans([a, b], labels=["a.json", "b.json"])
+
+    rows = split_rows(entries)
+    assert all(len(r) >= 1 for r in rows) and len(rows) == 5
+    assert _funcs(entries) == ["lib", "util", "util__2"]
+    assert [call_target(e)[1] for e in rows[3][1:]] == ["lib", "util__2"]
+    assert report["renamed"] == [{"plan": "b.json", "from": "util", "to": "util__2"}]
+    assert report["deduped"] == [{"plan": "b.json", "func": "lib", "as": "lib"}]
+
+
+def test_link_renames_callers_of_renamed_funcs():
+    a = join_rows([_func("api", _call("core")), _func("core", _msg("a"))])
+    b = join_rows([_func("api", _call("core")), _func("core", _msg("b"))])
+    entries, report = link_plans([a, b])
+    assert sorted(_funcs(entries)) == ["api", "api__2", "core", "core__2"]
+    assert {r["from"] for r in report["renamed"]} == {"api", "core"}
+
+
+def test_link_matches_and_renumbers_autosplit_helpers():
+    shared = _func("__autosplit_row_1", _msg("shared"))
+    a = join_rows([_event("вход", _call("__autosplit_row_1")), shared])
+    b = join_rows(
+        [
+            _event("выход", _call("__autosplit_row_1"), _call("__autosplit_row_2")),
+            _func("__autosplit_row_1", _msg("other")),
+            _func("__autosplit_row_2", _msg("shared")),
+        ]
+    )
+    entries, report = link_plans([a, b])
+    assert _funcs(entries) == ["__autosplit_row_1", "__autosplit_row_3"]
+    rows = split_rows(entries)
+    assert [call_target(e)[1] for e in rows[2][1:]] == ["__autosplit_row_3", "__autosplit_row_1"]
+    assert rows[3] == _func("__autosplit_row_3", _msg("other"))
+    assert report["deduped"] == [{"plan": "plan#2", "func": "__autosplit_row_2", "as": "__autosplit_row_1"}]
+
+
+def test_link_cli(tmp_path, capsys):
+    a, b, out = tmp_path / "a.json", tmp_path / "b.json", tmp_path / "world.json"
+    write_plan(a, join_rows([_event("вход", _call("f")), _func("f", _msg("a"))]))
+    write_plan(b, join_rows([_event("выход", _call("f")), _func("f", _msg("b"))]), "compact")
+    assert mldsl_cli.main(["link", str(a), str(b), "-o", str(out)]) == 0
+    captured = capsys.readouterr()
+    assert "OK: wrote" in captured.out
+    assert "`f` in b.json differs" in captured.err
+    assert _funcs(read_plan(out)) == ["f", "f__2"]
+    assert NL not in read_plan(out)[-1:]
@@ -0,0 +1,77 @@
+import json
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_plan import join_rows, read_plan, split_rows
+from mldsl_shard import shard_rows
+from test_compile_select_and_sugar import _api_base
+
+
+def _head(block, name, args="no"):
+    return {"block": block, "name": name, "args": args}
+
+
+def _msg(t):
+    return {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": f"slot(9)=text({t})"}
+
+
+def _call(name):
+    return {"block": "cobblestone", "name": "Вызвать функцию||Вызвать функцию", "args": f"slot(13)=text({name})"}
+
+
+def _key(row):
+    return (row[0]["block"], row[0]["name"])
+
+
+def test_shards_balance_and_keep_helper_chains():
+    rows = [
+        [_head("diamond_block", "вход"), *[_msg(i) for i in range(10)], _call("__autosplit_row_1")],
+        [_head("gold_block", "выход"), *[_msg(i) for i in range(8)]],
+        [_head("emerald_block", "tick", "20"), _msg("t")],
+        [_head("lapis_block", "f"), *[_msg(i) for i in range(6)]],
+        [_head("lapis_block", "__autosplit_row_1"), *[_msg(i) for i in range(5)], _call("__autosplit_row_2")],
+        [_head("lapis_block", "__autosplit_row_2"), *[_msg(i) for i in range(3)]],
+        [_head("lapis_block", "f"), _msg("f2")],
+    ]
+    parts = shard_rows(join_rows(rows), 3)
+    assert len(parts) == 3
+    keys = [[_key(r) for r in part] for part in parts]
+    assert keys[0] == [("diamond_block", "вход"), ("lapis_block", "__autosplit_row_1"), ("lapis_block", "__autosplit_row_2")]
+    assert ("lapis_block", "f") in keys[2] and keys[2].count(("lapis_block", "f")) == 2
+    assert sorted(map(_key, rows)) == sorted(k for part in keys for k in part)
+
+    assert len(shard_rows(join_rows(rows[:2]), 8)) == 2
+
+
+def test_cli_writes_shards_and_manifest(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    src = tmp_path / "main.mldsl"
+    lines = ['event("Вход") {'] + [f'    player.msg(text="m{i}")' for i in range(60)] + ["}"]
+    lines += ['event("Выход") {', "    call(f)", "}", "func f {", '    player.msg(text="f")', "}"]
+    src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    plan = tmp_path / "plan.json"
+    (tmp_path / "plan.shard-5.json").write_text("[]", encoding="utf-8")
+
+    assert mldsl_cli.main(["compile", str(src), "--plan", str(plan), "--shards", "4"]) == 0
+    assert "shards: 3" in capsys.readouterr().err
+    manifest = json.loads((tmp_path / "plan.shards.json").read_text(encoding="utf-8"))
+    assert [s["file"] for s in manifest["shards"]] == ["plan.shard-1.json", "plan.shard-2.json", "plan.shard-3.json"]
+    assert not (tmp_path / "plan.shard-5.json").exists()
+
+    full = sorted(map(repr, split_rows(read_plan(plan))))
+    parts = [r for s in manifest["shards"] for r in split_rows(read_plan(tmp_path / s["file"]))]
+    assert sorted(map(repr, parts)) == full
+    assert manifest["total_blocks"] == sum(s["blocks"] for s in manifest["shards"])
+
+
+def test_same_named_event_rows_are_balanced():
+    rows = [[_head("diamond_block", "вход"), *[_msg(j) for j in range(4 + i % 3)]] for i in range(40)]
+    rows += [[_head("lapis_block", "f"), *[_msg(j) for j in range(5)]], [_head("lapis_block", "f"), _msg("f2")]]
+    parts = shard_rows(join_rows(rows), 4)
+    loads = [sum(len(r) for r in part) for part in parts]
+    assert len(parts) == 4
+    # Greedy largest-first: shard loads differ by at most one unit (event rows are at most 7 blocks).
+    assert max(loads) - min(loads) <= 7
+    f_parts = [k for k, part in enumerate(parts) if any(_key(r) == ("lapis_block", "f") for r in part)]
+    assert len(f_parts) == 1
@@ -0,0 +1,63 @@
+import os
+import stat
+
+import pytest
+
+import mldsl_compile
+from mldsl_plan import PlanStreamWriter, read_plan, write_plan
+from test_compile_select_and_sugar import _api_base
+
+
+def _program():
+    lines = ["func heavy {"]
+    for i in range(100):
+        lines.append(f'    player.msg(text="h{i}")')
+    lines.extend(["}", "func dead {", '    player.msg(text="d")', "}", 'event("Вход") {'])
+    for i in range(90):
+        lines.append(f'    player.msg(text="e{i}")')
+    lines.extend(["    call(heavy)", "}"])
+    return lines
+
+
+@pytest.mark.parametrize("fmt", ["pretty", "compact"])
+@pytest.mark.parametrize("kwargs", [{}, {"opt_level": "O2"}, {"disable_passes": ["collapse-autosplit"]}])
+def test_streamed_plan_is_byte_identical(tmp_path, monkeypatch, fmt, kwargs):
+    path = tmp_path / "case_stream.mldsl"
+    path.write_text("\n".join(_program()) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+
+    entries = mldsl_compile.compile_entries(path, **kwargs)
+    write_plan(tmp_path / "full.json", entries, fmt)
+    written = mldsl_compile.compile_plan_file(path, tmp_path / "stream.json", fmt=fmt, **kwargs)
+
+    assert written == len(entries)
+    assert (tmp_path / "stream.json").read_bytes() == (tmp_path / "full.json").read_bytes()
+    assert read_plan(tmp_path / "stream.json") == entries
+
+
+def test_stream_writer_keeps_previous_plan_on_failure(tmp_path):
+    out = tmp_path / "plan.json"
+    out.write_text("old", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with PlanStreamWriter(out) as writer:
+            writer.write_row([{"block": "diamond_block", "name": "x", "args": "no"}])
+            raise RuntimeError("boom")
+    assert out.read_text(encoding="utf-8") == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["plan.json"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+def test_stream_writer_keeps_file_mode(tmp_path):
+    old_umask = os.umask(0o022)
+    try:
+        out = tmp_path / "plan.json"
+        with PlanStreamWriter(out) as writer:
+            writer.write_row([{"block": "diamond_block", "name": "x", "args": "no"}])
+        assert stat.S_IMODE(out.stat().st_mode) == 0o644
+
+        os.chmod(out, 0o640)
+        with PlanStreamWriter(out) as writer:
+            writer.write_row([{"block": "diamond_block", "name": "y", "args": "no"}])
+        assert stat.S_IMODE(out.stat().st_mode) == 0o640
+    finally:
+        os.umask(old_umask)
@@ -0,0 +1,75 @@
+import json
+
+import mldsl_compile
+from mldsl_plan import join_rows, plan_row_hashes, read_plan, read_plan_meta, split_rows, write_plan
+from test_compile_select_and_sugar import _api_base
+
+
+def _compile(tmp_path, monkeypatch, first_len: int, tail_text: str = "b"):
+    lines = ['event("Вход") {']
+    lines += [f'    player.msg(text="a{i}")' for i in range(first_len)]
+    lines += ["}", 'event("Выход") {']
+    lines += [f'    player.msg(text="{tail_text}{i}")' for i in range(100)]
+    lines += ["}"]
+    path = tmp_path / "case_row_hashes.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return mldsl_compile.compile_entries(path)
+
+
+def _hashes_by_first_entry(entries):
+    hashes, _fp = plan_row_hashes(entries)
+    return {json.dumps(row[1], ensure_ascii=False): h for row, h in zip(split_rows(entries), hashes)}
+
+
+def test_row_hash_is_pinned():
+    row = [{"block": "diamond_block", "name": "вход", "args": "no"}]
+    hashes, fingerprint = plan_row_hashes(row)
+    assert hashes == ["498c73d5e04b9c9b"]
+    assert fingerprint == "d3c4a4c81728e203be87e6c29a235748e707e03eb85003db08c1ad6e4b7add11"
+
+
+def test_row_hashes_ignore_autosplit_counters(tmp_path, monkeypatch):
+    short = _hashes_by_first_entry(_compile(tmp_path, monkeypatch, 60))
+    long = _hashes_by_first_entry(_compile(tmp_path, monkeypatch, 100))
+    # Every row of the untouched `Выход` chain keeps its hash although its helpers were renumbered.
+    tail_rows = [k for k in short if "=text(b" in k]
+    assert len(tail_rows) == 3
+    assert all(short[k] == long[k] for k in tail_rows)
+
+
+def test_row_hash_follows_called_helper_content():
+    call = {"block": "cobblestone", "name": "Вызвать функцию||Вызвать функцию", "args": "slot(13)=text(__autosplit_row_1)"}
+    event = [{"block": "diamond_block", "name": "вход", "args": "no"}, call]
+
+    def plan(body_text):
+        helper = [
+            {"block": "lapis_block", "name": "__autosplit_row_1", "args": "no"},
+            {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": f"slot(9)=text({body_text})"},
+        ]
+        return join_rows([event, helper])
+
+    (ev_a, helper_a), fp_a = plan_row_hashes(plan("a"))
+    (ev_b, helper_b), fp_b = plan_row_hashes(plan("b"))
+    # Identical event row text, but it calls a different helper body.
+    assert ev_a != ev_b
+    assert helper_a != helper_b
+    assert fp_a != fp_b
+    assert plan_row_hashes(plan("a")) == ([ev_a, helper_a], fp_a)
+
+
+def test_row_hashes_embedded_as_optional_meta(tmp_path, monkeypatch):
+    entries = _compile(tmp_path, monkeypatch, 60)
+    out = tmp_path / "plan.json"
+    write_plan(out, entries, row_hashes=True)
+    meta = read_plan_meta(out)
+    hashes, fingerprint = plan_row_hashes(entries)
+    assert meta == {"hash": "sha256/16", "fingerprint": fingerprint, "row_hashes": hashes}
+    assert len(hashes) == len(split_rows(entries))
+    assert read_plan(out) == entries
+
+    streamed = tmp_path / "stream.json"
+    mldsl_compile.compile_plan_file(tmp_path / "case_row_hashes.mldsl", streamed, row_hashes=True)
+    assert streamed.read_bytes() == out.read_bytes()
+    write_plan(out, join_rows(split_rows(entries)))
+    assert read_plan_meta(out) is None
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+import mldsl_compile
+from mldsl_compile import MAX_ACTIONS_PER_ROW, _pack_row_cuts
+from mldsl_plan import split_rows
+from test_compile_select_and_sugar import _api_base
+
+SEL = ("purpur_block", "custom", "no")
+
+
+def _restore_extra(sel):
+    return 1 if sel is not None else 0
+
+
+def test_dp_avoids_selection_restore_that_greedy_takes():
+    boundaries = [(39, None), (40, SEL)]
+    greedy = _pack_row_cuts(81, boundaries, restore_extra=_restore_extra, mode="greedy")
+    dp = _pack_row_cuts(81, boundaries, restore_extra=_restore_extra, mode="dp")
+    assert greedy == ([40], 1)
+    assert dp == ([39], 0)
+
+
+def test_dp_never_worse_than_greedy_on_random_chains():
+    rng = random.Random(1234)
+    for _ in range(300):
+        n = rng.randint(43, 200)
+        boundaries = [(p, SEL if rng.random() < 0.3 else None) for p in range(1, n) if rng.random() < 0.4]
+        greedy = _pack_row_cuts(n, boundaries, restore_extra=_restore_extra, mode="greedy")
+        dp = _pack_row_cuts(n, boundaries, restore_extra=_restore_extra, mode="dp")
+        if greedy is None:
+            continue
+        assert dp is not None
+        assert (len(dp[0]), dp[1]) <= (len(greedy[0]), greedy[1])
+
+
+def test_row_packer_dp_compiles_and_reports(tmp_path, monkeypatch, capsys):
+    lines = ['event("Вход") {']
+    for i in range(120):
+        lines.append(f'    player.msg(text="m{i}")')
+    lines.append("}")
+    path = tmp_path / "case_row_packer.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+
+    greedy = mldsl_compile.compile_entries(path)
+    capsys.readouterr()
+    dp = mldsl_compile.compile_entries(path, row_packer="dp")
+    assert len(split_rows(dp)) == len(split_rows(greedy))
+    assert all(len(row) <= MAX_ACTIONS_PER_ROW for row in split_rows(dp))
+    assert "row packer (dp): 1 split chain(s), rows 3 vs greedy 3" in capsys.readouterr().err
+
+
+def test_row_packer_rejects_unknown_mode(tmp_path, monkeypatch):
+    path = tmp_path / "case_row_packer.mldsl"
+    path.write_text('event("Вход") {\n}\n', encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    with pytest.raises(ValueError, match="row packer"):
+        mldsl_compile.compile_entries(path, row_packer="ilp")
+
+
+def test_row_packer_dp_plans_each_chain_once(tmp_path, monkeypatch):
+    lines = ['event("Вход") {']
+    for i in range(600):
+        lines.append(f'    player.msg(text="m{i}")')
+        if i % 37 == 5:
+            lines.append("    select.if_player.переменная_существует(var=s)")
+    lines.append("}")
+    path = tmp_path / "case_row_packer.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    calls: list[str] = []
+    real = mldsl_compile._pack_row_cuts
+
+    def counting(*args, **kwargs):
+        calls.append(kwargs["mode"])
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(mldsl_compile, "_pack_row_cuts", counting)
+    dp = mldsl_compile.compile_entries(path, row_packer="dp")
+    # One greedy (for the report) and one dp plan for the whole chain, not one per cut.
+    assert calls == ["greedy", "dp"]
+    rows = split_rows(dp)
+    assert len(rows) > 10 and all(len(row) <= MAX_ACTIONS_PER_ROW for row in rows)
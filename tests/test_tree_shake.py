@@ -0,0 +1,106 @@
+import pytest
+
+import mldsl_compile
+from test_compile_select_and_sugar import _api_base
+
+
+def _compile(tmp_path, monkeypatch, lines, **kwargs):
+    path = tmp_path / "case_tree_shake.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return mldsl_compile.compile_entries(path, **kwargs)
+
+
+def _func_names(entries):
+    return {e.get("name") for e in entries if e.get("block") == "lapis_block"}
+
+
+def test_tree_shake_drops_unreferenced_imported_funcs(tmp_path, monkeypatch, capsys):
+    (tmp_path / "lib.mldsl").write_text(
+        "\n".join(
+            [
+                "func used {",
+                "    call(nested)",
+                "}",
+                "func nested {",
+                '    player.msg(text="n")',
+                "}",
+                "func unused {",
+                '    player.msg(text="u")',
+                "}",
+            ]
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+    lines = ["import lib", 'event("Вход") {', "    call(used)", "}"]
+
+    full = _compile(tmp_path, monkeypatch, lines)
+    assert _func_names(full) == {"used", "nested", "unused"}
+
+    shaken = _compile(tmp_path, monkeypatch, lines, tree_shake=True)
+    assert _func_names(shaken) == {"used", "nested"}
+    assert shaken[-1].get("block") != "newline"
+    err = capsys.readouterr().err
+    assert "tree-shake: dropped 1 unreachable function(s), saved 1 row(s)" in err
+
+
+def test_tree_shake_keeps_exported_funcs(tmp_path, monkeypatch):
+    lines = [
+        "export api_entry",
+        "func api_entry {",
+        '    player.msg(text="a")',
+        "}",
+        "func dead {",
+        '    player.msg(text="d")',
+        "}",
+        'event("Вход") {',
+        '    player.msg(text="e")',
+        "}",
+    ]
+    entries = _compile(tmp_path, monkeypatch, lines, tree_shake=True)
+    assert _func_names(entries) == {"api_entry"}
+
+
+def test_indented_export_is_recognized(tmp_path, monkeypatch, capsys):
+    lines = [
+        "    export api_entry ;",
+        "func api_entry {",
+        '    player.msg(text="a")',
+        "}",
+        'event("Вход") {',
+        '    player.msg(text="e")',
+        "}",
+    ]
+    entries = _compile(tmp_path, monkeypatch, lines, tree_shake=True)
+    assert _func_names(entries) == {"api_entry"}
+    assert "нераспознанная строка" not in capsys.readouterr().err
+
+
+def test_tree_shake_drops_autosplit_helpers_of_dead_func(tmp_path, monkeypatch):
+    lines = ["func heavy {"]
+    for i in range(60):
+        lines.append(f'    player.msg(text="m{i}")')
+    lines.extend(["}", 'event("Вход") {', '    player.msg(text="e")', "}"])
+
+    entries = _compile(tmp_path, monkeypatch, lines, tree_shake=True)
+    assert _func_names(entries) == set()
+    assert [e.get("block") for e in entries if e.get("block") in {"diamond_block", "newline"}] == ["diamond_block"]
+
+
+def test_tree_shake_is_noop_with_dynamic_call_target(tmp_path, monkeypatch):
+    lines = [
+        "func maybe {",
+        '    player.msg(text="m")',
+        "}",
+        'event("Вход") {',
+        "    call(var(fn_name))",
+        "}",
+    ]
+    entries = _compile(tmp_path, monkeypatch, lines, tree_shake=True)
+    assert _func_names(entries) == {"maybe"}
+
+
+def test_export_of_undeclared_func_fails_fast(tmp_path, monkeypatch):
+    with pytest.raises(ValueError, match="export: функция `ghost`"):
+        _compile(tmp_path, monkeypatch, ["export ghost", 'event("Вход") {', "}"], tree_shake=True)
@@ -0,0 +1,124 @@
+import pytest
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_plan import join_rows, write_plan
+from mldsl_validate import PlanValidator, validate_plan
+from test_compile_select_and_sugar import _api_base
+
+HEAD = {"block": "diamond_block", "name": "вход", "args": "no"}
+
+
+def _msg(t):
+    return {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": f"slot(9)=text({t})"}
+
+
+def _compile(tmp_path, monkeypatch, lines):
+    path = tmp_path / "case_validate.mldsl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    return mldsl_compile.compile_entries(path)
+
+
+def test_compiled_plan_is_valid(tmp_path, monkeypatch):
+    lines = ['event("Вход") {', "    if_value.переменная_существует(var=x) {"]
+    lines += [f'        player.msg(text="m{i}, (a)")' for i in range(70)]
+    lines += ["    }", "    not if_value.переменная_существует(var=y)", "}", "loop tick every 20 {", "    call(f)", "}"]
+    lines += ["func f {", '    player.msg(text="f")', "}"]
+    entries = _compile(tmp_path, monkeypatch, lines)
+    assert any(e.get("negated") for e in entries)
+    assert validate_plan(entries) == []
+
+
+def test_validator_reports_schema_issues():
+    bad = [
+        _msg("no header"),
+        {"block": "newline"},
+        {"block": "newline"},
+        {**HEAD, "args": "x"},
+        {**_msg("a"), "negated": True},
+        {"block": "cobblestone", "name": "x", "args": "slot(9)text(a)"},
+        {"block": "stone", "name": "x", "args": "no"},
+        {"block": "emerald_block", "name": "loop", "args": "fast"},
+        {"block": "newline"},
+    ]
+    issues = validate_plan(bad)
+    joined = "\n".join(issues)
+    assert issues[0].startswith("entry 0: ряд должен начинаться с заголовка")
+    assert "entry 2: пустой ряд" in joined
+    assert "entry 3: заголовок `diamond_block`: args должен быть `no`" in joined
+    assert "entry 4: `cobblestone`: `negated` допустим только для условий" in joined
+    assert "entry 5: `cobblestone` `x`: некорректный фрагмент args" in joined
+    assert "entry 6: неизвестный блок `stone`" in joined
+    assert "entry 7: заголовок `emerald_block` не в начале ряда" in joined
+    assert "entry 7: цикл `loop`: args должен быть числом тиков" in joined
+    assert issues[-1] == "entry 8: `newline` в конце плана"
+
+
+def test_validator_row_budget_and_stream_rows():
+    row = [HEAD] + [_msg(i) for i in range(42)]
+    assert validate_plan(row) == []
+    assert validate_plan(row + [_msg("x")]) == ["entry 43: ряд длиннее 43 блоков (с заголовком)"]
+
+    streamed = PlanValidator()
+    streamed.feed_row(row)
+    streamed.feed_row([{"block": "lapis_block", "name": "f", "args": "no"}, _msg("a, b (c)")])
+    assert streamed.finish() == []
+    assert (streamed.count, streamed.rows) == (len(row) + 3, 2)
+
+
+def test_validator_accepts_empty_and_raw_slot_values():
+    raw = {"block": "cobblestone", "name": "Титл||Титл", "args": "slot(11)=,slot(12)=a (b), c,clicks(16,1)=0"}
+    assert validate_plan([HEAD, raw]) == []
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        "slot(9)=text(",
+        "slot(9)=text(a",
+        "slot(9)=a|b",
+        "slot(9)=num(1)|x",
+        "slot(9)=num(1",
+        "slot(13)=var(x))",
+        'slot(9)=item("minecraft:stone)',
+        "slot(9)=text(a),slot(10)=num(",
+    ],
+)
+def test_validator_rejects_malformed_slot_values(args):
+    issues = validate_plan([HEAD, {"block": "cobblestone", "name": "Сообщение||Сообщение", "args": args}])
+    assert len(issues) == 1 and "некорректный фрагмент args" in issues[0]
+
+
+def test_validator_stops_after_budget():
+    validator = PlanValidator(budget_s=0.0)
+    validator.feed_all(join_rows([[HEAD, _msg(i)] for i in range(2000)]))
+    assert validator.exhausted
+    assert validator.count < 6000
+
+
+def test_validate_plan_cli(tmp_path, capsys):
+    good = tmp_path / "good.json"
+    write_plan(good, [HEAD, _msg("a")], "compact")
+    assert mldsl_cli.main(["validate-plan", str(good)]) == 0
+    assert "OK:" in capsys.readouterr().out
+
+    bad = tmp_path / "bad.json"
+    write_plan(bad, [_msg("a")], "pretty")
+    assert mldsl_cli.main(["validate-plan", str(bad)]) == 1
+    captured = capsys.readouterr()
+    assert "FAIL:" in captured.out
+    assert "ряд должен начинаться с заголовка" in captured.err
+
+
+def test_post_compile_check_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLDSL_VALIDATE_BUDGET_MS", "0")
+    monkeypatch.setattr(mldsl_compile, "PlanValidator", None)
+    entries = _compile(tmp_path, monkeypatch, ['event("Вход") {', '    player.msg(text="a")', "}"])
+    assert entries[0]["block"] == "diamond_block"
+
+
+def test_post_compile_check_rejects_broken_plan(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "_collapse_autosplit_trampoline_funcs", lambda entries: ([_msg("x")], 0))
+    with pytest.raises(ValueError, match="plan validation: 1 issue"):
+        _compile(tmp_path, monkeypatch, ['event("Вход") {', '    player.msg(text="a")', "}"])
@@ -0,0 +1,48 @@
+import os
+
+import mldsl_cli
+import mldsl_compile
+from mldsl_plan import read_plan
+from mldsl_watch import watch
+from test_compile_select_and_sugar import _api_base
+
+
+def _write(path, text, tick):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(tick * 10**9, tick * 10**9))
+
+
+def test_watch_debounces_and_follows_imports(tmp_path, monkeypatch):
+    monkeypatch.setattr(mldsl_compile, "load_api", lambda: _api_base())
+    monkeypatch.setattr(mldsl_cli, "_compute_required_tier", lambda _specs: ("player", 0, [], []))
+    src = tmp_path / "main.mldsl"
+    lib = tmp_path / "lib.mldsl"
+    plan = tmp_path / "plan.json"
+    _write(src, 'import lib\nevent("Вход") {\n    call(f)\n}\n', 1)
+    _write(lib, 'func f {\n    player.msg(text="v1")\n}\n', 1)
+
+    edits = {
+        2: lambda: _write(lib, 'func f {\n    player.msg(text="v2")\n}\n', 2),
+        3: lambda: _write(lib, 'func f {\n    player.msg(text="v3!")\n}\n', 3),
+        9: lambda: _write(src, 'event("Вход") {\n    player.msg(text=\n', 9),
+    }
+    clock = {"tick": 0}
+    plans: list[str] = []
+    logs: list[str] = []
+
+    def sleep(_s):
+        clock["tick"] += 1
+        edits.get(clock["tick"], lambda: None)()
+
+    def rebuild():
+        try:
+            return mldsl_cli.main(["compile", str(src), "--plan", str(plan)])
+        finally:
+            plans.append(repr(read_plan(plan)))
+
+    code = watch(src, rebuild, debounce=2, max_builds=3, sleep=sleep, clock=lambda: clock["tick"], log=logs.append)
+    assert code == 1
+    assert "v1" in plans[0] and "v3!" in plans[1] and plans[2] == plans[1]
+    assert [line.split(":")[0] for line in logs] == ["#1 start", "#2 lib.mldsl", "#3 main.mldsl"]
+    assert "exit 0" in logs[1] and "error:" in logs[2]
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
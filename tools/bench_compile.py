@@ -0,0 +1,151 @@
+"""
+Compiler scalability benchmark with a regression threshold.
+
+Generates synthetic programs (`tools/bench_programs.py`: thousands of events, a 10k-action event,
+deep `if` nesting, vfunc/multiselect, long formulas, a big import graph), compiles each in-process
+against the pinned API `tools/bench_api_aliases.json`, and records wall time (best/median of N runs),
+peak traced memory (tracemalloc, separate run) and entries emitted. Fails when a case is slower or uses
+more peak memory than a saved baseline by more than `--threshold` percent; a changed entry count is
+reported as well (output changed, re-baseline if intended). `--time-threshold` loosens the wall-time limit
+alone, for shared CI runners whose speed differs from the machine that wrote the baseline.
+
+The committed baseline `tools/bench_compile_baseline.json` is written at `--scale 0.2` (recorded per case)
+and checked by CI; re-baseline it with the same scale when a change is intentional.
+
+  python tools/bench_compile.py
+  python tools/bench_compile.py --scale 0.2 --write-baseline tools/bench_compile_baseline.json
+  python tools/bench_compile.py --scale 0.2 --baseline tools/bench_compile_baseline.json --threshold 25 --time-threshold 300
+  python tools/bench_compile.py --case huge_event --scale 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from _bootstrap import ensure_repo_root_on_syspath
+from bench_programs import BENCH_API_PATH, GENERATORS
+
+ensure_repo_root_on_syspath()
+
+# Metrics compared against the baseline (higher is worse).
+REGRESSION_METRICS = ("best_ms", "peak_kb")
+
+
+def _compile_quiet(entry: Path) -> list[dict]:
+    import mldsl_compile
+
+    with contextlib.redirect_stderr(io.StringIO()):
+        return mldsl_compile.compile_entries(entry, strict_unknown=True)
+
+
+def run_case(entry: Path, runs: int) -> dict:
+    times: list[float] = []
+    entries: list[dict] = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        entries = _compile_quiet(entry)
+        times.append((time.perf_counter() - t0) * 1000)
+    del entries
+    tracemalloc.start()
+    try:
+        entries = _compile_quiet(entry)
+        _cur, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "best_ms": round(min(times), 1),
+        "median_ms": round(statistics.median(times), 1),
+        "peak_kb": round(peak / 1024),
+        "entries": len(entries),
+    }
+
+
+def check(
+    results: dict[str, dict],
+    baseline: dict | None,
+    threshold: float,
+    time_threshold: float | None = None,
+) -> list[str]:
+    failures: list[str] = []
+    for name, res in results.items():
+        base = (baseline or {}).get(name)
+        if not base:
+            continue
+        if base.get("scale", res.get("scale")) != res.get("scale"):
+            failures.append(f"{name}: baseline scale {base.get('scale')} != {res.get('scale')} (not comparable)")
+            continue
+        for metric in REGRESSION_METRICS:
+            old = base.get(metric)
+            limit = time_threshold if metric == "best_ms" and time_threshold is not None else threshold
+            if old and res[metric] > old * (1 + limit / 100):
+                failures.append(
+                    f"{name}: {metric} {res[metric]} is +{(res[metric] / old - 1) * 100:.0f}% vs baseline {old} "
+                    f"(threshold {limit:g}%)"
+                )
+        if base.get("entries") is not None and base["entries"] != res["entries"]:
+            failures.append(f"{name}: entries {res['entries']} != baseline {base['entries']} (output changed)")
+    return failures
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="MLDSL compiler scalability benchmark")
+    p.add_argument("--case", action="append", default=[], choices=sorted(GENERATORS), help="Run only these cases")
+    p.add_argument("--scale", type=float, default=1.0, help="Program size factor (1.0 = benchmark size)")
+    p.add_argument("--runs", type=int, default=3, help="Timed compiles per case (best run is compared)")
+    p.add_argument("--baseline", default=None, help="Baseline JSON from --write-baseline to compare against")
+    p.add_argument("--threshold", type=float, default=20.0, help="Allowed regression vs baseline, percent")
+    p.add_argument(
+        "--time-threshold",
+        type=float,
+        default=None,
+        help="Allowed wall-time regression, percent (default: --threshold)",
+    )
+    p.add_argument("--write-baseline", default=None, help="Write results as a baseline JSON to this path")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    cases = args.case or list(GENERATORS)
+
+    with tempfile.TemporaryDirectory(prefix="mldsl_bench_") as tmp:
+        work = Path(tmp)
+        # Pinned API in a private data root, so results do not depend on the installed out/.
+        (work / "data" / "out").mkdir(parents=True)
+        shutil.copy2(BENCH_API_PATH, work / "data" / "out" / "api_aliases.json")
+        os.environ["MLDSL_DATA_DIR"] = str(work / "data")
+        os.environ.pop("MLDSL_PORTABLE", None)
+
+        import mldsl_compile
+
+        mldsl_compile.load_api()  # warm the data caches so the first case is not charged for them
+        results: dict[str, dict] = {}
+        for name in cases:
+            entry = GENERATORS[name](work / "src" / name, args.scale)
+            results[name] = res = {**run_case(entry, max(1, args.runs)), "scale": args.scale}
+            print(
+                f"{name:<18} best {res['best_ms']:9.1f} ms  median {res['median_ms']:9.1f} ms  "
+                f"peak {res['peak_kb']:8d} KiB  entries {res['entries']}"
+            )
+    if args.write_baseline:
+        Path(args.write_baseline).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    failures = check(results, baseline, args.threshold, args.time_threshold)
+    for line in failures:
+        print(f"[regression] {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
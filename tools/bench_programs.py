@@ -0,0 +1,153 @@
+"""
+Synthetic `.mldsl` program generators for `tools/bench_compile.py`.
+
+Each generator writes a program into a directory and returns the entry file. `scale=1.0` is the benchmark
+size; tests use small scales. Programs are deterministic (fixed seeds) and only use actions from
+`tools/bench_api_aliases.json`, the pinned API the benchmark compiles against.
+"""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Callable
+
+BENCH_API_PATH = Path(__file__).resolve().with_name("bench_api_aliases.json")
+
+
+def _n(base: int, scale: float, minimum: int = 1) -> int:
+    return max(minimum, int(base * scale))
+
+
+def _write(out_dir: Path, name: str, lines: list[str]) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / name
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def _msg(i: int, indent: str = "    ") -> str:
+    return f'{indent}player.msg(text="m{i}")'
+
+
+def gen_many_events(out_dir: Path, scale: float = 1.0) -> Path:
+    """Thousands of small events, loops and funcs (per-block overhead)."""
+    rnd = random.Random(1)
+    lines: list[str] = []
+    funcs = _n(200, scale)
+    for f in range(funcs):
+        lines += [f"func f{f} {{", _msg(f), f"    x{f % 7} += 1", "}"]
+    for e in range(_n(3000, scale)):
+        lines.append('event("Вход") {' if e % 5 else "loop tick every 20 {")
+        for k in range(rnd.randint(2, 8)):
+            lines.append(_msg(k) if k % 3 else f"    call(f{rnd.randrange(funcs)})")
+        lines.append("}")
+    return _write(out_dir, "many_events.mldsl", lines)
+
+
+def gen_huge_event(out_dir: Path, scale: float = 1.0) -> Path:
+    """One event with ~10k actions and scattered scopes (row auto-split)."""
+    rnd = random.Random(2)
+    lines = ['event("Вход") {']
+    i = 0
+    total = _n(10000, scale, 50)
+    while i < total:
+        if rnd.random() < 0.05:
+            lines.append("    if_value.переменная_существует(var=x) {")
+            for _ in range(rnd.randint(1, 30)):
+                lines.append(_msg(i, "        "))
+                i += 1
+            lines.append("    }")
+        else:
+            lines.append(_msg(i))
+            i += 1
+    lines.append("}")
+    return _write(out_dir, "huge_event.mldsl", lines)
+
+
+def gen_deep_if(out_dir: Path, scale: float = 1.0) -> Path:
+    """Deeply nested `if` scopes inside funcs (scope tracking, implicit closers)."""
+    lines: list[str] = []
+    depth = 12
+    for f in range(_n(150, scale)):
+        lines.append(f"func deep{f} {{")
+        for d in range(depth):
+            ind = "    " * (d + 1)
+            lines.append(f"{ind}if_value.переменная_существует(var=v{d}) {{")
+            lines.append(_msg(d, ind + "    "))
+        for d in reversed(range(depth)):
+            lines.append("    " * (d + 1) + "}")
+        lines.append("}")
+    lines += ['event("Вход") {', "    call(deep0)", "}"]
+    return _write(out_dir, "deep_if.mldsl", lines)
+
+
+def gen_vfunc_multiselect(out_dir: Path, scale: float = 1.0) -> Path:
+    """Heavy `vfunc` expansion and weighted `multiselect` blocks."""
+    lines = [
+        'vfunc tagged(varname, label="v")',
+        "    select.allentities",
+        "    select.if_player.переменная_существует(var=varname)",
+        "    player.msg(text=label)",
+        "",
+        "vfunc twice(varname)",
+        "    tagged(varname)",
+        '    tagged(varname, "again")',
+        "",
+    ]
+    for e in range(_n(150, scale)):
+        lines.append('event("Вход") {')
+        for k in range(5):
+            lines.append(f"    twice(%selected%v{k})")
+        lines += [
+            f"    multiselect ifplayer %selected%sel{e} 2",
+            '        select.ifplayer.держит_предмет(item=item("minecraft:stick"))+',
+            "        select.ifplayer.переменная_существует(var=%selected%a)-2",
+            "        select.ifplayer.переменная_существует(var=%selected%b)*=%selected%w",
+            "}",
+        ]
+    return _write(out_dir, "vfunc_multiselect.mldsl", lines)
+
+
+def gen_long_formulas(out_dir: Path, scale: float = 1.0) -> Path:
+    """Long arithmetic formulas (expression lowering into temp vars)."""
+    rnd = random.Random(3)
+    lines = ['event("Вход") {']
+    for i in range(_n(1500, scale)):
+        expr = f"a{rnd.randrange(9)}"
+        for _ in range(rnd.randint(4, 14)):
+            expr += f" {rnd.choice('+-*/')} " + (f"a{rnd.randrange(9)}" if rnd.random() < 0.6 else str(rnd.randint(1, 99)))
+            if rnd.random() < 0.2:
+                expr = f"({expr})"
+        lines.append(f"    r{i % 50} = {expr}")
+    lines.append("}")
+    return _write(out_dir, "long_formulas.mldsl", lines)
+
+
+def gen_import_graph(out_dir: Path, scale: float = 1.0) -> Path:
+    """Wide and deep `import` graph: libraries importing each other (diamonds), funcs called from events."""
+    rnd = random.Random(4)
+    libs = _n(120, scale, 3)
+    lib_dir = out_dir / "lib"
+    for i in range(libs):
+        # lib{i-1} keeps every library reachable from the entry; the rest add diamonds.
+        lines = [f"import lib{j}" for j in sorted({i - 1, *(rnd.randrange(i) for _ in range(2))})] if i else []
+        for f in range(5):
+            lines += [f"func lib{i}_f{f} {{", _msg(f), "}"]
+        _write(lib_dir, f"lib{i}.mldsl", lines)
+    lines = [f"import lib/lib{i}" for i in range(libs - 1, libs - 1 - min(libs, 10), -1)]
+    for e in range(_n(200, scale)):
+        lines.append('event("Вход") {')
+        lines += [f"    call(lib{rnd.randrange(libs)}_f{rnd.randrange(5)})" for _ in range(4)]
+        lines.append("}")
+    return _write(out_dir, "import_graph.mldsl", lines)
+
+
+GENERATORS: dict[str, Callable[[Path, float], Path]] = {
+    "many_events": gen_many_events,
+    "huge_event": gen_huge_event,
+    "deep_if": gen_deep_if,
+    "vfunc_multiselect": gen_vfunc_multiselect,
+    "long_formulas": gen_long_formulas,
+    "import_graph": gen_import_graph,
+}
@@ -0,0 +1,126 @@
+"""
+CLI startup benchmark with a regression threshold.
+
+Runs `mldsl paths`, `mldsl compile --help` and a minimal compile as fresh processes (best of N runs)
+and fails when a case is over its budget, or slower than a saved baseline by more than `--threshold`
+percent. Use `--exe dist/mldsl_cli.dist/mldsl.exe` to measure the frozen build.
+
+  python tools/bench_startup.py
+  python tools/bench_startup.py --write-baseline dist/startup_baseline.json
+  python tools/bench_startup.py --baseline dist/startup_baseline.json --threshold 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _bootstrap import ensure_repo_root_on_syspath
+
+ensure_repo_root_on_syspath()
+
+from mldsl_paths import api_aliases_path  # noqa: E402
+
+# Budgets (ms, best run) for a source checkout on a dev machine; override with --budget NAME=MS.
+DEFAULT_BUDGETS_MS = {
+    "paths": 100.0,
+    "compile --help": 100.0,
+    "compile minimal": 600.0,
+}
+MINIMAL_SOURCE = 'event("Вход") {\n    player.message("hi")\n}\n'
+
+
+def _cli_cmd(args: argparse.Namespace) -> list[str]:
+    if args.exe:
+        return [str(Path(args.exe).resolve())]
+    return [sys.executable, str(Path(__file__).resolve().parents[1] / "mldsl_cli.py")]
+
+
+def _time_runs(cmd: list[str], runs: int) -> tuple[list[float], int]:
+    times: list[float] = []
+    code = 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - t0) * 1000)
+        code = code or proc.returncode
+    return times, code
+
+
+def run_cases(args: argparse.Namespace, work: Path) -> dict[str, dict]:
+    base = _cli_cmd(args)
+    src = work / "startup_minimal.mldsl"
+    src.write_text(MINIMAL_SOURCE, encoding="utf-8")
+    cases = {
+        "paths": [*base, "paths"],
+        "compile --help": [*base, "compile", "--help"],
+        "compile minimal": [*base, "compile", str(src), "--plan", str(work / "plan.json")],
+    }
+    results: dict[str, dict] = {}
+    for name, cmd in cases.items():
+        if name == "compile minimal" and not api_aliases_path().exists():
+            results[name] = {"skipped": f"no {api_aliases_path()}"}
+            continue
+        times, code = _time_runs(cmd, args.runs)
+        results[name] = {"best_ms": round(min(times), 1), "median_ms": round(statistics.median(times), 1), "exit": code}
+    return results
+
+
+def check(results: dict[str, dict], budgets: dict[str, float], baseline: dict | None, threshold: float) -> list[str]:
+    failures: list[str] = []
+    for name, res in results.items():
+        if "skipped" in res:
+            continue
+        if res["exit"] != 0:
+            failures.append(f"{name}: exit code {res['exit']}")
+        budget = budgets.get(name)
+        if budget is not None and res["best_ms"] > budget:
+            failures.append(f"{name}: {res['best_ms']} ms > budget {budget:g} ms")
+        base = (baseline or {}).get(name, {}).get("best_ms")
+        if base and res["best_ms"] > base * (1 + threshold / 100):
+            failures.append(f"{name}: {res['best_ms']} ms is >{threshold:g}% slower than baseline {base} ms")
+    return failures
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="MLDSL CLI startup benchmark")
+    p.add_argument("--exe", default=None, help="Frozen mldsl executable (default: python mldsl_cli.py)")
+    p.add_argument("--runs", type=int, default=7, help="Process starts per case (best run is compared)")
+    p.add_argument("--budget", action="append", default=[], metavar="NAME=MS", help="Override a case budget")
+    p.add_argument("--baseline", default=None, help="Baseline JSON from --write-baseline to compare against")
+    p.add_argument("--threshold", type=float, default=20.0, help="Allowed slowdown vs baseline, percent")
+    p.add_argument("--write-baseline", default=None, help="Write results as a baseline JSON to this path")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for item in args.budget:
+        name, _, ms = item.rpartition("=")
+        budgets[name] = float(ms)
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+
+    with tempfile.TemporaryDirectory(prefix="mldsl_startup_") as tmp:
+        results = run_cases(args, Path(tmp))
+    for name, res in results.items():
+        if "skipped" in res:
+            print(f"{name:<16} skipped ({res['skipped']})")
+        else:
+            print(f"{name:<16} best {res['best_ms']:7.1f} ms  median {res['median_ms']:7.1f} ms  (budget {budgets.get(name, 0):g})")
+    if args.write_baseline:
+        Path(args.write_baseline).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    failures = check(results, budgets, baseline, args.threshold)
+    for line in failures:
+        print(f"[regression] {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,76 +1,192 @@
+"""
+Transpile `.dslpy` (python-like DSL) to `.mldsl` and compile it in-process.
+
+The transpiler, the API and `@import`/`@template` examples are loaded once per `DslPySession`, so `--batch`
+converts a whole directory in one warm process:
+
+  python tools/dslpy_compile.py examples/timer_start.dslpy --print-plan
+  python tools/dslpy_compile.py --batch examples --plan-dir out/plans
+"""
+
 from __future__ import annotations
 
 import argparse
-import json
 import re
-import subprocess
 import sys
+import time
 from pathlib import Path
 
+from _bootstrap import ensure_repo_root_on_syspath
+
+ensure_repo_root_on_syspath()
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
+EXAMPLES_DIR = REPO_ROOT / "examples"
+TRANSPILER_PATH = REPO_ROOT / "tools" / "_premium" / "dslpy_transpile.py"
 
+# A tiny template directive on the first non-empty line (not valid python syntax):
+#   @import timer_start
+#   @template hold_rightclick
+_DIRECTIVE_RE = re.compile(r"^@(import|template)\s+(.+?)\s*$", re.IGNORECASE)
 
-def main() -> int:
-    ap = argparse.ArgumentParser(description="Transpile .dslpy (python-like DSL) to .mldsl and compile to plan.json.")
-    ap.add_argument("path", help="Path to .dslpy file")
-    ap.add_argument("--print-mldsl", action="store_true", help="Print transpiled MLDSL to stdout")
-    ap.add_argument("--print-plan", action="store_true", help="Print compiled plan JSON to stdout (like mldsl_compile.py)")
-    args = ap.parse_args()
 
-    src_path = Path(args.path)
-    if not src_path.exists():
-        print(f"ERROR: file not found: {src_path}", file=sys.stderr)
+class DslPyError(ValueError):
+    """dslpy source could not be transpiled (message is printed as `ERROR: dslpy: ...`)."""
+
+
+def _load_transpiler():
+    # tools/ is not a package; load by path
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location("_mldsl_dslpy_transpile", str(TRANSPILER_PATH))
+    if not TRANSPILER_PATH.exists() or not spec or not spec.loader:
+        raise DslPyError(f"cannot load dslpy transpiler: {TRANSPILER_PATH}")
+    mod = importlib.util.module_from_spec(spec)
+    # dataclasses expects the module to be present in sys.modules
+    sys.modules[spec.name] = mod
+    spec.loader.exec_module(mod)  # type: ignore[attr-defined]
+    return getattr(mod, "transpile")
+
+
+def template_name(src: str) -> str | None:
+    """Template name from an `@import`/`@template` directive on the first non-empty line, else None."""
+    for ln in (src or "").lstrip("\ufeff").splitlines():
+        stripped = ln.strip()
+        if not stripped:
+            continue
+        m = _DIRECTIVE_RE.match(stripped)
+        if not m:
+            return None
+        raw_name = m.group(2).strip().split("#", 1)[0].strip().strip("\"'").replace("\\", "/")
+        # tolerate junk after the template name (weak models): "@import timer_start 2"
+        return raw_name.split()[0] if raw_name.split() else raw_name
+    return None
+
+
+class DslPySession:
+    """
+    Warm dslpy -> MLDSL -> plan pipeline: the transpiler is loaded once, templates are resolved and
+    transpiled once per file version, and the compiler keeps its API/data caches between files.
+    """
+
+    def __init__(self, examples_dir: Path | None = None):
+        self.examples_dir = Path(examples_dir) if examples_dir is not None else EXAMPLES_DIR
+        self._transpile = None
+        # template name -> (path, mtime_ns, transpiled MLDSL)
+        self._templates: dict[str, tuple[Path, int, str]] = {}
+
+    def transpile(self, src: str) -> str:
+        name = template_name(src)
+        if name is not None:
+            return self._template_mldsl(name)
+        return self._run_transpiler(src)
+
+    def _run_transpiler(self, src: str) -> str:
+        if self._transpile is None:
+            self._transpile = _load_transpiler()
+        try:
+            return self._transpile(src)
+        except DslPyError:
+            raise
+        except Exception as ex:
+            if ex.__class__.__name__ == "DslPyError":
+                raise DslPyError(str(ex)) from ex
+            raise DslPyError(f"{type(ex).__name__}: {ex}") from ex
+
+    def _template_mldsl(self, raw_name: str) -> str:
+        safe = re.sub(r"[^0-9A-Za-z_.-]", "", raw_name.split("/")[-1])
+        ex_path = (self.examples_dir / f"{safe}.dslpy").resolve()
+        try:
+            mtime_ns = ex_path.stat().st_mtime_ns
+        except OSError:
+            raise DslPyError(f"dslpy template not found: {raw_name} (looked for {ex_path})") from None
+        cached = self._templates.get(safe)
+        if cached is not None and cached[:2] == (ex_path, mtime_ns):
+            return cached[2]
+        mldsl_src = self._run_transpiler(ex_path.read_text(encoding="utf-8", errors="replace"))
+        self._templates[safe] = (ex_path, mtime_ns, mldsl_src)
+        return mldsl_src
+
+    def convert(self, src_path: Path) -> tuple[Path, str]:
+        """Transpiles `src_path`; writes the `.mldsl` sibling when its text changed. Returns (sibling, MLDSL)."""
+        mldsl_src = self.transpile(src_path.read_text(encoding="utf-8", errors="replace"))
+        out = src_path.with_suffix(".mldsl")
+        if not out.exists() or out.read_text(encoding="utf-8", errors="replace") != mldsl_src:
+            out.write_text(mldsl_src, encoding="utf-8")
+        return out, mldsl_src
+
+    def compile(self, src_path: Path) -> list[dict]:
+        """Plan entries for a `.dslpy` file, compiled in-process from the transpiled text."""
+        from mldsl_compile import compile_entries
+
+        out, mldsl_src = self.convert(src_path)
+        return compile_entries(out, source=mldsl_src)
+
+
+def run_batch(session: DslPySession, src_dir: Path, plan_dir: Path | None, fmt: str) -> int:
+    from mldsl_plan import write_plan
+
+    files = sorted(src_dir.glob("*.dslpy"))
+    if not files:
+        print(f"ERROR: no .dslpy files in {src_dir}", file=sys.stderr)
         return 2
+    failed = 0
+    t_all = time.perf_counter()
+    for path in files:
+        t0 = time.perf_counter()
+        try:
+            entries = session.compile(path)
+            if plan_dir is not None:
+                write_plan(plan_dir / f"{path.stem}.plan.json", entries, fmt)
+        except DslPyError as ex:
+            failed += 1
+            print(f"ERROR: {path.name}: dslpy: {ex}", file=sys.stderr)
+            continue
+        except Exception as ex:
+            failed += 1
+            print(f"ERROR: {path.name}: {type(ex).__name__}: {ex}", file=sys.stderr)
+            continue
+        print(f"OK: {path.name} ({len(entries)} entries, {(time.perf_counter() - t0) * 1000:.0f} ms)")
+    total_ms = (time.perf_counter() - t_all) * 1000
+    print(f"[warn] dslpy batch: {len(files) - failed}/{len(files)} ok in {total_ms:.0f} ms", file=sys.stderr)
+    return 1 if failed else 0
 
+
+def main(argv: list[str] | None = None) -> int:
     try:
-        from tools._premium.dslpy_transpile import DslPyError, transpile  # type: ignore
+        sys.stdout.reconfigure(encoding="utf-8")
     except Exception:
-        # tools/ is not a package; load by path
-        import importlib.util
+        pass
+
+    from mldsl_plan import PLAN_FORMATS
 
-        tp = (REPO_ROOT / "tools" / "_premium" / "dslpy_transpile.py").resolve()
-        spec = importlib.util.spec_from_file_location("_mldsl_dslpy_transpile", str(tp))
-        if not spec or not spec.loader:
-            print("ERROR: cannot load dslpy transpiler", file=sys.stderr)
+    ap = argparse.ArgumentParser(description="Transpile .dslpy (python-like DSL) to .mldsl and compile to plan.json.")
+    ap.add_argument("path", nargs="?", help="Path to .dslpy file")
+    ap.add_argument("--print-mldsl", action="store_true", help="Print transpiled MLDSL to stdout")
+    ap.add_argument("--print-plan", action="store_true", help="Print compiled plan JSON to stdout (like mldsl_compile.py)")
+    ap.add_argument("--batch", metavar="DIR", default=None, help="Convert and compile every DIR/*.dslpy in one session")
+    ap.add_argument("--plan-dir", default=None, help="With --batch: write <name>.plan.json files here")
+    ap.add_argument("--format", choices=PLAN_FORMATS, default="pretty", help="plan.json format for --plan-dir")
+    args = ap.parse_args(argv)
+
+    session = DslPySession()
+    if args.batch:
+        src_dir = Path(args.batch)
+        if not src_dir.is_dir():
+            print(f"ERROR: directory not found: {src_dir}", file=sys.stderr)
             return 2
-        mod = importlib.util.module_from_spec(spec)
-        sys.modules[spec.name] = mod
-        spec.loader.exec_module(mod)  # type: ignore[attr-defined]
-        DslPyError = getattr(mod, "DslPyError")
-        transpile = getattr(mod, "transpile")
+        return run_batch(session, src_dir, Path(args.plan_dir) if args.plan_dir else None, args.format)
+    if not args.path:
+        ap.error("path or --batch DIR is required")
 
+    src_path = Path(args.path)
+    if not src_path.exists():
+        print(f"ERROR: file not found: {src_path}", file=sys.stderr)
+        return 2
     try:
-        src = src_path.read_text(encoding="utf-8", errors="replace")
-        # Allow a tiny template directive (not valid python syntax):
-        #   @import timer_start
-        #   @template hold_rightclick
-        directive_line = ""
-        for ln in (src or "").lstrip("\ufeff").splitlines():
-            stripped = ln.strip()
-            if not stripped:
-                continue
-            directive_line = stripped
-            break
-        m = re.match(r"^@(import|template)\s+(.+?)\s*$", directive_line, flags=re.IGNORECASE)
-        if m:
-            raw_name = m.group(2).strip()
-            raw_name = raw_name.split("#", 1)[0].strip().strip("\"'").replace("\\", "/")
-            # tolerate junk after the template name (weak models): "@import timer_start 2"
-            raw_name = raw_name.split()[0] if raw_name.split() else raw_name
-            name = raw_name.split("/")[-1]
-            safe = re.sub(r"[^0-9A-Za-z_.-]", "", name)
-            ex_path = (REPO_ROOT / "examples" / f"{safe}.dslpy").resolve()
-            if not ex_path.exists():
-                print(f"ERROR: dslpy template not found: {raw_name} (looked for {ex_path})", file=sys.stderr)
-                return 2
-            src = ex_path.read_text(encoding="utf-8", errors="replace")
-        mldsl_src = transpile(src)  # type: ignore[misc]
-    except Exception as ex:
-        if ex.__class__.__name__ == "DslPyError":
-            print(f"ERROR: dslpy: {ex}", file=sys.stderr)
-            return 2
-        print(f"ERROR: dslpy: {type(ex).__name__}: {ex}", file=sys.stderr)
+        out, mldsl_src = session.convert(src_path)
+    except DslPyError as ex:
+        print(f"ERROR: dslpy: {ex}", file=sys.stderr)
         return 2
 
     if args.print_mldsl:
@@ -78,18 +194,15 @@ def main() -> int:
         if not args.print_plan:
             return 0
 
-    tmp = src_path.with_suffix(".mldsl")
-    tmp.write_text(mldsl_src, encoding="utf-8")
+    from mldsl_compile import compile_commands, compile_entries
+    from mldsl_plan import dumps_plan
 
-    cmd = [sys.executable, str(REPO_ROOT / "tools" / "mldsl_compile.py"), str(tmp)]
     if args.print_plan:
-        cmd.append("--print-plan")
-    proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
-    if proc.stdout:
-        print(proc.stdout, end="")
-    if proc.stderr:
-        print(proc.stderr, file=sys.stderr, end="")
-    return proc.returncode
+        print(dumps_plan(compile_entries(out, source=mldsl_src), "pretty"), end="")
+        return 0
+    for cmd in compile_commands(out, source=mldsl_src):
+        print(cmd)
+    return 0
 
 
 if __name__ == "__main__":
@@ -158,7 +158,7 @@ This plan is executed by the mod using the existing `/placeadvanced` mechanism.
 
 ## Important limitations (server constraints)
 
-- `/placeadvanced` has a command length limit (~240 chars).
+- `/placeadvanced` has a command length limit (~240 chars); longer rows continue in `__cmd_cont_N` funcs.
 - Some bulk calls are chunked by the compiler (18 names per action).
 """.strip() + "\n"
 